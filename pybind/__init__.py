@@ -1,5 +1,54 @@
+"""Package for writing ISC BIND configuration files and zone files.
+
+Submodules (and ipaddr) are imported when a name defined in them is
+first accessed, so importing the package costs little for programs
+using only part of it.
+"""
+
+import importlib
+import sys
+import types
+
 __version__ = '0.1.0'
 
-from dnszone import ForwardZone, ReverseZone
-from dnsrecord import SOA, NS, A, AAAA, CNAME, MX, TXT, PTR
-from bindconf import BINDConf, ACL, Masters, NamedMasters, View, Zone
+# public name: submodule defining it
+_EXPORTS = {}
+for _module, _names in (
+        ('dnszone', ('ForwardZone', 'ReverseZone', 'TemplateZone',
+                     'OverlayZone', 'LazyZone')),
+        ('dnsrecord', ('SOA', 'NS', 'A', 'AAAA', 'CNAME', 'MX', 'TXT',
+                       'PTR', 'SRV', 'CAA', 'DNAME', 'SSHFP', 'TLSA',
+                       'HINFO', 'SPF')),
+        ('bindconf', ('BINDConf', 'ACL', 'Masters', 'NamedMasters', 'View',
+                      'Zone'))):
+    for _name in _names:
+        _EXPORTS[_name] = _module
+del _module, _names, _name
+
+__all__ = sorted(_EXPORTS)
+
+class _LazyModule(types.ModuleType):
+
+    """Package module importing submodules on first attribute access."""
+
+    def __getattr__(self, name):
+        if name in _EXPORTS:
+            module = importlib.import_module('.' + _EXPORTS[name], __name__)
+            value = getattr(module, name)
+        elif name.startswith('__'):
+            raise AttributeError(name)
+        else:
+            # a submodule not imported yet
+            try:
+                value = importlib.import_module('.' + name, __name__)
+            except ImportError:
+                raise AttributeError("'module' object has no attribute "
+                                     "'%s'" % name)
+        setattr(self, name, value)
+        return value
+
+_lazy = _LazyModule(__name__, __doc__)
+_lazy.__dict__.update(sys.modules[__name__].__dict__)
+# keep this module alive; its globals would be cleared if it were freed
+_lazy._module = sys.modules[__name__]
+sys.modules[__name__] = _lazy
@@ -0,0 +1,320 @@
+"""Classes for keeping every generation of zone and configuration
+files in a content-addressed archive.
+
+Each file is stored once per distinct content, under the SHA-256
+digest of its contents, so identical zones, shards and configurations
+written by many generations take the space of one copy; objects are
+optionally compressed with gzip. A generation is a JSON manifest
+mapping the names of its files to digests:
+
+  store = archive.Archive('/var/lib/pybind/archive', compress=True)
+  generation = store.generation('20261018T1200')
+  zone.write_file('master/example.com.hosts', generation=generation)
+  conf.write_file('named.conf', generation=generation)
+  generation.commit()
+  ...
+  store.restore('20261018T1200', '/tmp/rollback')
+
+Layout of the archive directory:
+
+  objects/ab/abcdef...     stored file (abcdef... being its digest)
+  objects/ab/abcdef....gz  stored file, compressed
+  generations/NAME.json    manifest of generation NAME
+
+Restoring a generation copies objects into place, decompressing
+those that are compressed. restore(link=True) hard-links uncompressed
+objects instead (copying them if the archive is on another file
+system), which is faster and takes no space; objects are made
+read-only, but a linked file must still be replaced (as pybind's
+writers do, by renaming a new file into place) rather than rewritten
+in place, or the archive would change with it.
+"""
+
+import errno
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+import time
+
+import atomicfile
+
+BLOCK_SIZE = 65536
+
+class _HashingFile(object):
+
+    """File object wrapper computing digest of data written."""
+
+    def __init__(self, fh):
+        self.fh = fh
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.fh.write(data)
+        self.digest.update(data)
+        self.size += len(data)
+
+class Generation(object):
+
+    """Class for files of a generation being archived."""
+
+    def __init__(self, archive, name):
+        """Return a Generation object.
+
+        Args:
+            archive: (Archive) archive in which files are stored
+            name: (str) name of generation
+              '20261018T1200'
+        """
+
+        self.archive = archive
+        self.name = name
+        self.files = {}  # name: {'digest': digest, 'size': size}
+
+    def add(self, obj, name):
+        """Store rendered object (without writing a file).
+
+        Args:
+            obj: (object) object with write(fh) method (e.g. a zone)
+            name: (str) name of file in generation
+              'master/example.com.hosts'
+
+        Returns:
+            digest of contents
+        """
+
+        digest, size = self.archive._store(obj.write)
+        self.files[_relative(name)] = {'digest': digest, 'size': size}
+        return digest
+
+    def add_file(self, filename, name=None):
+        """Store file.
+
+        Args:
+            filename: (str) path of file to be stored
+            name: (str) name of file in generation; filename if None
+
+        Returns:
+            digest of contents
+        """
+
+        def copy(fh):
+            with open(filename, 'rb') as source:
+                for block in iter(lambda: source.read(BLOCK_SIZE), ''):
+                    fh.write(block)
+
+        digest, size = self.archive._store(copy)
+        if name is None:
+            name = filename
+        self.files[_relative(name)] = {'digest': digest, 'size': size}
+        return digest
+
+    def add_directory(self, directory):
+        """Store all files below directory, named relative to it.
+
+        Args:
+            directory: (str) path of directory
+        """
+
+        for path, dirnames, filenames in os.walk(directory):
+            for filename in filenames:
+                filename = os.path.join(path, filename)
+                self.add_file(filename, os.path.relpath(filename, directory))
+
+    def commit(self):
+        """Write manifest of generation, replacing one of same name."""
+
+        manifest = {'generation': self.name, 'created': time.time(),
+                    'files': self.files}
+        filename = self.archive._manifest_name(self.name)
+        atomicfile.write(filename, json.dumps(manifest, indent=1,
+                                               sort_keys=True))
+
+class Archive(object):
+
+    """Class for content-addressed archive of generations."""
+
+    def __init__(self, directory, compress=False):
+        """Return an Archive object, creating its directory if needed.
+
+        Args:
+            directory: (str) path of archive
+            compress: (boolean) whether new objects are compressed
+        """
+
+        self.directory = directory
+        self.compress = compress
+        for subdirectory in ('objects', 'generations'):
+            _makedirs(os.path.join(directory, subdirectory))
+
+    def generation(self, name):
+        """Return new Generation to which files are added.
+
+        Args:
+            name: (str) name of generation; names sort in the order
+              generations are listed
+              '20261018T1200'
+        """
+
+        if '/' in name or name.startswith('.'):
+            raise ValueError('invalid generation name: %s' % name)
+        return Generation(self, name)
+
+    def generations(self):
+        """Return sorted list of names of committed generations."""
+
+        return sorted(filename[:-5] for filename
+                      in os.listdir(os.path.join(self.directory,
+                                                 'generations'))
+                      if filename.endswith('.json'))
+
+    def manifest(self, name):
+        """Return dict mapping names of generation's files to dicts
+        with 'digest' and 'size' keys.
+
+        Args:
+            name: (str) name of generation
+        """
+
+        with open(self._manifest_name(name)) as fh:
+            return json.load(fh)['files']
+
+    def restore(self, name, directory, link=False):
+        """Write files of generation below directory.
+
+        Existing files are replaced; other files are left alone.
+
+        Args:
+            name: (str) name of generation
+            directory: (str) path of directory
+            link: (boolean) whether uncompressed objects are hard-linked
+              rather than copied; files restored so must never be
+              rewritten in place
+        """
+
+        for filename, info in sorted(self.manifest(name).iteritems()):
+            target = os.path.join(directory, filename)
+            _makedirs(os.path.dirname(target))
+            path, compressed = self._find(info['digest'])
+            if path is None:
+                raise IOError(errno.ENOENT, 'object missing from archive',
+                              info['digest'])
+            if compressed:
+                source = gzip.open(path, 'rb')
+            elif link and _link(path, target):
+                continue
+            else:
+                source = open(path, 'rb')
+            with source:
+                with atomicfile.replacing(target, 'wb') as fh:
+                    shutil.copyfileobj(source, fh, BLOCK_SIZE)
+
+    def prune(self, keep):
+        """Delete generations not in keep and objects they alone used.
+
+        Args:
+            keep: (iterable) names of generations to be kept
+        """
+
+        keep = set(keep)
+        for name in self.generations():
+            if name not in keep:
+                os.remove(self._manifest_name(name))
+        used = set()
+        for name in self.generations():
+            used.update(info['digest']
+                        for info in self.manifest(name).itervalues())
+        objects = os.path.join(self.directory, 'objects')
+        for prefix in os.listdir(objects):
+            if not os.path.isdir(os.path.join(objects, prefix)):
+                continue
+            for filename in os.listdir(os.path.join(objects, prefix)):
+                if filename.split('.')[0] not in used:
+                    os.remove(os.path.join(objects, prefix, filename))
+
+    def _manifest_name(self, name):
+        return os.path.join(self.directory, 'generations', name + '.json')
+
+    def _object_name(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], digest)
+
+    def _find(self, digest):
+        """Return path of object and whether it is compressed, or
+        (None, None).
+        """
+
+        path = self._object_name(digest)
+        if os.path.exists(path):
+            return path, False
+        if os.path.exists(path + '.gz'):
+            return path + '.gz', True
+        return None, None
+
+    def _store(self, write):
+        """Store data written by write(fh) unless already stored.
+
+        Returns:
+            tuple of digest and size of data
+        """
+
+        descriptor, temp = tempfile.mkstemp('.tmp', 'new.',
+                                            os.path.join(self.directory,
+                                                         'objects'))
+        try:
+            with os.fdopen(descriptor, 'wb') as raw:
+                if self.compress:
+                    # no name or time in header, so it depends on data only
+                    fh = gzip.GzipFile('', 'wb', 6, raw, 0)
+                else:
+                    fh = raw
+                hashing = _HashingFile(fh)
+                write(hashing)
+                if self.compress:
+                    fh.close()
+            digest = hashing.digest.hexdigest()
+            if self._find(digest)[0] is None:
+                path = self._object_name(digest)
+                if self.compress:
+                    path += '.gz'
+                _makedirs(os.path.dirname(path))
+                os.chmod(temp, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+                os.rename(temp, path)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+        return digest, hashing.size
+
+def _relative(name):
+    """Return name normalized and relative."""
+
+    name = os.path.normpath(name).lstrip(os.sep)
+    if name == '.' or name.startswith('..'):
+        raise ValueError('invalid file name: %s' % name)
+    return name
+
+def _link(path, target):
+    """Replace target with hard link to path.
+
+    Returns:
+        whether target was linked (which fails e.g. if the archive is
+        on another file system)
+    """
+
+    try:
+        atomicfile.link(path, target)
+    except OSError:
+        return False
+    return True
+
+def _makedirs(directory):
+    """Create directory and its parents unless it exists."""
+
+    try:
+        os.makedirs(directory)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
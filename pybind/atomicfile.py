@@ -0,0 +1,164 @@
+"""Functions for replacing files atomically.
+
+A file is written as a temporary file with a random name in the same
+directory, which is renamed to the file's name once it is complete;
+readers such as named see either the old file or the new one, never a
+partial file, and threads or processes writing the same file at once
+each write their own temporary file. The temporary file is removed if
+writing it fails.
+
+A symbolic link is followed, so the file it points to is replaced and
+the link kept. The new file gets the permissions, owner and group of
+the file it replaces (the owner and group only if the process may set
+them, e.g. when run as root), or, if there is none, those open() would
+give it: 0666 less the umask.
+"""
+
+import contextlib
+import errno
+import os
+import stat
+
+_ATTEMPTS = 100  # temporary file names tried before giving up
+
+def _temporary(filename, create):
+    """Call create(name) with an unused temporary name beside filename
+    until it doesn't fail because the name exists; return (name, what
+    create() returns).
+    """
+
+    directory, name = os.path.split(filename)
+    for attempt in range(_ATTEMPTS):
+        temp = os.path.join(directory, '%s.%s.tmp' %
+                            (name, os.urandom(6).encode('hex')))
+        try:
+            return temp, create(temp)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+    raise OSError(errno.EEXIST, 'no unused temporary file name', filename)
+
+def _open(temp):
+    """Create temporary file as open() would, and return its descriptor."""
+
+    return os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0666)
+
+class Replacement(object):
+
+    """Class for a temporary file replacing a file when committed.
+
+    Unlike replacing(), the temporary file may be closed and opened
+    again (e.g. for appending) before it is committed, so many files
+    can be replaced at once without keeping them all open.
+    """
+
+    def __init__(self, filename):
+        """Return a Replacement object, creating its temporary file.
+
+        Args:
+            filename: (str) name of file to be replaced
+              'example.com.hosts'
+        """
+
+        self.filename = os.path.realpath(filename)
+        try:
+            self.temp, descriptor = _temporary(self.filename, _open)
+        except OSError as e:
+            # as open() would raise
+            raise IOError(e.errno, e.strerror, filename)
+        os.close(descriptor)
+
+    def open(self, mode='w'):
+        """Return file object of temporary file.
+
+        Args:
+            mode: (str) mode in which temporary file is opened
+              'a'
+        """
+
+        return open(self.temp, mode)
+
+    def commit(self):
+        """Rename temporary file to file's name, giving it the
+        permissions, owner and group of the file replaced.
+        """
+
+        try:
+            old = os.stat(self.filename)
+        except OSError:
+            pass
+        else:
+            os.chmod(self.temp, stat.S_IMODE(old.st_mode))
+            try:
+                os.chown(self.temp, old.st_uid, old.st_gid)
+            except OSError as e:
+                if e.errno != errno.EPERM:
+                    raise
+        os.rename(self.temp, self.filename)
+
+    def discard(self):
+        """Remove temporary file, unless committed."""
+
+        if os.path.exists(self.temp):
+            os.remove(self.temp)
+
+@contextlib.contextmanager
+def replacing(filename, mode='w'):
+    """Return context manager yielding file object of temporary file
+    renamed to filename when the block exits (or removed if it raises
+    an exception).
+
+    Args:
+        filename: (str) name of file to be replaced
+          'example.com.hosts'
+        mode: (str) mode in which temporary file is opened
+          'wb'
+    """
+
+    replacement = Replacement(filename)
+    try:
+        with replacement.open(mode) as fh:
+            yield fh
+        replacement.commit()
+    except BaseException:
+        replacement.discard()
+        raise
+
+def write(filename, data, mode='w'):
+    """Replace file with one containing data.
+
+    Args:
+        filename: (str) name of file to be replaced
+          'example.com.hosts.manifest'
+        data: (str) contents of file
+        mode: (str) mode in which file is written
+          'wb'
+    """
+
+    with replacing(filename, mode) as fh:
+        fh.write(data)
+
+def link(path, target):
+    """Replace target with hard link to path, so that target exists
+    throughout.
+
+    The link is made under a temporary name in target's directory and
+    renamed to target.
+
+    Args:
+        path: (str) name of existing file
+          'parked.hosts'
+        target: (str) name of link
+          'example.com.hosts'
+
+    Raises:
+        OSError: the link could not be made, e.g. because path is on
+          another file system
+    """
+
+    temp, unused = _temporary(target, lambda temp: os.link(path, temp))
+    try:
+        os.rename(temp, target)
+    except OSError:
+        os.remove(temp)
+        raise
@@ -0,0 +1,359 @@
+"""Classes and functions for writing zones and configurations without
+blocking the caller.
+
+Any object with a write(fh) method (dnszone zones, iscconf.ISCConf
+and its subclasses) can be written by a BatchWriter's worker threads:
+
+  with background.BatchWriter(max_workers=4, max_pending=100) as writer:
+      jobs = [writer.submit(zone, '%s.hosts' % zone.origin)
+              for zone in zones]
+  failed = [job for job in jobs if job.exception()]
+
+submit() returns a WriteJob right away (blocking only while
+max_pending jobs are queued, which holds back producers that outpace
+the writers). Output is rendered in chunks and written to a temporary
+file renamed into place when complete, so a job cancelled while
+running stops at the next chunk and leaves no partial file behind.
+Callbacks added to a job are called in the worker thread; an event
+loop should hand them over to its own thread.
+
+iter_chunks() renders an object in a background thread and yields
+its output chunk by chunk, e.g. for streaming it elsewhere.
+
+Writes are measured by the active instrument.Recorder, if any.
+
+Rendering holds the interpreter lock, so more workers add concurrency
+for file I/O only.
+"""
+
+import Queue
+import sys
+import threading
+
+import atomicfile
+import instrument
+
+CHUNK_SIZE = 65536  # bytes of output collected before each write
+
+PENDING = 'pending'
+RUNNING = 'running'
+FINISHED = 'finished'
+CANCELLED = 'cancelled'
+
+class Cancelled(Exception):
+
+    """Raised when the result of a cancelled job is requested."""
+
+    pass
+
+class WriteJob(object):
+
+    """Class for the pending result of writing an object."""
+
+    def __init__(self, obj, filename):
+        """Return a WriteJob object.
+
+        Args:
+            obj: (object) object with write(fh) method
+            filename: (str) path of file to be written
+        """
+
+        self.obj = obj
+        self.filename = filename
+        self._condition = threading.Condition()
+        self._state = PENDING
+        self._cancel_requested = False
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+
+    def cancel(self):
+        """Cancel job unless it has finished already.
+
+        A running job stops when it next writes a chunk.
+
+        Returns:
+            True unless the job has finished
+        """
+
+        with self._condition:
+            if self._state == FINISHED:
+                return False
+            self._cancel_requested = True
+            pending = self._state == PENDING
+        if pending:
+            self._finish(CANCELLED)
+        return True
+
+    def cancelled(self):
+        """Return whether job was cancelled."""
+
+        return self._state == CANCELLED
+
+    def running(self):
+        """Return whether job is being written."""
+
+        return self._state == RUNNING
+
+    def done(self):
+        """Return whether job has finished or was cancelled."""
+
+        return self._state in (FINISHED, CANCELLED)
+
+    def result(self, timeout=None):
+        """Return number of items written, waiting for job to finish.
+
+        Raises Cancelled if job was cancelled, the exception raised
+        while writing if there was one, or RuntimeError on timeout.
+
+        Args:
+            timeout: (float) seconds to wait; no limit if None
+        """
+
+        self._wait(timeout)
+        if self._state == CANCELLED:
+            raise Cancelled(self.filename)
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self, timeout=None):
+        """Return exception raised while writing, or None, waiting for
+        job to finish.
+
+        Args:
+            timeout: (float) seconds to wait; no limit if None
+        """
+
+        self._wait(timeout)
+        if self._state == CANCELLED:
+            raise Cancelled(self.filename)
+        return self._exception
+
+    def add_done_callback(self, callback):
+        """Arrange for callback(job) to be called when job is done.
+
+        It is called immediately if the job is done already.
+
+        Args:
+            callback: (callable) function taking the job as argument
+        """
+
+        with self._condition:
+            if not self.done():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _wait(self, timeout):
+        """Wait for job to be done."""
+
+        with self._condition:
+            while not self.done():
+                self._condition.wait(timeout)
+                if timeout is not None:
+                    break
+            if not self.done():
+                raise RuntimeError('timed out waiting for %s' % self.filename)
+
+    def _start(self):
+        """Mark job as running; return False if it was cancelled."""
+
+        with self._condition:
+            if self._state != PENDING or self._cancel_requested:
+                return False
+            self._state = RUNNING
+            return True
+
+    def _finish(self, state, result=None, exception=None):
+        """Mark job as done and call callbacks."""
+
+        with self._condition:
+            self._state = state
+            self._result = result
+            self._exception = exception
+            callbacks, self._callbacks = self._callbacks, []
+            self._condition.notify_all()
+        for callback in callbacks:
+            callback(self)
+
+class _ChunkedFile(object):
+
+    """File-like object passing output to sink in chunks and stopping
+    if its job was cancelled.
+    """
+
+    def __init__(self, sink, job, chunk_size=CHUNK_SIZE):
+        self.sink = sink
+        self.job = job
+        self.chunk_size = chunk_size
+        self.parts = []
+        self.size = 0
+
+    def write(self, data):
+        self.parts.append(data)
+        self.size += len(data)
+        if self.size >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.job._cancel_requested:
+            raise Cancelled(self.job.filename)
+        if self.parts:
+            self.sink(''.join(self.parts))
+            self.parts = []
+            self.size = 0
+
+def _run(job, chunk_size):
+    """Write job's object to its file."""
+
+    if not job._start():
+        return
+
+    def write(fh):
+        out = _ChunkedFile(fh.write, job, chunk_size)
+        count = job.obj.write(out)
+        out.flush()
+        return count
+
+    try:
+        with atomicfile.replacing(job.filename) as fh:
+            count = instrument.write(job.obj, fh, job.filename, write)
+    except Cancelled:
+        job._finish(CANCELLED)
+    except Exception:
+        job._finish(FINISHED, exception=sys.exc_info()[1])
+    else:
+        job._finish(FINISHED, result=count)
+
+class BatchWriter(object):
+
+    """Class for writing objects to files in worker threads."""
+
+    def __init__(self, max_workers=4, max_pending=0, chunk_size=CHUNK_SIZE):
+        """Return a BatchWriter object.
+
+        Args:
+            max_workers: (int) number of files written at once
+            max_pending: (int) number of queued jobs at which submit()
+              blocks; no limit if 0
+            chunk_size: (int) bytes of output collected before each write
+        """
+
+        self.chunk_size = chunk_size
+        self._queue = Queue.Queue(max_pending)
+        self._threads = []
+        for i in range(max_workers):
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        return False
+
+    def submit(self, obj, filename, timeout=None):
+        """Queue object to be written; return its WriteJob.
+
+        Blocks while max_pending jobs are queued.
+
+        Args:
+            obj: (object) object with write(fh) method
+            filename: (str) path of file to be written
+            timeout: (float) seconds to wait for room in queue before
+              raising Queue.Full; no limit if None
+        """
+
+        job = WriteJob(obj, filename)
+        self._queue.put(job, True, timeout)
+        return job
+
+    def shutdown(self, wait=True):
+        """Stop worker threads after queued jobs have been written.
+
+        Args:
+            wait: (boolean) whether to wait for threads to stop
+        """
+
+        for thread in self._threads:
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            _run(job, self.chunk_size)
+
+_default_writer = None
+_default_writer_lock = threading.Lock()
+
+def default_writer():
+    """Return BatchWriter shared by write_async() methods."""
+
+    global _default_writer
+    with _default_writer_lock:
+        if _default_writer is None:
+            _default_writer = BatchWriter()
+    return _default_writer
+
+_END = object()  # marks end of iter_chunks() output
+
+def iter_chunks(obj, chunk_size=CHUNK_SIZE, max_chunks=4):
+    """Generate output of object in chunks rendered by another thread.
+
+    Rendering stops once max_chunks chunks are waiting to be consumed,
+    and is abandoned if the generator is closed early.
+
+    Args:
+        obj: (object) object with write(fh) method
+        chunk_size: (int) approximate number of bytes per chunk
+        max_chunks: (int) number of chunks rendered ahead
+    """
+
+    job = WriteJob(obj, None)
+    queue = Queue.Queue(max_chunks)
+
+    def put(item):
+        while not job._cancel_requested:
+            try:
+                queue.put(item, True, 0.1)
+                return
+            except Queue.Full:
+                pass
+        raise Cancelled()
+
+    def render():
+        try:
+            out = _ChunkedFile(put, job, chunk_size)
+            obj.write(out)
+            out.flush()
+            put(_END)
+        except Cancelled:
+            pass
+        except Exception:
+            try:
+                put(sys.exc_info()[1])
+            except Cancelled:
+                pass
+
+    thread = threading.Thread(target=render)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            item = queue.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        job.cancel()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+
+"""Benchmarks for pybind modules.
+
+Run from this directory:
+
+  python bench.py [--sizes 1000,100000] [--memory] [--output results.json]
+  python bench.py --compare old.json new.json
+
+Each benchmark yields microseconds per operation (milliseconds for
+import times), the best of several repetitions; benchmarks over zones
+and configurations are run once for each size (number of records or
+zones) and named with the size in brackets. Synthetic data depends
+only on the size, so results from different versions of pybind can be
+compared. Sizes in the millions need several GB of memory.
+
+--memory adds, for each size, the growth of peak resident set size of
+a new interpreter building a synthetic zone or configuration, along
+with the footprint estimated by memory_usage(), both in kilobytes
+(peak RSS is in kilobytes on Linux only).
+
+--compare reports benchmarks slower in the second file by more than
+the threshold and exits with status 1 if there are any.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+import bindconf
+import dnsrecord
+import dnszone
+import ipvalid
+
+SIZES = (1000, 10000)
+
+def _time(func, number, repeat=3):
+    """Return best time of func in microseconds per call."""
+
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat, number)) / number * 1e6
+
+def _time_sized(func, size):
+    """Return best time of func in microseconds per item of size."""
+
+    return _time(func, 1, 3 if size <= 100000 else 1) / size
+
+def _startup(code, number):
+    """Return best time in milliseconds of new interpreter running code
+    in package's parent directory.
+    """
+
+    parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    best = None
+    for i in range(number):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', code], cwd=parent)
+        elapsed = (time.time() - start) * 1e3
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def _ipv4(i):
+    """Return i-th synthetic IPv4 address."""
+
+    return '10.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255, i & 255)
+
+def make_forward_zone(size):
+    """Return ForwardZone with SOA and NS records plus size records of
+    assorted types.
+    """
+
+    zone = dnszone.ForwardZone('example.com')
+    zone.add_soa('ns1', 'hostmaster')
+    zone.add_ns('ns1')
+    zone.add_ns('ns2')
+    for i in xrange(size):
+        kind = i % 4
+        name = 'host%d' % i
+        if kind == 0 or kind == 1:
+            zone.add_a(_ipv4(i), name)
+        elif kind == 2:
+            zone.add_aaaa('2001:db8::%x:%x' % (i >> 16, i & 0xffff), name)
+        else:
+            zone.add_cname('host%d' % (i - 1), name)
+    return zone
+
+def make_conf(size, views=2):
+    """Return BINDConf with an ACL and size zones spread over views."""
+
+    conf = bindconf.BINDConf()
+    conf.add_acl(bindconf.ACL('internal', ('10.0.0.0/8',)))
+    view_list = []
+    for i in range(views):
+        view = bindconf.View('view%d' % i)
+        view.set_match_destinations('internal')
+        conf.add_view(view)
+        view_list.append(view)
+    for i in xrange(size):
+        zone = bindconf.Zone('zone%d.example.com' % i, 'master',
+                             'master/zone%d.example.com.hosts' % i)
+        zone.set_notify('no')
+        view_list[i % views].add_zone(zone)
+    return conf
+
+def bench_import(number=10):
+    """Time package imports, less interpreter startup time.
+
+    Returns:
+        dict mapping statement to milliseconds
+    """
+
+    statements = ('import pybind',
+                  'import pybind; pybind.ForwardZone',
+                  'import pybind; pybind.BINDConf',
+                  'import pybind; pybind.ForwardZone; pybind.BINDConf')
+    baseline = _startup('pass', number)
+    return dict((s, _startup(s, number) - baseline) for s in statements)
+
+def bench_validation(number=10000):
+    """Time address handling under each validation strategy.
+
+    Returns:
+        dict mapping strategy to dict mapping operation to microseconds
+    """
+
+    zone = bindconf.Zone('example.com', 'master', 'example.com.hosts')
+    masters = bindconf.Masters()
+    operations = (
+        ('A', lambda: dnsrecord.A('host', '192.168.1.1')),
+        ('AAAA', lambda: dnsrecord.AAAA('host', '2001:db8::1')),
+        ('PTR v4', lambda: dnsrecord.PTR('192.168.1.1', 'host.')),
+        ('PTR v6', lambda: dnsrecord.PTR('2001:db8::1', 'host.')),
+        ('set_notify_source', lambda: zone.set_notify_source('192.168.1.1')),
+        ('add_master', lambda: masters.add_master('192.168.1.1')),
+    )
+    results = {}
+    saved = ipvalid.get_validation()
+    try:
+        for validation in (ipvalid.STRICT, ipvalid.FAST, ipvalid.TRUSTED):
+            ipvalid.set_validation(validation)
+            results[validation] = {}
+            for name, func in operations:
+                masters.elements = []
+                results[validation][name] = _time(func, number)
+    finally:
+        ipvalid.set_validation(saved)
+    return results
+
+def _zone_setup():
+    """Create bindconf.Zone with several statements set (each setter
+    calls remove_elements()).
+    """
+
+    zone = bindconf.Zone('example.com', 'slave', 'example.com.hosts')
+    zone.set_notify('no')
+    zone.set_allow_update('none')
+    zone.set_notify_source('192.168.1.1')
+    zone.set_transfer_source('192.168.1.1')
+    zone.set_masters(bindconf.Masters())
+    zone.set_type('master')
+
+def bench_records(number=10000):
+    """Time construction of each record type, reverse name computation
+    and bindconf.Zone setup.
+
+    Returns:
+        dict mapping operation to microseconds
+    """
+
+    ptr = dnsrecord.PTR('192.168.1.1', 'host.')
+    operations = (
+        ('record SOA', lambda: dnsrecord.SOA('@', 'ns1', 'hostmaster',
+                                             2012010100, '3h', '1h', '2d',
+                                             '1h')),
+        ('record NS', lambda: dnsrecord.NS('@', 'ns1')),
+        ('record A', lambda: dnsrecord.A('host', '192.168.1.1')),
+        ('record AAAA', lambda: dnsrecord.AAAA('host', '2001:db8::1')),
+        ('record CNAME', lambda: dnsrecord.CNAME('alias', 'host')),
+        ('record MX', lambda: dnsrecord.MX('@', 10, 'mail')),
+        ('record TXT', lambda: dnsrecord.TXT('@', 'v=spf1 mx ~all')),
+        ('record PTR', lambda: dnsrecord.PTR('192.168.1.1', 'host.')),
+        ('PTR._reverse_name v4', lambda: ptr._reverse_name('192.168.1.1')),
+        ('PTR._reverse_name v6', lambda: ptr._reverse_name('2001:db8::1')),
+        ('bindconf.Zone setup', _zone_setup),
+    )
+    return dict((name, _time(func, number)) for name, func in operations)
+
+def bench_sized(size):
+    """Time zone and configuration benchmarks for size records/zones.
+
+    Returns:
+        dict mapping benchmark name to microseconds per record or zone
+    """
+
+    results = {}
+    results['zone build[%d]' % size] = _time_sized(
+        lambda: make_forward_zone(size), size)
+    results['conf build[%d]' % size] = _time_sized(
+        lambda: make_conf(size), size)
+    zone = make_forward_zone(size)
+    conf = make_conf(size)
+    fd, filename = tempfile.mkstemp(prefix='bench')
+    os.close(fd)
+    try:
+        results['zone write_file[%d]' % size] = _time_sized(
+            lambda: zone.write_file(filename), size)
+        results['conf write_file[%d]' % size] = _time_sized(
+            lambda: conf.write_file(filename), size)
+    finally:
+        os.remove(filename)
+    results['conf check[%d]' % size] = _time_sized(conf.check, size)
+    return results
+
+def _peak_rss(make, size):
+    """Return growth in KB of peak RSS of new interpreter calling
+    function make of this module with size.
+    """
+
+    code = ('import resource, bench\n'
+            'usage = lambda: resource.getrusage(resource.RUSAGE_SELF)\n'
+            'before = usage().ru_maxrss\n'
+            'obj = bench.%s(%d)\n'
+            'print usage().ru_maxrss - before\n' % (make, size))
+    directory = os.path.dirname(os.path.abspath(__file__))
+    return int(subprocess.check_output([sys.executable, '-c', code],
+                                       cwd=directory))
+
+def bench_memory(size):
+    """Measure peak RSS and estimated footprint for size records/zones.
+
+    Returns:
+        dict mapping benchmark name to kilobytes
+    """
+
+    results = {}
+    for kind, make in (('zone', 'make_forward_zone'), ('conf', 'make_conf')):
+        results['%s peak rss KB[%d]' % (kind, size)] = _peak_rss(make, size)
+        usage = globals()[make](size).memory_usage()
+        results['%s estimated KB[%d]' % (kind, size)] = usage['bytes'] / 1024.
+    return results
+
+def run(sizes=SIZES, memory=False):
+    """Run all benchmarks.
+
+    Args:
+        sizes: (sequence) numbers of records/zones
+        memory: (boolean) whether to measure memory use too
+
+    Returns:
+        dict with 'results' mapping benchmark name to time (or memory),
+        and information about the run
+    """
+
+    results = bench_records()
+    for validation, timings in bench_validation().iteritems():
+        for name, value in timings.iteritems():
+            results['%s %s' % (validation, name)] = value
+    for statement, value in bench_import().iteritems():
+        results['import: %s' % statement] = value
+    for size in sizes:
+        results.update(bench_sized(size))
+        if memory:
+            results.update(bench_memory(size))
+    parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    version = subprocess.check_output(
+        [sys.executable, '-c', 'import pybind; print pybind.__version__'],
+        cwd=parent).strip()
+    return {'pybind': version,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': int(time.time()),
+            'results': results}
+
+def compare(old, new, threshold=0.1):
+    """Return list of (name, old time, new time) of benchmarks slower
+    in new results by more than threshold (a fraction of old time).
+
+    Args:
+        old: (dict) results as returned by run()
+        new: (dict) results as returned by run()
+        threshold: (float) tolerated slowdown
+    """
+
+    slower = []
+    for name in sorted(set(old['results']) & set(new['results'])):
+        before = old['results'][name]
+        after = new['results'][name]
+        if after > before * (1 + threshold):
+            slower.append((name, before, after))
+    return slower
+
+def main():
+    parser = argparse.ArgumentParser(description='Run pybind benchmarks.')
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)),
+                        help='comma-separated numbers of records/zones')
+    parser.add_argument('--memory', action='store_true',
+                        help='measure memory use too')
+    parser.add_argument('--output', help='file to which JSON is written')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two JSON result files')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='tolerated slowdown for --compare')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as fh:
+            old = json.load(fh)
+        with open(args.compare[1]) as fh:
+            new = json.load(fh)
+        slower = compare(old, new, args.threshold)
+        for name, before, after in slower:
+            print '%-50s %10.3f %10.3f %+6.0f%%' % (
+                name, before, after, (after / before - 1) * 100)
+        sys.exit(1 if slower else 0)
+
+    report = run([int(s) for s in args.sizes.split(',')], args.memory)
+    for name in sorted(report['results']):
+        print '%-60s %12.3f' % (name, report['results'][name])
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=1, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
@@ -16,12 +16,26 @@ Some restrictions are enforced here (e.g. you can't define an ACL
 within a view clause), but don't count on them to guarantee a working
 configuration. After all, "BIND allows a daunting list of
 configuration entities."
-"""
 
-import ipaddr
+BINDConf.check() verifies some of the others (ordering of ACL and
+masters definitions, masters statements by zone type, duplicate
+zones) in a single pass without writing the configuration; it is
+still no substitute for named-checkconf(8).
+"""
 
+import ipvalid
 import iscconf
 
+# statements whose stanza is an address match list
+_ADDRESS_MATCH_LISTS = ('allow-notify', 'allow-query', 'allow-query-cache',
+                        'allow-query-on', 'allow-recursion',
+                        'allow-recursion-on', 'allow-transfer',
+                        'allow-update', 'allow-update-forwarding',
+                        'blackhole', 'match-clients', 'match-destinations')
+
+# ACL names that need no definition
+_BUILTIN_ACLS = ('any', 'none', 'localhost', 'localnets')
+
 class BINDConf(iscconf.ISCConf):
 
     """Class for BIND configuration."""
@@ -64,6 +78,158 @@ class BINDConf(iscconf.ISCConf):
             raise TypeError('%s is not a View' % view)
         self.add_element(view)
 
+    def check(self):
+        """Return list of consistency errors found in configuration.
+
+        Elements are examined once, in the order in which they will be
+        written, so references to ACLs and named masters lists
+        defined later are reported as undefined. An empty list
+        doesn't mean named will accept the configuration.
+        """
+
+        errors = []
+        acls = set(_BUILTIN_ACLS)
+        masters = set()
+        views = set()
+        zones = set()  # (name, class) of zones outside views
+        has_views = False
+        has_zones = False
+        for element in self.elements:
+            if element.label == 'acl':
+                name = _unquote(element.value[0])
+                if name in acls:
+                    errors.append('acl "%s": already defined' % name)
+                _check_address_match_list(element, acls, errors,
+                                          'acl "%s": ' % name)
+                acls.add(name)
+            elif element.label == 'masters':
+                name = _unquote(element.additional[0])
+                if name in masters:
+                    errors.append('masters "%s": already defined' % name)
+                _check_masters_names(element, masters, errors,
+                                     'masters "%s": ' % name)
+                masters.add(name)
+            elif element.label == 'view':
+                has_views = True
+                key = (_unquote(element.additional[0]),
+                       element.additional[1])
+                context = 'view "%s": ' % key[0]
+                if key in views:
+                    errors.append('%salready defined' % context)
+                views.add(key)
+                _check_view(element, acls, masters, errors, context)
+            elif element.label == 'zone':
+                has_zones = True
+                _check_zone(element, acls, masters, zones, errors, '')
+            elif element.label in _ADDRESS_MATCH_LISTS:
+                _check_address_match_list(element, acls, errors, '')
+        if has_views and has_zones:
+            errors.append('when using views, all zones must be in views')
+        return errors
+
+def _unquote(name):
+    """Return name without surrounding double quotes."""
+
+    return str(name).strip('"')
+
+def _check_address_match_list(stmt, acls, errors, context):
+    """Append errors for references to undefined ACLs in statement.
+
+    Args:
+        stmt: (iscconf.Statement) statement with address match list stanza
+        acls: (set) names of ACLs defined so far
+        errors: (list) list to which error messages are appended
+        context: (str) prefix for error messages
+    """
+
+    for item in stmt.stanza:
+        item = str(item).lstrip('! ')
+        if not item or item[0] in '0123456789{' or ':' in item or \
+           item.startswith('key '):
+            # address, prefix, nested list or key
+            continue
+        name = _unquote(item)
+        if name not in acls:
+            errors.append('%s%s: undefined acl "%s"' %
+                          (context, stmt.label, name))
+
+def _check_masters_names(clause, masters, errors, context):
+    """Append errors for references to undefined masters lists in
+    masters clause.
+
+    Args:
+        clause: (iscconf.Clause) Masters or NamedMasters object
+        masters: (set) names of masters lists defined so far
+        errors: (list) list to which error messages are appended
+        context: (str) prefix for error messages
+    """
+
+    for element in clause.elements:
+        label = str(element.label)
+        if label[0] in '0123456789' or ':' in label:
+            continue
+        if _unquote(label) not in masters:
+            errors.append('%sundefined masters "%s"' %
+                          (context, _unquote(label)))
+
+def _check_view(view, acls, masters, errors, context):
+    """Append errors found in view clause.
+
+    Args:
+        view: (View) view to be checked
+        acls: (set) names of ACLs defined so far
+        masters: (set) names of masters lists defined so far
+        errors: (list) list to which error messages are appended
+        context: (str) prefix for error messages
+    """
+
+    zones = set()
+    for element in view.elements:
+        if element.label == 'zone':
+            _check_zone(element, acls, masters, zones, errors, context)
+        elif element.label in ('acl', 'masters'):
+            errors.append('%s%s not allowed in view' %
+                          (context, element.label))
+        elif element.label in _ADDRESS_MATCH_LISTS:
+            _check_address_match_list(element, acls, errors, context)
+
+def _check_zone(zone, acls, masters, zones, errors, context):
+    """Append errors found in zone clause.
+
+    Args:
+        zone: (Zone) zone to be checked
+        acls: (set) names of ACLs defined so far
+        masters: (set) names of masters lists defined so far
+        zones: (set) (name, class) of zones already seen in same view;
+          updated with this zone
+        errors: (list) list to which error messages are appended
+        context: (str) prefix for error messages
+    """
+
+    name = _unquote(zone.additional[0])
+    class_ = zone.additional[1] if len(zone.additional) > 1 else 'IN'
+    key = (name.lower().rstrip('.'), class_.upper())
+    context = '%szone "%s": ' % (context, name)
+    if key in zones:
+        errors.append('%salready defined' % context)
+    zones.add(key)
+    type_ = None
+    has_masters = False
+    for element in zone.elements:
+        if element.label == 'type':
+            type_ = element.value[0] if element.value else None
+        elif element.label == 'masters':
+            has_masters = True
+            _check_masters_names(element, masters, errors, context)
+        elif element.label in _ADDRESS_MATCH_LISTS:
+            _check_address_match_list(element, acls, errors, context)
+    if type_ is None:
+        errors.append('%smissing type' % context)
+    elif type_ in ('master', 'primary') and has_masters:
+        errors.append('%smasters not allowed in %s zone' % (context, type_))
+    elif type_ in ('slave', 'secondary', 'stub') and not has_masters:
+        errors.append('%smissing masters in %s zone' % (context, type_))
+
 class _OptionsAndViewAndZone(object):
 
     """Abstract class for Options, View, and Zone classes.
@@ -83,7 +249,7 @@ class _OptionsAndViewAndZone(object):
         """
 
         # this is factored out of set_*_source methods
-        if ipaddr.IPAddress(ip).version == 4:
+        if ipvalid.ip_version(ip) == 4:
             label = directive
         else:
             label = '%s-v6' % directive
@@ -193,7 +359,7 @@ class _Masters(object):
             key: (str) authentication key for IP address
         """
 
-        ip = ipaddr.IPAddress(master)
+        ip = ipvalid.ip_address(master)
         value = []
         if port:
             value.extend(['port', port])
@@ -277,6 +443,18 @@ class View(iscconf.Clause, _OptionsAndViewAndZone, _OptionsAndView,
             raise TypeError('element is not a Zone')
         self.add_element(zone)
 
+    def set_match_clients(self, *addresses):
+        """Set view's match-clients statement.
+
+        Args:
+            addresses: (tuple) IP addresses in the address match list
+              ('192.168.1.1', '192.168.1.2')
+        """
+
+        self.remove_elements('match-clients')
+        stmt = iscconf.Statement('match-clients', stanza=addresses)
+        self.add_element(stmt)
+
     def set_match_destinations(self, *addresses):
         """Set view's match-destinations statement.
 
@@ -0,0 +1,55 @@
+"""Module placeholders importing the module on first attribute access.
+
+Modules that a module uses only in some of its functions (e.g. for
+writing files, or threading for concurrency) are bound to placeholders
+at the top of the module, so importing the module doesn't import them:
+
+  import deferred
+  atomicfile = deferred.module('atomicfile', globals())
+
+  def write_file(self, filename):
+      with atomicfile.replacing(filename) as fh:
+          ...
+
+The module is imported as an import statement in the module using it
+would import it (so sibling modules of a package are found), and its
+attributes are looked up on each access, so module globals such as
+instrument.recorder are seen as they change.
+"""
+
+class _DeferredModule(object):
+
+    """Placeholder for a module imported on first attribute access."""
+
+    def __init__(self, name, importer):
+        self._name = name
+        self._importer = importer
+        self._module = None
+
+    def __getattr__(self, name):
+        module = self._module
+        if module is None:
+            module = self._load()
+        return getattr(module, name)
+
+    def __repr__(self):
+        return '<deferred module %r>' % self._name
+
+    def _load(self):
+        """Import module, and return it."""
+
+        # as 'import name' in the importer binds it
+        self._module = __import__(self._name, self._importer)
+        return self._module
+
+def module(name, importer):
+    """Return placeholder for module, imported when first used.
+
+    Args:
+        name: (str) name of module (not dotted), as in an import
+          statement
+          'atomicfile'
+        importer: (dict) globals() of module using it
+    """
+
+    return _DeferredModule(name, importer)
@@ -1,11 +1,315 @@
-"""Classes for creating DNS resource records."""
+"""Classes for creating DNS resource records.
+
+Addresses are validated according to the strategy set with
+ipvalid.set_validation().
+
+The data of each record type is declared once, as a schema listing its
+fields and their kinds (e.g. NAME, U16). A _Schema is compiled when
+the module is imported into functions rendering the fields' values as
+text (a single string formatting operation, done when a record is
+created), parsing that text back into values, and encoding the values
+in DNS wire format. Records keep only their rendered data, so
+to_wire() and digest() parse it when called; they also work for
+records whose data was set directly (e.g. loaded from a snapshot).
+
+Names in wire format are made absolute against the origin passed to
+to_wire() or digest(); escaped dots in labels are not supported.
+"""
+
+import operator
+import re
+import struct
+
+import deferred
+import ipvalid
+
+hashlib = deferred.module('hashlib', globals())
+socket = deferred.module('socket', globals())
+
+# kinds of fields in record data
+NAME = 'name'  # domain name
+U8 = 'u8'  # unsigned integers
+U16 = 'u16'
+U32 = 'u32'
+TIME = 'time'  # 32-bit number of seconds, in any of BIND's time formats
+STRING = 'string'  # character-string, quoted
+TEXT = 'text'  # quoted text of any length (one or more character-strings)
+TAG = 'tag'  # character-string, not quoted
+VALUE = 'value'  # quoted text without length in wire format
+HEX = 'hex'  # hexadecimal data; must be the last field
+IPV4 = 'ipv4'
+IPV6 = 'ipv6'
+
+_FORMATS = {U8: '%d', U16: '%d', U32: '%d', STRING: '"%s"', TEXT: '"%s"',
+            VALUE: '"%s"'}
+
+_INT_FORMATS = {U8: 'B', U16: 'H', U32: 'I', TIME: 'I'}
+
+_CLASSES = {'IN': 1, 'CH': 3, 'HS': 4}
+
+# quoted string (without quotes) or other token, ignoring parentheses
+_TOKEN_PATTERN = r'"((?:[^"\\]|\\.)*)"|([^\s()]+)'
+
+# escaped character or decimal byte value in quoted string
+_ESCAPE_PATTERN = r'(?s)\\(\d{3}|.)'
+
+_TIME_PATTERN = r'(?i)(\d+)([wdhms]?)'
+_TIME_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+_regexes = {}  # pattern: regular expression, compiled on first use
+
+def _regex(pattern):
+    """Return compiled regular expression of pattern."""
+
+    regex = _regexes.get(pattern)
+    if regex is None:
+        regex = _regexes[pattern] = re.compile(pattern)
+    return regex
+
+def _unescape(text):
+    """Return quoted string text (without its quotes) with \\X and
+    \\DDD escapes replaced by the characters they stand for.
+    """
+
+    if '\\' not in text:
+        return text
+
+    def replace(match):
+        escaped = match.group(1)
+        if len(escaped) == 1:
+            return escaped
+        if int(escaped) > 255:
+            raise ValueError('invalid escape in string: %s' % text)
+        return chr(int(escaped))
+
+    return _regex(_ESCAPE_PATTERN).sub(replace, text)
+
+def _seconds(value):
+    """Return number of seconds of time value.
+
+    Args:
+        value: (str or int) time value
+          '1h30m'
+    """
+
+    if isinstance(value, (int, long)):
+        return value
+    value = str(value).strip()
+    seconds = 0
+    position = 0
+    for match in _regex(_TIME_PATTERN).finditer(value):
+        if match.start() != position:
+            break
+        seconds += int(match.group(1)) * _TIME_UNITS[match.group(2).lower()]
+        position = match.end()
+    if not value or position != len(value):
+        raise ValueError('invalid time value: %s' % value)
+    return seconds
+
+def _wire_name(name, origin):
+    """Return domain name in uncompressed wire format.
+
+    Args:
+        name: (str) absolute or relative name, or '@'
+        origin: (str) absolute name against which name is resolved
+    """
+
+    if name == '@' or not name.endswith('.'):
+        if origin is None:
+            raise ValueError('relative name %s needs an origin' % name)
+        if not origin.endswith('.'):
+            origin += '.'
+        if name == '@':
+            name = origin
+        elif origin == '.':
+            name += '.'
+        else:
+            name = '%s.%s' % (name, origin)
+    labels = name[:-1].split('.') if name != '.' else ()
+    wire = []
+    for label in labels:
+        if not 0 < len(label) < 64:
+            raise ValueError('invalid label in name: %s' % name)
+        wire.append(chr(len(label)))
+        wire.append(label)
+    wire.append('\0')
+    return ''.join(wire)
+
+def _wire_string(value, origin=None):
+    """Return character-string in wire format."""
+
+    if len(value) > 255:
+        raise ValueError('character-string longer than 255: %s' % value)
+    return chr(len(value)) + value
+
+def _wire_text(value, origin=None):
+    """Return text as character-strings of up to 255 bytes."""
+
+    return ''.join(_wire_string(value[i:i + 255])
+                   for i in xrange(0, max(len(value), 1), 255))
+
+def _wire_ipv4(value, origin=None):
+    return struct.pack('!4B', *[int(octet) for octet in value.split('.')])
+
+def _wire_ipv6(value, origin=None):
+    return socket.inet_pton(socket.AF_INET6, value)
+
+_ENCODERS = {NAME: _wire_name, STRING: _wire_string, TAG: _wire_string,
+             TEXT: _wire_text, VALUE: lambda value, origin: value,
+             HEX: lambda value, origin: value.decode('hex'),
+             IPV4: _wire_ipv4, IPV6: _wire_ipv6}
+
+def _compile_encoder(kinds):
+    """Return function returning wire format of data values.
+
+    Runs of integer fields are packed with a single struct.Struct.
+    """
+
+    steps = []  # (start, stop, function of values[start:stop], origin)
+    i = 0
+    while i < len(kinds):
+        j = i
+        while j < len(kinds) and kinds[j] in _INT_FORMATS:
+            j += 1
+        if j > i:
+            pack = struct.Struct('!' + ''.join(_INT_FORMATS[kind] for kind
+                                               in kinds[i:j])).pack
+            converters = [_seconds if kind == TIME else int
+                          for kind in kinds[i:j]]
+
+            def step(values, origin, pack=pack, converters=converters):
+                return pack(*[convert(value) for convert, value
+                              in zip(converters, values)])
+
+            steps.append((i, j, step))
+            i = j
+        else:
+            encode = _ENCODERS[kinds[i]]
+            steps.append((i, i + 1,
+                          lambda values, origin, encode=encode:
+                          encode(values[0], origin)))
+            i += 1
+
+    def encoder(values, origin):
+        return ''.join([step(values[start:stop], origin)
+                        for start, stop, step in steps])
+
+    return encoder
+
+def _compile_parser(kinds):
+    """Return function returning tuple of values of fields in data text.
+
+    Data without quoted strings (that of most types) is split with
+    str.split() rather than the token regular expression.
+    """
+
+    count = len(kinds)
+    quoted = any(kind in (STRING, TEXT, VALUE) for kind in kinds)
+    joined = kinds[-1] == HEX  # last field may be split by spaces
+    integers = [i for i, kind in enumerate(kinds) if kind in (U8, U16, U32)]
+
+    def parser(data):
+        text = str(data)
+        if quoted or '"' in text:
+            tokens = [bare or _unescape(quoted_) for quoted_, bare
+                      in _regex(_TOKEN_PATTERN).findall(text)]
+        else:
+            if '(' in text or ')' in text:
+                text = text.replace('(', ' ').replace(')', ' ')
+            tokens = text.split()
+        if joined and len(tokens) > count:
+            tokens[count - 1:] = [''.join(tokens[count - 1:])]
+        if len(tokens) != count:
+            raise ValueError('%d fields expected in data: %s' %
+                             (count, data))
+        for i in integers:
+            tokens[i] = int(tokens[i])
+        return tuple(tokens)
+
+    return parser
+
+class _Schema(object):
+
+    """Class for compiled description of a record type's data."""
+
+    def __init__(self, code, fields, format_=None):
+        """Return a _Schema object.
+
+        Args:
+            code: (int) record type's number
+              33
+            fields: (sequence) (name, kind) pairs of data fields
+              (('preference', U16), ('mail_exchanger', NAME))
+            format_: (str) format of data text; the fields' formats
+              separated by spaces if None
+              '%s %s (%d %s %s %s %s)'
+        """
 
-import ipaddr
+        self.code = code
+        self.fields = tuple(fields)
+        self.kinds = tuple(kind for name, kind in self.fields)
+        if format_ is None:
+            format_ = ' '.join(_FORMATS.get(kind, '%s')
+                               for kind in self.kinds)
+        if format_ == '%s':
+            # data is the value itself (e.g. an ipaddr object)
+            self.render = operator.itemgetter(0)
+        else:
+            self.render = format_.__mod__
+        # parse(data) returns tuple of values of fields in data text
+        # rendered by render(): integers as int, other values as strings
+        # without quotes, and with escapes in quoted strings (\\" or
+        # \\034) replaced
+        self.parse = _compile_parser(self.kinds)
+        self.encode = _compile_encoder(self.kinds)
+
+class _SharedName(object):
+
+    """Descriptor returning name shared in the record's names.NameTable.
+
+    Records keep their name and data in their own attributes, which
+    take precedence over this descriptor, unless share_names() was
+    called.
+    """
+
+    def __init__(self, attribute):
+        self.attribute = attribute  # attribute holding ID of name
+
+    def __get__(self, record, class_=None):
+        if record is None:
+            return self
+        return record._table.name(getattr(record, self.attribute))
+
+class _SharedData(_SharedName):
+
+    """Descriptor returning data whose names are shared in the record's
+    names.NameTable: a single name, or a tuple of field values with
+    names as IDs.
+    """
+
+    def __get__(self, record, class_=None):
+        if record is None:
+            return self
+        value = getattr(record, self.attribute)
+        name = record._table.name
+        if isinstance(value, tuple):
+            return record._schema.render(tuple(
+                name(value) if kind == NAME else value
+                for kind, value in zip(record._schema.kinds, value)))
+        return name(value)
 
 class _ResourceRecord(object):
 
     """Base DNS resource record object."""
 
+    _schema = None  # _Schema of record type's data
+    name = _SharedName('_name')
+    data = _SharedData('_data')
+    # defaults of attributes left out of records sharing names
+    ttl = None
+    class_ = 'IN'
+    comment = None
+
     def __init__(self, name, data, ttl=None, class_='IN', comment=None):
         """Return a _ResourceRecord object.
 
@@ -28,6 +332,70 @@ class _ResourceRecord(object):
         self.class_ = class_
         self.comment = comment
 
+    def share_names(self, table):
+        """Store name, and names in data (e.g. the target of an NS,
+        CNAME or MX record), in table and keep only their IDs.
+
+        Data with several fields is kept as a tuple of their values,
+        shared by records with the same data, and rendered again when
+        read; it is left alone unless rendering it gives the same text.
+        The record references table, so the table lives as long as it.
+
+        The IDs are meaningful only in this process, so such records
+        should not be pickled.
+
+        Args:
+            table: (names.NameTable) table in which names are stored
+        """
+
+        if self.__dict__.get('_table') is table:
+            return
+        # read first, as names shared in another table are rendered
+        # from it; the attributes are copied to a new dict, as deleting
+        # from an instance's dict and adding to it would make the dict
+        # grow, and attributes with their class's default are left out
+        # to keep it small with the table added
+        name = self.name
+        data = self.data
+        attributes = {'_table': table, '_name': table.intern(name)}
+        shared = self._share_data(data, table)
+        if shared is None:
+            attributes['data'] = data
+        else:
+            attributes['_data'] = shared
+        class_ = type(self)
+        for key, value in self.__dict__.iteritems():
+            if key in ('name', 'data', '_name', '_data', '_table'):
+                continue
+            if key in ('ttl', 'class_', 'comment') and \
+               value == getattr(class_, key):
+                continue
+            attributes[key] = value
+        self.__dict__ = attributes
+
+    def _share_data(self, data, table):
+        """Return data to be stored by share_names(), or None if data
+        contains no names or can't be shared.
+        """
+
+        schema = self._schema
+        if schema is None or NAME not in schema.kinds:
+            return None
+        if schema.kinds == (NAME,):
+            return table.intern(data)
+        if not isinstance(data, basestring):
+            return None
+        try:
+            values = schema.parse(data)
+        except ValueError:
+            return None
+        if schema.render(values) != data:
+            return None
+        return table.share(tuple(table.intern(value) if kind == NAME
+                                 else value
+                                 for kind, value in zip(schema.kinds,
+                                                        values)))
+
     def __str__(self):
         comment_field = ''
         if self.comment:
@@ -38,24 +406,84 @@ class _ResourceRecord(object):
                                     self.class_, self.__class__.__name__,
                                     self.data)
 
+    def rdata(self):
+        """Return tuple of values of record's data fields."""
+
+        values = self.__dict__.get('_data')
+        if values is None:
+            return self._schema.parse(self.data)
+        # shared by share_names(): names are resolved, not parsed
+        name = self._table.name
+        if not isinstance(values, tuple):
+            return (name(values),)
+        return tuple(name(value) if kind == NAME else value
+                     for kind, value in zip(self._schema.kinds, values))
+
+    def to_wire(self, origin=None, ttl=0):
+        """Return record in uncompressed DNS wire format.
+
+        Args:
+            origin: (str) name against which relative names are resolved
+              'example.com.'
+            ttl: (str or int) time-to-live used if record has none
+        """
+
+        rdata = self._schema.encode(self.rdata(), origin)
+        return (_wire_name(self.name, origin) +
+                struct.pack('!HHIH', self._schema.code,
+                            _CLASSES[self.class_.upper()],
+                            _seconds(self.ttl or ttl), len(rdata)) +
+                rdata)
+
+    def digest(self, origin=None):
+        """Return SHA-1 hex digest of record's owner, type, class and
+        data (but not TTL), ignoring the case of names.
+
+        Records with the same digest are duplicates, however their
+        data was spelled (e.g. '10' or '10s', relative or absolute
+        names).
+
+        Args:
+            origin: (str) name against which relative names are resolved
+              'example.com.'
+        """
+
+        schema = self._schema
+        values = tuple(value.lower() if kind == NAME else value
+                       for kind, value in zip(schema.kinds, self.rdata()))
+        if origin is not None:
+            origin = origin.lower()
+        rdata = schema.encode(values, origin)
+        return hashlib.sha1(_wire_name(self.name.lower(), origin) +
+                            struct.pack('!HH', schema.code,
+                                        _CLASSES[self.class_.upper()]) +
+                            rdata).hexdigest()
+
 class SOA(_ResourceRecord):
 
     """Start of Authority record."""
 
+    _schema = _Schema(6, (('mname', NAME), ('rname', NAME), ('serial', U32),
+                          ('refresh', TIME), ('retry', TIME),
+                          ('expiry', TIME), ('minimum', TIME)),
+                      '%s %s (%d %s %s %s %s)')
+
     def __init__(self, name, mname, rname, serial, refresh, retry,
                  expiry, minimum, ttl=None, comment=None):
         # ensure e-mail address ends with a dot if it contains '@'
         if rname.find('@') > -1 and not rname.endswith('.'):
             rname += '.'
         rname = rname.replace('@', '.')
-        data = '%s %s (%d %s %s %s %s)' % (mname, rname, serial, refresh,
-                                           retry, expiry, minimum)
+        data = self._schema.render((mname, rname, serial, refresh, retry,
+                                    expiry, minimum))
         super(SOA, self).__init__(name, data, ttl, comment=comment)
 
 class NS(_ResourceRecord):
 
     """Name Server record."""
 
+    _schema = _Schema(2, (('name_server', NAME),))
+
     def __init__(self, name, name_server, ttl=None, comment=None):
         super(NS, self).__init__(name, name_server, ttl, comment=comment)
 
@@ -63,22 +491,28 @@ class A(_ResourceRecord):
 
     """IPv4 Address record."""
 
+    _schema = _Schema(1, (('address', IPV4),))
+
     def __init__(self, name, address, ttl=None, comment=None):
-        ip = ipaddr.IPv4Address(address)
+        ip = ipvalid.ipv4_address(address)
         super(A, self).__init__(name, ip, ttl, comment=comment)
 
 class AAAA(_ResourceRecord):
 
     """IPv6 Address record."""
 
+    _schema = _Schema(28, (('address', IPV6),))
+
     def __init__(self, name, address, ttl=None, comment=None):
-        ip = ipaddr.IPv6Address(address)
+        ip = ipvalid.ipv6_address(address)
         super(AAAA, self).__init__(name, ip, ttl, comment=comment)
 
 class CNAME(_ResourceRecord):
 
     """Canonical Name record."""
 
+    _schema = _Schema(5, (('canonical_name', NAME),))
+
     def __init__(self, name, canonical_name, ttl=None, comment=None):
         super(CNAME, self).__init__(name, canonical_name, ttl, comment=comment)
 
@@ -86,42 +520,111 @@ class MX(_ResourceRecord):
 
     """Mail Exchanger record."""
 
+    _schema = _Schema(15, (('preference', U16), ('mail_exchanger', NAME)))
+
     def __init__(self, name, preference, mail_exchanger, ttl=None,
                  comment=None):
-        data = '%d %s' % (preference, mail_exchanger)
+        data = self._schema.render((preference, mail_exchanger))
         super(MX, self).__init__(name, data, ttl, comment=comment)
 
 class TXT(_ResourceRecord):
 
     """Text record."""
 
+    _schema = _Schema(16, (('text', TEXT),))
+
     def __init__(self, name, text, ttl=None, comment=None):
-        super(TXT, self).__init__(name, '"%s"' % text, ttl, comment=comment)
+        data = self._schema.render((text,))
+        super(TXT, self).__init__(name, data, ttl, comment=comment)
+
+class SPF(TXT):
+
+    """Sender Policy Framework record (obsolete; use TXT)."""
+
+    _schema = _Schema(99, (('text', TEXT),))
 
 class PTR(_ResourceRecord):
 
     """Pointer record."""
 
+    _schema = _Schema(12, (('name', NAME),))
+
     def __init__(self, address, name, ttl=None, comment=None):
-        ip = ipaddr.IPAddress(address)
-        reverse = self._reverse_name(ip)
+        reverse = self._reverse_name(address)
         super(PTR, self).__init__(reverse, name, ttl, comment=comment)
 
     def _reverse_name(self, ip):
         """Return IP address's FQDN in the .arpa domain."""
 
-        if ip.version == 4:
-            octets = ip.compressed.split('.')
-            octets.reverse()
-            fqdn = '.'.join(octets) + '.in-addr.arpa.'
-        else:
-            # get reversed address without colons
-            digits = ip.exploded.replace(':', '')[::-1]
-            # add dots
-            rev = '.'.join([digits[i] for i in range(0, len(digits))])
-            # fully qualify
-            fqdn = rev + '.ip6.arpa.'
-        return fqdn
+        return ipvalid.reverse_name(ip)
+
+class SRV(_ResourceRecord):
+
+    """Service Location record."""
+
+    _schema = _Schema(33, (('priority', U16), ('weight', U16),
+                           ('port', U16), ('target', NAME)))
+
+    def __init__(self, name, priority, weight, port, target, ttl=None,
+                 comment=None):
+        data = self._schema.render((priority, weight, port, target))
+        super(SRV, self).__init__(name, data, ttl, comment=comment)
+
+class CAA(_ResourceRecord):
+
+    """Certification Authority Authorization record."""
+
+    _schema = _Schema(257, (('flags', U8), ('tag', TAG), ('value', VALUE)))
+
+    def __init__(self, name, flags, tag, value, ttl=None, comment=None):
+        data = self._schema.render((flags, tag, value))
+        super(CAA, self).__init__(name, data, ttl, comment=comment)
+
+class DNAME(_ResourceRecord):
+
+    """Delegation Name record."""
+
+    _schema = _Schema(39, (('target', NAME),))
+
+    def __init__(self, name, target, ttl=None, comment=None):
+        super(DNAME, self).__init__(name, target, ttl, comment=comment)
+
+class SSHFP(_ResourceRecord):
+
+    """SSH Public Key Fingerprint record."""
+
+    _schema = _Schema(44, (('algorithm', U8), ('fingerprint_type', U8),
+                           ('fingerprint', HEX)))
+
+    def __init__(self, name, algorithm, fingerprint_type, fingerprint,
+                 ttl=None, comment=None):
+        data = self._schema.render((algorithm, fingerprint_type,
+                                    fingerprint))
+        super(SSHFP, self).__init__(name, data, ttl, comment=comment)
+
+class TLSA(_ResourceRecord):
+
+    """TLS Certificate Association record."""
+
+    _schema = _Schema(52, (('usage', U8), ('selector', U8),
+                           ('matching_type', U8),
+                           ('certificate_data', HEX)))
+
+    def __init__(self, name, usage, selector, matching_type,
+                 certificate_data, ttl=None, comment=None):
+        data = self._schema.render((usage, selector, matching_type,
+                                    certificate_data))
+        super(TLSA, self).__init__(name, data, ttl, comment=comment)
+
+class HINFO(_ResourceRecord):
+
+    """Host Information record."""
+
+    _schema = _Schema(13, (('cpu', STRING), ('os', STRING)))
+
+    def __init__(self, name, cpu, os_, ttl=None, comment=None):
+        data = self._schema.render((cpu, os_))
+        super(HINFO, self).__init__(name, data, ttl, comment=comment)
 
 class _NotImplemented(object):
 
@@ -130,12 +633,9 @@ class _NotImplemented(object):
     def __init__(self, *args, **kwargs):
         raise _NotImplementedError
 
-class DNAME(_NotImplemented): pass
-class HINFO(_NotImplemented): pass
 class KEY(_NotImplemented): pass
 class NXT(_NotImplemented): pass
 class SIG(_NotImplemented): pass
-class SRV(_NotImplemented): pass
 
 def run_tests():
     recs = []
@@ -148,6 +648,8 @@ def run_tests():
     recs.append(AAAA('@', '2001:db8::1'))
     recs.append(PTR('192.168.1.1', 'ns1.example.com.'))
     recs.append(PTR('2001:db8::1', 'ns1.example.com.'))
+    recs.append(SRV('_sip._tcp', 0, 5, 5060, 'sip.example.com.'))
+    recs.append(CAA('@', 0, 'issue', 'ca.example.net'))
     for r in recs: print r
 
 if __name__ == '__main__':
@@ -10,9 +10,13 @@ Host names are passed to dnsrecord.ResourceRecord methods unmodified;
 i.e. they must be terminated with a dot ('.') to be interpreted as
 fully qualified domain names (FQDNs)--otherwise they will be
 interpreted relative to $ORIGIN, so be diligent in minding your dots.
+The names of records given to an OverlayZone are compared with those
+of its base zone's records as strings, so they must be spelled the
+same way to match.
 
 IP addresses may be specified in any format accepted by
-ipaddr.IPAddress().
+ipaddr.IPAddress() (or in canonical form only, depending on the
+strategy set with ipvalid.set_validation()).
 
 Time values may be specified either as an integer (seconds) or a
 string in one of BIND's time formats.
@@ -22,14 +26,91 @@ record, for example, adds an MX record for the whole domain unless
 otherwise specified. The 'ttl' keyword argument defaults to None, so
 records will use the zone's default time-to-live (TTL) unless
 otherwise specified.
+
+A TemplateZone is written without an $ORIGIN directive, so named
+interprets its relative names against the name of whichever zone
+loads it; one file can thus serve many zones with identical contents.
+
+A zone is not safe to change from several threads at once unless
+enable_concurrency() has been called on it. After that, add_record()
+and the add_*() methods may be called by any number of threads
+without further locking: each thread appends to a buffer of its own,
+and the buffers are merged into the zone's records (those of each
+thread in the order they were added, threads in the order they first
+added a record) when the records are next read, i.e. by
+iter_records(), write(), write_file() or merge_records(). Records
+added while a zone is being written may or may not be included; other
+methods (e.g. OverlayZone.remove_records()) still require the caller
+to serialize access.
 """
 
+import itertools
+import os
 import time
 
-import ipaddr
-
+import deferred
 import dnsrecord
 
+names = deferred.module('names', globals())
+atomicfile = deferred.module('atomicfile', globals())
+background = deferred.module('background', globals())
+instrument = deferred.module('instrument', globals())
+memusage = deferred.module('memusage', globals())
+shard = deferred.module('shard', globals())
+threading = deferred.module('threading', globals())
+
+def next_serial(epochserial=False, previous=None):
+    """Return default serial number for SOA record.
+
+    Args:
+        epochserial: (boolean) whether to use number of seconds since
+          epoch rather than YYYYMMDD00
+        previous: (int) serial number to be exceeded; if the default
+          doesn't, previous + 1 is returned (e.g. YYYYMMDD01 for a
+          second serial number on the same day)
+    """
+
+    if epochserial:
+        serial = int(time.time())  # number of seconds since epoch
+    else:
+        serial = int(time.strftime('%Y%m%d00'))  # YYYYMMDD00
+    if previous is not None and serial <= previous:
+        serial = previous + 1
+    return serial
+
+class _RecordBuffers(object):
+
+    """Class for collecting records added by several threads."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._buffers = []  # list of each thread's list of records
+
+    def append(self, record):
+        """Add record to current thread's buffer."""
+
+        try:
+            buffer_ = self._local.buffer
+        except AttributeError:
+            buffer_ = self._local.buffer = []
+            with self._lock:
+                self._buffers.append(buffer_)
+        buffer_.append(record)
+
+    def drain(self):
+        """Return list of buffered records, emptying buffers."""
+
+        records = []
+        with self._lock:
+            buffers = list(self._buffers)
+        for buffer_ in buffers:
+            # records appended meanwhile are left for the next drain
+            count = len(buffer_)
+            records.extend(buffer_[:count])
+            del buffer_[:count]
+        return records
+
 class _Zone(object):
 
     """Base DNS zone object."""
@@ -41,6 +122,9 @@ class _Zone(object):
     EXPIRY = '2d'
     NXDOMAIN = '1h'
 
+    _buffers = None  # _RecordBuffers once concurrency is enabled
+    _names = None  # names.NameTable of records' names, if shared
+
     def __init__(self, origin, epochserial=False, ttl=TTL):
         """Return a _Zone object.
 
@@ -60,20 +144,102 @@ class _Zone(object):
         self.records = []  # list of dnsrecord objects
         self.ttl = ttl
 
-    def write_file(self, filename):
+    def write_file(self, filename, generation=None):
         """Write zone file.
 
         Args:
             filename: (str) name of file to be written
               'zonefile.hosts'
+            generation: (archive.Generation) generation in which the
+              file is archived too
+        """
+
+        with atomicfile.replacing(filename) as fh:
+            instrument.write(self, fh, filename)
+        if generation is not None:
+            generation.add_file(filename)
+
+    def write_async(self, filename, writer=None):
+        """Write zone file in a worker thread.
+
+        Args:
+            filename: (str) name of file to be written
+              'zonefile.hosts'
+            writer: (background.BatchWriter) writer to be used; one
+              shared by all callers if None
+
+        Returns:
+            background.WriteJob for the file
         """
 
-        with open(filename, 'w') as fh:
+        if writer is None:
+            writer = background.default_writer()
+        return writer.submit(self, filename)
+
+    def write_shards(self, filename, shards=16, partition='hash',
+                     processes=None, include_format=None, generation=None):
+        """Write zone as top-level file including fragment files,
+        rewriting only files whose contents changed.
+
+        See shard.write_shards() for the arguments.
+
+        Returns:
+            list of names of files written
+        """
+
+        return shard.write_shards(self, filename, shards, partition,
+                                  processes, include_format, generation)
+
+    def write(self, fh):
+        """Write zone to file.
+
+        $ORIGIN is omitted if the zone's origin is None.
+
+        Args:
+            fh: (file) file object
+
+        Returns:
+            number of records written
+        """
+
+        if self.origin is not None:
             fh.write('$ORIGIN %s\n' % self.origin)
-            fh.write('$TTL %s\n' % self.ttl)
-            for record in self.records:
-                fh.write('%s\n' % record)
-        fh.close()
+        fh.write('$TTL %s\n' % self.ttl)
+        count = 0
+        for count, record in enumerate(self.iter_records(), 1):
+            fh.write('%s\n' % record)
+        return count
+
+    def iter_records(self):
+        """Return iterator over records in the order they are written.
+
+        Subclasses not keeping all of their records in self.records
+        override this rather than write_file(); they call
+        merge_records() before reading self.records.
+        """
+
+        self.merge_records()
+        return iter(self.records)
+
+    def memory_usage(self, accountant=None):
+        """Return estimated memory footprint of zone by record type.
+
+        Only records held by the zone itself are counted, not those
+        produced on the fly by iter_records(). See memusage.Accountant
+        for the meaning of the values returned.
+
+        Args:
+            accountant: (memusage.Accountant) accountant to which sizes
+              are added; a new one if None
+        """
+
+        if accountant is None:
+            accountant = memusage.Accountant()
+        self.merge_records()
+        for record in self.records:
+            accountant.add(record, record.__class__.__name__)
+        accountant.add(self, 'zone')
+        return accountant.report()
 
     def add_record(self, record):
         """Add record to zone.
@@ -86,8 +252,58 @@ class _Zone(object):
             record: (dnsrecord.ResourceRecord) record to be added
         """
 
+        if self._names is not None:
+            record.share_names(self._names)
         self.records.append(record)
 
+    def share_names(self, table=None):
+        """Keep names of records in a names.NameTable rather than in
+        each record.
+
+        Applies to records already in the zone and those added later.
+        Names are stored once and referenced by ID, which saves memory
+        when many records have the same name or names with long
+        common suffixes, at the cost of looking names up when they
+        are read (e.g. when the zone is written). Records reference
+        the table, so it is freed with the zone's records.
+
+        Args:
+            table: (names.NameTable) table to be used, e.g. one shared
+              with other versions of the zone; a new one if None
+        """
+
+        if table is None:
+            table = names.NameTable()
+        self._names = table
+        self.merge_records()
+        for record in self.records:
+            record.share_names(table)
+
+    def enable_concurrency(self):
+        """Let add_record() be called by several threads at once.
+
+        Records added afterwards go to per-thread buffers, which are
+        merged into self.records by merge_records().
+        """
+
+        if self._buffers is None:
+            self._buffers = _RecordBuffers()
+            # instance attribute takes precedence over method
+            self.add_record = self._buffers.append
+
+    def merge_records(self):
+        """Move records added by threads to self.records.
+
+        Does nothing unless enable_concurrency() has been called.
+        """
+
+        if self._buffers is not None:
+            records = self._buffers.drain()
+            if self._names is not None:
+                for record in records:
+                    record.share_names(self._names)
+            self.records.extend(records)
+
     def add_soa(self, mname, rname, serial=None, refresh=REFRESH, retry=RETRY,
                 expiry=EXPIRY, nxdomain=NXDOMAIN, name='@', ttl=None):
         """Add Start of Authority record to zone.
@@ -108,11 +324,7 @@ class _Zone(object):
         """
 
         if serial is None:
-            # set default serial number
-            if self.epochserial:
-                serial = int(time.time())  # number of seconds since epoch
-            else:
-                serial = int(time.strftime('%Y%m%d00'))  # YYYYMMDD00
+            serial = next_serial(self.epochserial)
         soa = dnsrecord.SOA(name, mname, rname, serial, refresh, retry,
                             expiry, nxdomain, ttl)
         self.add_record(soa)
@@ -206,6 +418,196 @@ class ForwardZone(_Zone):
         txt = dnsrecord.TXT(name, text, ttl)
         self.add_record(txt)
 
+    def add_srv(self, target, port, priority=0, weight=0, name='@',
+                ttl=None):
+        """Add Service Location record to zone.
+
+        Args:
+            target: (str) host name of host providing service
+              'sip.example.com.'
+            port: (int) port on which service is provided
+              5060
+            priority: (int) priority of target host
+            weight: (int) relative weight of hosts with same priority
+            name: (str) name of node to which this record belongs
+              '_sip._tcp.example.com.'
+            ttl: (str or int) time-to-live
+        """
+
+        srv = dnsrecord.SRV(name, priority, weight, port, target, ttl)
+        self.add_record(srv)
+
+    def add_caa(self, tag, value, flags=0, name='@', ttl=None):
+        """Add Certification Authority Authorization record to zone.
+
+        Args:
+            tag: (str) property tag
+              'issue'
+            value: (str) property value
+              'ca.example.net'
+            flags: (int) flags (128 for critical)
+            name: (str) name of node to which this record belongs
+              'example.com.'
+            ttl: (str or int) time-to-live
+        """
+
+        caa = dnsrecord.CAA(name, flags, tag, value, ttl)
+        self.add_record(caa)
+
+    def add_dname(self, target, name='@', ttl=None):
+        """Add Delegation Name record to zone.
+
+        Args:
+            target: (str) domain name to which subtree is redirected
+              'example.net.'
+            name: (str) name of node to which this record belongs
+              'old.example.com.'
+            ttl: (str or int) time-to-live
+        """
+
+        dname = dnsrecord.DNAME(name, target, ttl)
+        self.add_record(dname)
+
+    def add_sshfp(self, algorithm, fingerprint_type, fingerprint, name='@',
+                  ttl=None):
+        """Add SSH Public Key Fingerprint record to zone.
+
+        Args:
+            algorithm: (int) number of public key algorithm
+              4
+            fingerprint_type: (int) number of fingerprint type
+              2
+            fingerprint: (str) fingerprint in hexadecimal
+            name: (str) name of node to which this record belongs
+              'host.example.com.'
+            ttl: (str or int) time-to-live
+        """
+
+        sshfp = dnsrecord.SSHFP(name, algorithm, fingerprint_type,
+                                fingerprint, ttl)
+        self.add_record(sshfp)
+
+    def add_tlsa(self, usage, selector, matching_type, certificate_data,
+                 name='@', ttl=None):
+        """Add TLS Certificate Association record to zone.
+
+        Args:
+            usage: (int) certificate usage
+              3
+            selector: (int) part of certificate matched
+              1
+            matching_type: (int) how certificate data is matched
+              1
+            certificate_data: (str) data to be matched in hexadecimal
+            name: (str) name of node to which this record belongs
+              '_443._tcp.www.example.com.'
+            ttl: (str or int) time-to-live
+        """
+
+        tlsa = dnsrecord.TLSA(name, usage, selector, matching_type,
+                              certificate_data, ttl)
+        self.add_record(tlsa)
+
+    def add_hinfo(self, cpu, os_, name='@', ttl=None):
+        """Add Host Information record to zone.
+
+        Args:
+            cpu: (str) type of CPU
+              'x86_64'
+            os_: (str) operating system
+              'Linux'
+            name: (str) name of node to which this record belongs
+              'host.example.com.'
+            ttl: (str or int) time-to-live
+        """
+
+        hinfo = dnsrecord.HINFO(name, cpu, os_, ttl)
+        self.add_record(hinfo)
+
+class TemplateZone(ForwardZone):
+
+    """Forward zone whose file is shared by many origins.
+
+    Records are added once and written without $ORIGIN, so names not
+    terminated with a dot are relative to each zone using the file.
+    Origins needing different contents get their own ForwardZone via
+    override(), which starts out sharing the template's record objects.
+    """
+
+    def __init__(self, epochserial=False, ttl=_Zone.TTL):
+        """Return a TemplateZone object.
+
+        Args:
+            epochserial: (boolean) whether to use number of seconds since
+              epoch as default serial number in SOA record
+            ttl: (str or int) default time-to-live for resource records
+        """
+
+        _Zone.__init__(self, '@', epochserial, ttl)
+        self.origin = None  # no $ORIGIN in file
+        self.overrides = {}  # origin: ForwardZone
+
+    def override(self, origin):
+        """Return zone for origin whose contents differ from template.
+
+        The returned ForwardZone holds the template's records as they
+        are now (the record objects themselves are shared, not copied);
+        records added to or removed from it affect only that origin.
+        Calling override() again for the same origin returns the same
+        zone.
+
+        Args:
+            origin: (str) zone's root; '.' will be appended if necessary
+              'example.com'
+        """
+
+        if not origin.endswith('.'):
+            origin += '.'
+        if origin not in self.overrides:
+            zone = ForwardZone(origin, self.epochserial, self.ttl)
+            self.merge_records()
+            zone.records = list(self.records)
+            self.overrides[origin] = zone
+        return self.overrides[origin]
+
+    def write_files(self, filename, origins, filename_format=None):
+        """Write shared file plus one file per overridden origin.
+
+        The template is rendered once. Origins without an override use
+        the shared file; if filename_format is given, each of them gets
+        a hard link to it under its own name (e.g. to keep one file
+        name per zone in named.conf) instead.
+
+        Args:
+            filename: (str) name of shared file to be written
+              'parked.hosts'
+            origins: (iterable) origins of all zones using the template
+              ('example.com', 'example.net')
+            filename_format: (str) format of per-origin file names,
+              with the origin (without trailing dot) substituted;
+              overridden origins use '%s.hosts' if it isn't given
+              '%s.hosts'
+
+        Returns:
+            dict mapping each origin to the name of the file to be
+            used for it in its bindconf.Zone
+        """
+
+        self.write_file(filename)
+        filenames = {}
+        for origin in origins:
+            key = origin if origin.endswith('.') else origin + '.'
+            if key in self.overrides:
+                name = (filename_format or '%s.hosts') % key[:-1]
+                self.overrides[key].write_file(name)
+            elif filename_format:
+                name = filename_format % key[:-1]
+                atomicfile.link(filename, name)
+            else:
+                name = filename
+            filenames[origin] = name
+        return filenames
+
 class ReverseZone(_Zone):
 
     """Reverse DNS zone."""
@@ -224,6 +626,169 @@ class ReverseZone(_Zone):
         ptr = dnsrecord.PTR(address, name, ttl)
         self.add_record(ptr)
 
+class OverlayZone(ForwardZone, ReverseZone):
+
+    """Zone defined as differences from another zone.
+
+    The base zone is referenced, not copied; only records added to,
+    removed from or overridden in the overlay are stored, and they are
+    merged with the base zone's records as the file is written. This
+    suits views whose versions of a zone differ in a few records.
+    Changes made to the base zone are reflected in the overlay.
+    """
+
+    def __init__(self, base, origin=None, ttl=None):
+        """Return an OverlayZone object.
+
+        Args:
+            base: (_Zone) zone whose records are used unless overridden
+              or removed
+            origin: (str) zone's root; defaults to base zone's origin
+              'example.com'
+            ttl: (str or int) default time-to-live for resource records;
+              defaults to base zone's
+        """
+
+        _Zone.__init__(self, origin or base.origin, base.epochserial,
+                       ttl if ttl is not None else base.ttl)
+        self.base = base
+        self.removed = set()  # (name, type) or (name, None) for all types
+        self.overridden = {}  # (name, type): list of dnsrecord objects
+
+    def remove_records(self, name, type_=None):
+        """Hide base zone's records with name (and type).
+
+        Args:
+            name: (str) name of node to which records belong
+              'host'
+            type_: (str) type of records; all types if None
+              'A'
+        """
+
+        self.removed.add((name, type_))
+        for key in self.overridden.keys():
+            if key[0] == name and type_ in (None, key[1]):
+                del self.overridden[key]
+
+    def override_record(self, record):
+        """Replace base zone's records of record's name and type.
+
+        Records overriding the same name and type accumulate, so
+        calling this repeatedly replaces an RRset with several records.
+        They are written in place of the first replaced record.
+
+        Args:
+            record: (dnsrecord.ResourceRecord) record to be used instead
+        """
+
+        key = (record.name, record.__class__.__name__)
+        self.overridden.setdefault(key, []).append(record)
+
+    def memory_usage(self, accountant=None):
+        """Return estimated memory footprint of overlay (not including
+        base zone) by record type.
+
+        Args:
+            accountant: (memusage.Accountant) accountant to which sizes
+              are added; a new one if None
+        """
+
+        if accountant is None:
+            accountant = memusage.Accountant()
+        accountant.ignore(self.base)
+        for records in self.overridden.itervalues():
+            for record in records:
+                accountant.add(record, record.__class__.__name__)
+        return _Zone.memory_usage(self, accountant)
+
+    def iter_records(self):
+        """Return iterator over merged records in the order they are
+        written.
+        """
+
+        self.merge_records()
+        if not self.removed and not self.overridden:
+            return itertools.chain(self.base.iter_records(), self.records)
+        return self._iter_merged()
+
+    def _iter_merged(self):
+        """Generate base zone's records with changes applied, followed
+        by added records.
+        """
+
+        removed = self.removed
+        overridden = self.overridden
+        pending = set(overridden)
+        for record in self.base.iter_records():
+            name = record.name
+            key = (name, record.__class__.__name__)
+            if key in overridden:
+                if key in pending:
+                    pending.remove(key)
+                    for override in overridden[key]:
+                        yield override
+            elif (name, None) not in removed and key not in removed:
+                yield record
+        for key in sorted(pending):
+            for override in overridden[key]:
+                yield override
+        for record in self.records:
+            yield record
+
+class LazyZone(_Zone):
+
+    """Zone whose records are produced while its file is written.
+
+    Records added with add_soa(), add_ns() or add_record() form the
+    header and are written first; the records from the source follow,
+    each being discarded after it has been written, so memory use
+    doesn't depend on the size of the source.
+    """
+
+    def __init__(self, origin, source, factory=None, epochserial=False,
+                 ttl=_Zone.TTL):
+        """Return a LazyZone object.
+
+        Args:
+            origin: (str) zone's root; '.' will be appended if necessary
+              'example.com'
+            source: (callable or iterable) callable returning an iterable
+              (called each time the file is written) or an iterable
+              (consumed by the first write) of items, e.g. a database
+              cursor or csv.reader object
+            factory: (callable) function returning the dnsrecord object
+              for an item; items must be dnsrecord objects if None
+            epochserial: (boolean) whether to use number of seconds since
+              epoch as default serial number in SOA record
+            ttl: (str or int) default time-to-live for resource records
+        """
+
+        _Zone.__init__(self, origin, epochserial, ttl)
+        self.source = source
+        self.factory = factory
+
+    def iter_records(self):
+        """Return iterator over header records followed by the records
+        produced from the source.
+        """
+
+        self.merge_records()
+        items = self.source() if callable(self.source) else self.source
+        if self.factory is not None:
+            items = itertools.imap(self.factory, items)
+        return itertools.chain(self.records, _checked_records(items))
+
+def _checked_records(items):
+    """Generate items, raising TypeError for one that is text rather
+    than a dnsrecord object (which sharding and snapshots need).
+    """
+
+    for item in items:
+        if isinstance(item, basestring):
+            raise TypeError('LazyZone source produced text rather than a '
+                            'dnsrecord object: %r' % item)
+        yield item
+
 def run_tests():
     """Run rudimentary tests of module.
 
@@ -0,0 +1,294 @@
+"""Classes and functions for loading records from inventory exports
+into zones.
+
+Rows are dicts with the keys 'type', 'name', 'data' and optionally
+'ttl', as read from CSV files with a header line or from files with
+one JSON object per line:
+
+  type,name,data,ttl
+  A,www.example.com,192.168.1.1,
+  MX,example.com,10 mail.example.com.,3600
+  PTR,192.168.1.1,www.example.com.,
+
+Names are fully qualified ('.' is appended if necessary), except for
+PTR rows, whose name is the IP address. The data of MX rows is the
+preference followed by the mail exchanger; that of SRV, CAA, DNAME,
+SSHFP, TLSA and HINFO rows is written as in a zone file.
+
+Rows are consumed as they are read; each record is routed to the zone
+whose origin is the longest suffix of the record's name (for PTR
+records, the name in the .arpa domain, so reverse zones match by
+address prefix). Records matching no zone are counted and dropped.
+"""
+
+import collections
+import csv
+import itertools
+import json
+import multiprocessing
+import resource
+
+import atomicfile
+import dnsrecord
+
+# types whose data is given in zone file syntax, e.g. '0 5 5060 sip'
+_PARSED_TYPES = ('SRV', 'CAA', 'DNAME', 'SSHFP', 'TLSA', 'HINFO')
+
+def read_csv(fh, fieldnames=None):
+    """Return iterator over rows of CSV file.
+
+    Args:
+        fh: (file) file object
+        fieldnames: (sequence) field names if file has no header line
+          ('type', 'name', 'data', 'ttl')
+    """
+
+    return csv.DictReader(fh, fieldnames)
+
+def read_jsonl(fh):
+    """Generate rows of file with one JSON object per line.
+
+    Args:
+        fh: (file) file object
+    """
+
+    for line in fh:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def make_record(row):
+    """Return dnsrecord object for row.
+
+    Args:
+        row: (dict) row with 'type', 'name', 'data' and 'ttl' keys
+    """
+
+    type_ = row['type'].upper()
+    name = row['name'].strip()
+    data = row['data'].strip()
+    ttl = row.get('ttl') or None
+    if type_ == 'PTR':
+        return dnsrecord.PTR(name, data, ttl)
+    if not name.endswith('.'):
+        name += '.'
+    if type_ == 'A':
+        return dnsrecord.A(name, data, ttl)
+    elif type_ == 'AAAA':
+        return dnsrecord.AAAA(name, data, ttl)
+    elif type_ == 'CNAME':
+        return dnsrecord.CNAME(name, data, ttl)
+    elif type_ == 'NS':
+        return dnsrecord.NS(name, data, ttl)
+    elif type_ == 'TXT':
+        return dnsrecord.TXT(name, data, ttl)
+    elif type_ == 'SPF':
+        return dnsrecord.SPF(name, data, ttl)
+    elif type_ == 'MX':
+        preference, mail_exchanger = data.split(None, 1)
+        return dnsrecord.MX(name, int(preference), mail_exchanger, ttl)
+    elif type_ in _PARSED_TYPES:
+        class_ = getattr(dnsrecord, type_)
+        values = class_._schema.parse(data)
+        return class_(name, *values, ttl=ttl)
+    raise ValueError('unsupported record type: %s' % row['type'])
+
+def _make_records(rows):
+    """Return list of dnsrecord objects for rows (run by worker
+    processes).
+    """
+
+    return [make_record(row) for row in rows]
+
+def _chunks(rows, size):
+    """Generate lists of up to size rows."""
+
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+class Ingester(object):
+
+    """Class for routing records built from rows to zones."""
+
+    def __init__(self, zones):
+        """Return an Ingester object.
+
+        Args:
+            zones: (iterable) dnszone objects to which records are routed
+
+        Raises:
+            ValueError: a zone has no origin (e.g. a TemplateZone)
+        """
+
+        self.zones = {}  # lower-case origin: zone
+        for zone in zones:
+            if zone.origin is None:
+                raise ValueError('records cannot be routed to zone '
+                                 'without origin: %r' % zone)
+            self.zones[zone.origin.lower()] = zone
+        self.unrouted = 0  # number of records matching no zone
+
+    def route(self, name):
+        """Return zone with longest origin matching name, or None.
+
+        Args:
+            name: (str) fully qualified domain name
+              'www.example.com.'
+        """
+
+        name = name.lower()
+        zones = self.zones
+        while name:
+            zone = zones.get(name)
+            if zone is not None:
+                return zone
+            index = name.find('.')
+            if index < 0:
+                break
+            name = name[index + 1:]
+        return None
+
+    def records(self, rows, processes=None, chunksize=1000):
+        """Generate dnsrecord objects built from rows.
+
+        With processes, records are built by that many worker
+        processes, which are handed chunksize rows at a time; no more
+        than two chunks per process are in flight, which bounds
+        memory use.
+
+        Args:
+            rows: (iterable) rows as returned by read_csv() or
+              read_jsonl()
+            processes: (int) number of worker processes
+            chunksize: (int) number of rows per worker task
+        """
+
+        if not processes:
+            for row in rows:
+                yield make_record(row)
+            return
+        pool = multiprocessing.Pool(processes)
+        try:
+            chunks = _chunks(rows, chunksize)
+            while True:
+                window = list(itertools.islice(chunks, processes * 2))
+                if not window:
+                    break
+                for records in pool.map(_make_records, window):
+                    for record in records:
+                        yield record
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def ingest(self, rows, processes=None, chunksize=1000):
+        """Add records built from rows to their zones.
+
+        Args:
+            rows: (iterable) rows as returned by read_csv() or
+              read_jsonl()
+            processes: (int) number of worker processes
+            chunksize: (int) number of rows per worker task
+
+        Returns:
+            number of records added
+        """
+
+        count = 0
+        for record in self.records(rows, processes, chunksize):
+            zone = self.route(record.name)
+            if zone is None:
+                self.unrouted += 1
+                continue
+            zone.add_record(record)
+            count += 1
+        return count
+
+    def write_files(self, rows, filename_format, processes=None,
+                    chunksize=1000, max_open=None):
+        """Write records built from rows straight to zone files.
+
+        Each zone's file starts with the records already in the zone
+        (e.g. SOA and NS records) followed by the records routed to it,
+        which are written as they are built rather than kept. Files are
+        written as temporary files, all renamed into place once every
+        row has been read (none are if an exception is raised). At
+        most max_open of them are open at once; when another is needed,
+        the least recently written one is closed, and reopened for
+        appending if more records are routed to its zone.
+
+        Args:
+            rows: (iterable) rows as returned by read_csv() or
+              read_jsonl()
+            filename_format: (str) format of file names, with the origin
+              (without trailing dot) substituted
+              '%s.hosts'
+            processes: (int) number of worker processes
+            chunksize: (int) number of rows per worker task
+            max_open: (int) maximum number of files open at once; by
+              default a quarter of the limit on open files of the
+              process (RLIMIT_NOFILE), at most 256
+
+        Returns:
+            dict mapping each origin to the name of its file
+        """
+
+        if max_open is None:
+            soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+            if soft == resource.RLIM_INFINITY:
+                soft = 1024
+            max_open = max(1, min(256, soft // 4))
+        if max_open < 1:
+            raise ValueError('max_open must be at least 1: %s' % max_open)
+        files = collections.OrderedDict()  # origin: file object, LRU first
+        replacements = {}  # origin: atomicfile.Replacement
+        try:
+            for record in self.records(rows, processes, chunksize):
+                zone = self.route(record.name)
+                if zone is None:
+                    self.unrouted += 1
+                    continue
+                fh = files.pop(zone.origin, None)
+                if fh is None:
+                    if len(files) >= max_open:
+                        files.popitem(last=False)[1].close()
+                    fh = self._open(zone, filename_format, replacements)
+                files[zone.origin] = fh
+                fh.write('%s\n' % record)
+            for zone in self.zones.itervalues():
+                if zone.origin not in replacements:
+                    self._open(zone, filename_format, replacements).close()
+            while files:
+                files.popitem()[1].close()
+            for replacement in replacements.itervalues():
+                replacement.commit()
+        finally:
+            for fh in files.itervalues():
+                fh.close()
+            for replacement in replacements.itervalues():
+                replacement.discard()
+        return dict((origin, filename_format % origin[:-1])
+                    for origin in replacements)
+
+    def _open(self, zone, filename_format, replacements):
+        """Return file object of zone's temporary file with header
+        already written, or opened for appending if it was written
+        before.
+        """
+
+        replacement = replacements.get(zone.origin)
+        if replacement is not None:
+            return replacement.open('a')
+        replacement = replacements[zone.origin] = atomicfile.Replacement(
+            filename_format % zone.origin[:-1])
+        fh = replacement.open('w')
+        try:
+            zone.write(fh)
+        except Exception:
+            fh.close()
+            raise
+        return fh
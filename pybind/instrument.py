@@ -0,0 +1,269 @@
+"""Classes and functions for measuring the writing of zone and
+configuration files.
+
+Nothing is measured unless a Recorder is active:
+
+  with instrument.recording() as recorder:
+      with instrument.stage('build', 'example.com.'):
+          zone = build_zone()
+      zone.write_file('example.com.hosts')
+      conf.write_file('named.conf')
+  recorder.write_prometheus('pybind.prom')
+
+While a Recorder is active, dnszone and iscconf writers, and
+background writers (write_async() and scheduler.Scheduler), record for
+each file the number of records (zones) or top-level elements
+(configurations) written, the number of bytes written, the time spent
+in the file object's write() method (io) and the remaining time spent
+rendering (render). Otherwise they check a single module attribute per
+file written. A Recorder may be updated by several threads at once.
+"""
+
+import contextlib
+import time
+
+import atomicfile
+import deferred
+
+json = deferred.module('json', globals())
+threading = deferred.module('threading', globals())
+
+recorder = None  # active Recorder, or None
+
+class _CountingFile(object):
+
+    """File object wrapper counting bytes and time spent writing."""
+
+    def __init__(self, fh):
+        self.fh = fh
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def write(self, data):
+        start = time.time()
+        self.fh.write(data)
+        self.seconds += time.time() - start
+        self.bytes += len(data)
+
+class Recorder(object):
+
+    """Class accumulating measurements of writers and stages."""
+
+    def __init__(self):
+        """Return a Recorder object."""
+
+        # (kind, name): dict of measurements
+        self.files = {}
+        # (stage, name): seconds
+        self.stages = {}
+        self._lock = threading.Lock()  # held while updating or reading
+
+    def measure(self, kind, name, write, fh):
+        """Call write(fh), measuring it; return what write() returns.
+
+        Args:
+            kind: (str) type of output
+              'zone'
+            name: (str) name of output
+              'example.com.'
+            write: (callable) function writing to file object and
+              returning the number of items written
+            fh: (file) file object
+        """
+
+        counting = _CountingFile(fh)
+        start = time.time()
+        count = write(counting)
+        elapsed = time.time() - start
+        with self._lock:
+            stats = self.files.get((kind, name))
+            if stats is None:
+                stats = self.files[(kind, name)] = {
+                    'writes': 0, 'items': 0, 'bytes': 0,
+                    'render_seconds': 0.0, 'io_seconds': 0.0}
+            stats['writes'] += 1
+            stats['items'] += count or 0
+            stats['bytes'] += counting.bytes
+            stats['io_seconds'] += counting.seconds
+            stats['render_seconds'] += elapsed - counting.seconds
+        return count
+
+    @contextlib.contextmanager
+    def stage(self, stage, name=''):
+        """Return context manager adding time spent in it to stage.
+
+        Args:
+            stage: (str) name of stage
+              'build'
+            name: (str) name of zone or configuration
+              'example.com.'
+        """
+
+        start = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            key = (stage, name)
+            with self._lock:
+                self.stages[key] = self.stages.get(key, 0.0) + elapsed
+
+    def as_dict(self):
+        """Return measurements as a dict suitable for JSON."""
+
+        files, stages = self._snapshot()
+        files = [dict(kind=kind, name=name, **stats)
+                 for (kind, name), stats in files]
+        stages = [dict(stage=stage, name=name, seconds=seconds)
+                  for (stage, name), seconds in stages]
+        return {'files': files, 'stages': stages}
+
+    def _snapshot(self):
+        """Return sorted lists of (key, measurements) of files and of
+        (key, seconds) of stages, copied while holding the lock.
+        """
+
+        with self._lock:
+            files = [(key, dict(stats))
+                     for key, stats in self.files.iteritems()]
+            stages = self.stages.items()
+        return sorted(files), sorted(stages)
+
+    def write_json(self, filename):
+        """Write measurements as JSON.
+
+        Args:
+            filename: (str) path of file to be written
+        """
+
+        atomicfile.write(filename, json.dumps(self.as_dict(), indent=1,
+                                               sort_keys=True))
+
+    def prometheus(self):
+        """Return measurements in Prometheus text exposition format."""
+
+        files, stages = self._snapshot()
+        lines = []
+        metrics = (('writes', 'pybind_file_writes_total',
+                    'Number of times file was written.'),
+                   ('items', 'pybind_file_items_total',
+                    'Records or top-level elements written.'),
+                   ('bytes', 'pybind_file_bytes_total',
+                    'Bytes written.'),
+                   ('render_seconds', 'pybind_file_render_seconds_total',
+                    'Time spent rendering.'),
+                   ('io_seconds', 'pybind_file_io_seconds_total',
+                    'Time spent in file writes.'))
+        for key, metric, help_ in metrics:
+            lines.append('# HELP %s %s' % (metric, help_))
+            lines.append('# TYPE %s counter' % metric)
+            for (kind, name), stats in files:
+                lines.append('%s{kind="%s",name="%s"} %r' %
+                             (metric, _escape(kind), _escape(name),
+                              stats[key]))
+        metric = 'pybind_stage_seconds_total'
+        lines.append('# HELP %s Time spent in stage.' % metric)
+        lines.append('# TYPE %s counter' % metric)
+        for (stage, name), seconds in stages:
+            lines.append('%s{stage="%s",name="%s"} %r' %
+                         (metric, _escape(stage), _escape(name), seconds))
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, filename):
+        """Write measurements for node exporter's textfile collector.
+
+        Args:
+            filename: (str) path of file to be written; should end with
+              '.prom'
+        """
+
+        atomicfile.write(filename, self.prometheus())
+
+def _escape(value):
+    """Return value escaped for use as Prometheus label value."""
+
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+def file_key(obj, filename):
+    """Return (kind, name) under which writing object is recorded.
+
+    Zones are recorded by origin, and other objects (configurations) by
+    file name. An object may define a file_key(filename) method to
+    choose it, e.g. one writing another object.
+
+    Args:
+        obj: (object) object with write(fh) method
+        filename: (str) path of file written
+          'example.com.hosts'
+    """
+
+    method = getattr(obj, 'file_key', None)
+    if method is not None:
+        return method(filename)
+    if hasattr(obj, 'origin'):
+        return 'zone', obj.origin or filename
+    return 'config', filename
+
+def write(obj, fh, filename, writer=None):
+    """Call obj.write(fh), measuring it if a Recorder is active;
+    return what it returns.
+
+    Args:
+        obj: (object) object with write(fh) method
+        fh: (file) file object
+        filename: (str) path of file written
+          'example.com.hosts'
+        writer: (callable) function called with fh instead of
+          obj.write, e.g. one writing obj through a buffer
+    """
+
+    if writer is None:
+        writer = obj.write
+    active = recorder
+    if active is None:
+        return writer(fh)
+    kind, name = file_key(obj, filename)
+    return active.measure(kind, name, writer, fh)
+
+@contextlib.contextmanager
+def recording(active=None):
+    """Return context manager activating a Recorder.
+
+    Args:
+        active: (Recorder) recorder to be activated; a new one if None
+    """
+
+    global recorder
+    previous = recorder
+    recorder = active if active is not None else Recorder()
+    try:
+        yield recorder
+    finally:
+        recorder = previous
+
+def stage(stage_, name=''):
+    """Return context manager timing stage if a Recorder is active.
+
+    Args:
+        stage_: (str) name of stage
+          'build'
+        name: (str) name of zone or configuration
+          'example.com.'
+    """
+
+    if recorder is None:
+        return _NULL_STAGE
+    return recorder.stage(stage_, name)
+
+class _NullStage(object):
+
+    """Context manager doing nothing."""
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_STAGE = _NullStage()
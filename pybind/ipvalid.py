@@ -0,0 +1,152 @@
+"""Functions for validating and classifying IP addresses.
+
+How thoroughly addresses passed to dnsrecord and bindconf are checked
+is governed by a module-wide validation strategy:
+
+- STRICT (the default): addresses are parsed into ipaddr objects, as
+  they always have been; any format accepted by ipaddr is allowed.
+
+- FAST: addresses are checked with socket.inet_pton() and kept as
+  strings (IPv6 addresses in compressed form); anything it rejects is
+  handed to ipaddr, so the same addresses are accepted and the same
+  exceptions raised as with STRICT. IPv4-mapped IPv6 addresses keep
+  their dotted quad.
+
+- TRUSTED: addresses are not checked at all and are kept as they are;
+  they must be strings in canonical form. Meant for feeds that have
+  been validated already.
+"""
+
+import binascii
+
+ipaddr = None  # imported on first use by _ipaddr()
+socket = None  # imported by set_validation() unless STRICT
+
+STRICT = 'strict'
+FAST = 'fast'
+TRUSTED = 'trusted'
+
+_validation = STRICT
+
+def _ipaddr():
+    """Return ipaddr module, importing it if necessary."""
+
+    global ipaddr
+    if ipaddr is None:
+        import ipaddr
+    return ipaddr
+
+def set_validation(validation):
+    """Set validation strategy.
+
+    Args:
+        validation: (str) STRICT, FAST or TRUSTED
+    """
+
+    global _validation, socket
+    if validation not in (STRICT, FAST, TRUSTED):
+        raise ValueError('unknown validation strategy: %s' % validation)
+    if validation != STRICT and socket is None:
+        import socket
+    _validation = validation
+
+def get_validation():
+    """Return validation strategy."""
+
+    return _validation
+
+def ipv4_address(address):
+    """Return IPv4 address as validated by current strategy.
+
+    Args:
+        address: (str) IPv4 address
+          '192.168.1.1'
+    """
+
+    if _validation == TRUSTED:
+        return address
+    if _validation == FAST:
+        try:
+            socket.inet_pton(socket.AF_INET, address)
+            return address
+        except (socket.error, TypeError):
+            pass
+    return _ipaddr().IPv4Address(address)
+
+def ipv6_address(address):
+    """Return IPv6 address as validated by current strategy.
+
+    Args:
+        address: (str) IPv6 address
+          '2001:db8::1'
+    """
+
+    if _validation == TRUSTED:
+        return address
+    if _validation == FAST:
+        try:
+            return socket.inet_ntop(socket.AF_INET6,
+                                    socket.inet_pton(socket.AF_INET6,
+                                                     address))
+        except (socket.error, TypeError):
+            pass
+    return _ipaddr().IPv6Address(address)
+
+def ip_address(address):
+    """Return IPv4 or IPv6 address as validated by current strategy.
+
+    Args:
+        address: (str) IPv4 or IPv6 address
+          '192.168.1.1'
+    """
+
+    if _validation == STRICT or not isinstance(address, basestring):
+        return _ipaddr().IPAddress(address)
+    if _validation == TRUSTED:
+        return address
+    if ':' in address:
+        return ipv6_address(address)
+    return ipv4_address(address)
+
+def ip_version(address):
+    """Return IP version (4 or 6) of address.
+
+    Args:
+        address: (str) IPv4 or IPv6 address
+          '192.168.1.1'
+    """
+
+    if _validation == STRICT or not isinstance(address, basestring):
+        return _ipaddr().IPAddress(address).version
+    if _validation == FAST:
+        ip_address(address)
+    return 6 if ':' in address else 4
+
+def reverse_name(address):
+    """Return IP address's FQDN in the .arpa domain.
+
+    Args:
+        address: (str or ipaddr object) IPv4 or IPv6 address
+          '192.168.1.1'
+    """
+
+    if _validation == STRICT or not isinstance(address, basestring):
+        ip = _ipaddr().IPAddress(address)
+        if ip.version == 4:
+            octets = ip.compressed.split('.')
+            octets.reverse()
+            return '.'.join(octets) + '.in-addr.arpa.'
+        # get reversed address without colons
+        digits = ip.exploded.replace(':', '')[::-1]
+        # add dots and fully qualify
+        return '.'.join(digits) + '.ip6.arpa.'
+    if ':' not in address:
+        octets = str(ipv4_address(address)).split('.')
+        octets.reverse()
+        return '.'.join(octets) + '.in-addr.arpa.'
+    try:
+        packed = socket.inet_pton(socket.AF_INET6, address)
+    except (socket.error, TypeError):
+        # let ipaddr raise the usual exception
+        packed = _ipaddr().IPv6Address(address).packed
+    return '.'.join(binascii.hexlify(packed)[::-1]) + '.ip6.arpa.'
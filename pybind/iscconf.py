@@ -1,4 +1,19 @@
-"""Classes for writing ISC configuration files."""
+"""Classes for writing ISC configuration files.
+
+add_element() may be called by several threads at once, and elements
+added while remove_elements() is running (for a different label) are
+kept. Calls changing the same configuration object that must take
+effect together (e.g. the removal and addition done by
+bindconf set_*() methods) or that remove elements concurrently must be
+serialized by the caller.
+"""
+
+import deferred
+
+atomicfile = deferred.module('atomicfile', globals())
+background = deferred.module('background', globals())
+instrument = deferred.module('instrument', globals())
+memusage = deferred.module('memusage', globals())
 
 def _write_indent(fh, indent):
     """Write whitespace to file.
@@ -30,11 +45,36 @@ class _Conf(object):
 
         return [e for e in self.elements if e.label == label]
 
+    def memory_usage(self, accountant=None):
+        """Return estimated memory footprint by element type.
+
+        Clauses are counted separately from the elements they contain.
+        See memusage.Accountant for the meaning of the values returned.
+
+        Args:
+            accountant: (memusage.Accountant) accountant to which sizes
+              are added; a new one if None
+        """
+
+        if accountant is None:
+            accountant = memusage.Accountant()
+        for element in self.elements:
+            if isinstance(element, _Conf):
+                element.memory_usage(accountant)
+            else:
+                accountant.add(element, element.__class__.__name__)
+        accountant.add(self, self.__class__.__name__)
+        return accountant.report()
+
     def remove_elements(self, label):
         """Remove all items with label from elements."""
 
-        # modify list in situ
-        self.elements[:] = [e for e in self.elements if e.label != label]
+        # delete items in situ, last first, so that items appended by
+        # other threads meanwhile are neither lost nor shifted
+        elements = self.elements
+        for i in xrange(len(elements) - 1, -1, -1):
+            if elements[i].label == label:
+                del elements[i]
 
 class ISCConf(_Conf):
 
@@ -47,26 +87,49 @@ class ISCConf(_Conf):
     def __init__(self):
         _Conf.__init__(self)
 
-    def write_file(self, filename):
+    def write_file(self, filename, generation=None):
         """Write configuration to file.
 
         Args:
             filename: (str) path of file name to be written
+            generation: (archive.Generation) generation in which the
+              file is archived too
         """
 
-        with open(filename, 'w') as fh:
-            self.write(fh)
-        fh.close()
+        with atomicfile.replacing(filename) as fh:
+            instrument.write(self, fh, filename)
+        if generation is not None:
+            generation.add_file(filename)
+
+    def write_async(self, filename, writer=None):
+        """Write configuration to file in a worker thread.
+
+        Args:
+            filename: (str) path of file name to be written
+            writer: (background.BatchWriter) writer to be used; one
+              shared by all callers if None
+
+        Returns:
+            background.WriteJob for the file
+        """
+
+        if writer is None:
+            writer = background.default_writer()
+        return writer.submit(self, filename)
 
     def write(self, fh):
         """Write config to file.
 
         Args:
             fh: (file) file object
+
+        Returns:
+            number of top-level elements written
         """
 
         for element in self.elements:
             element.write(fh)
+        return len(self.elements)
 
 class _Element(object):
 
@@ -0,0 +1,115 @@
+"""Classes for estimating the memory footprint of zones and
+configurations.
+
+Objects are sized with sys.getsizeof() (which includes the garbage
+collector's overhead) and each object is counted once, however many
+times it is referenced, like allocations are by tracemalloc. Memory is
+attributed to the first category an object is added under, so items
+are added before the objects containing them. Classes, functions and
+modules are not counted.
+
+Strings referenced more than once (e.g. interned names, or a TTL
+shared by many records) are reported as shared; their memory is
+counted only once in the totals.
+"""
+
+import sys
+import types
+
+# objects shared by all instances rather than belonging to any of them
+_SKIPPED_TYPES = (type, types.ClassType, types.ModuleType,
+                  types.FunctionType, types.BuiltinFunctionType,
+                  types.MethodType, types.NoneType, bool)
+
+class Accountant(object):
+
+    """Class accumulating sizes of objects by category."""
+
+    def __init__(self):
+        """Return an Accountant object."""
+
+        self.seen = set()  # ids of objects counted
+        self.shared = set()  # ids of strings referenced more than once
+        self.categories = {}  # category: [count, bytes]
+        self.string_bytes = 0
+        self.shared_string_bytes = 0
+        self._objects = []  # keeps counted objects alive so ids stay unique
+
+    def ignore(self, obj):
+        """Exclude obj and objects referenced only through it.
+
+        Args:
+            obj: (object) object not to be counted
+        """
+
+        self.seen.add(id(obj))
+        self._objects.append(obj)
+
+    def add(self, obj, category):
+        """Count obj and objects it references under category.
+
+        Args:
+            obj: (object) object to be counted
+            category: (str) name under which it is reported
+              'A'
+        """
+
+        stats = self.categories.setdefault(category, [0, 0])
+        stats[0] += 1
+        stats[1] += self.size(obj)
+
+    def size(self, obj):
+        """Return bytes used by obj and the objects it references that
+        haven't been counted yet.
+
+        Args:
+            obj: (object) object to be sized
+        """
+
+        if isinstance(obj, _SKIPPED_TYPES):
+            return 0
+        if id(obj) in self.seen:
+            if isinstance(obj, basestring) and id(obj) not in self.shared:
+                self.shared.add(id(obj))
+                self.shared_string_bytes += sys.getsizeof(obj)
+            return 0
+        self.seen.add(id(obj))
+        self._objects.append(obj)
+        size = sys.getsizeof(obj)
+        if isinstance(obj, basestring):
+            self.string_bytes += size
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            for item in obj:
+                size += self.size(item)
+        elif isinstance(obj, dict):
+            for key, value in obj.iteritems():
+                size += self.size(key) + self.size(value)
+        else:
+            if hasattr(obj, '__dict__'):
+                # attribute names are interned and shared by instances
+                size += sys.getsizeof(obj.__dict__)
+                for value in obj.__dict__.itervalues():
+                    size += self.size(value)
+            for class_ in type(obj).__mro__:
+                for slot in class_.__dict__.get('__slots__', ()):
+                    if hasattr(obj, slot):
+                        size += self.size(getattr(obj, slot))
+        return size
+
+    def report(self):
+        """Return footprint as a dict.
+
+        Keys:
+            bytes: total bytes counted
+            types: dict mapping category to dict with 'count' and 'bytes'
+            string_bytes: bytes of strings counted
+            shared_string_bytes: bytes of strings referenced more than once
+        """
+
+        types_ = dict((category, {'count': count, 'bytes': size})
+                      for category, (count, size)
+                      in self.categories.iteritems())
+        return {'bytes': sum(t['bytes'] for t in types_.itervalues()),
+                'types': types_,
+                'string_bytes': self.string_bytes,
+                'shared_string_bytes': self.shared_string_bytes}
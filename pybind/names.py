@@ -0,0 +1,146 @@
+"""Classes for storing domain names once, as sequences of labels
+sharing their suffixes.
+
+A NameTable is a tree of labels, with one root for absolute names
+(ending with '.') and another for relative names (including '@'). Each
+node has an integer ID; a name is stored as the ID of the node of its
+first label, and names with a common suffix (e.g. 'prod.dc1.example.com.')
+share the nodes of that suffix. Names are compared exactly (not
+ignoring case), so equal names have equal IDs.
+
+Rendering a name concatenates the label of its node with the rendered
+suffix of its parent, which is cached for nodes with children.
+
+IDs are given in the order names are added, so they order nothing;
+sort_key() gives the DNSSEC canonical order.
+
+A zone sharing names (see dnszone._Zone.share_names()) has a table of
+its own, unless given one to share with other zones (e.g. the views of
+a zone). Records sharing names reference their table, so it is freed
+with the last of them; names are never removed from a table while it
+lives.
+"""
+
+import array
+# thread rather than threading, which is slow to import
+import thread
+
+ABSOLUTE = 0  # ID of root of absolute names
+RELATIVE = 1  # ID of root of relative names
+
+class NameTable(object):
+
+    """Class for tree of labels with integer IDs."""
+
+    def __init__(self):
+        """Return a NameTable object."""
+
+        self.labels = ['', '']  # label of each node
+        self.parents = array.array('i', [-1, -1])  # parent of each node
+        self.children = {}  # node ID: dict mapping label to child's ID
+        self.suffixes = {ABSOLUTE: '.', RELATIVE: ''}  # node ID: suffix
+        self.values = {}  # tuple of record data fields: the same tuple
+        self._lock = thread.allocate_lock()
+
+    def __len__(self):
+        return len(self.labels)
+
+    def intern(self, name):
+        """Return ID of name, adding it if necessary.
+
+        Args:
+            name: (str or unicode) absolute or relative domain name, in
+              ASCII
+              'host.prod.dc1.example.com.'
+
+        Raises:
+            UnicodeEncodeError: name is unicode that isn't ASCII
+        """
+
+        # coerced before changing the table, so that failing for a
+        # name that isn't ASCII leaves it unchanged
+        name = str(name)
+        if name.endswith('.'):
+            if name == '.':
+                return ABSOLUTE
+            node = ABSOLUTE
+            name = name[:-1]
+        else:
+            node = RELATIVE
+        labels = name.split('.')
+        with self._lock:
+            children = self.children
+            for label in reversed(labels):
+                siblings = children.get(node)
+                if siblings is None:
+                    siblings = children[node] = {}
+                child = siblings.get(label)
+                if child is None:
+                    child = len(self.labels)
+                    self.labels.append(intern(label))
+                    self.parents.append(node)
+                    siblings[label] = child
+                node = child
+        return node
+
+    def share(self, values):
+        """Return tuple equal to values, the same for all equal tuples
+        given to the table.
+
+        Args:
+            values: (tuple) data fields of a record, names as IDs
+              (10, 12)
+        """
+
+        return self.values.setdefault(values, values)
+
+    def name(self, node):
+        """Return name with ID node.
+
+        Args:
+            node: (int) ID returned by intern()
+        """
+
+        if node == ABSOLUTE:
+            return '.'
+        parent = self.parents[node]
+        suffix = self.suffixes.get(parent)
+        if suffix is None:
+            suffix = self._suffix(parent)
+        return self.labels[node] + suffix
+
+    def _suffix(self, node):
+        """Return and cache string following labels of node's children."""
+
+        suffix = self.suffixes.get(node)
+        if suffix is None:
+            suffix = '.' + self.labels[node] + self._suffix(self.parents[node])
+            self.suffixes[node] = suffix
+        return suffix
+
+    def labels_of(self, node):
+        """Return tuple of labels of name with ID node, from the root.
+
+        Args:
+            node: (int) ID returned by intern()
+        """
+
+        labels = []
+        while node > RELATIVE:
+            labels.append(self.labels[node])
+            node = self.parents[node]
+        labels.reverse()
+        return tuple(labels)
+
+    def sort_key(self, node):
+        """Return key sorting names in DNSSEC canonical order (by labels
+        from the root, ignoring case), absolute names first.
+
+        Args:
+            node: (int) ID returned by intern()
+        """
+
+        root = node
+        while root > RELATIVE:
+            root = self.parents[root]
+        return (root, tuple(label.lower() for label in self.labels_of(node)))
@@ -0,0 +1,255 @@
+"""Functions and classes for reloading named with no more work than
+the differences between two generations of its configuration require.
+
+Zones are identified by (view, name, class); view is None for zones
+outside views. The contents of master zones' files are compared by
+digest, so file_digests() is called for the previous generation before
+its files are replaced and its result kept (e.g. as JSON) until the
+new generation has been written:
+
+  old_digests = rndc.file_digests(old_conf, '/etc/bind')
+  ...write new zone files and named.conf...
+  new_digests = rndc.file_digests(new_conf, '/etc/bind')
+  commands = rndc.plan(old_conf, new_conf, old_digests, new_digests)
+  rndc.execute(commands, rndc.RNDC(args=('-k', '/etc/bind/rndc.key')))
+
+Zones added to a running named with rndc addzone are kept by named in
+a file of its own (NZF or NZD) rather than in named.conf, and a zone
+defined in both makes the next reconfig or restart fail. So zones
+defined in named.conf are only ever added and removed by reconfig, and
+addzone and delzone are used only for zones given to plan() apart from
+named.conf (old_added and new_added, configurations holding just those
+zones):
+
+  commands = rndc.plan(old_conf, new_conf, old_digests, new_digests,
+                       old_added, new_added)
+
+plan() returns, in order:
+
+- ('delzone', ...) for each added zone removed or changed, and each
+  that is moved into named.conf.
+
+- ('reconfig',) if anything changed in named.conf: zones added,
+  removed or changed, or anything else (ACLs, masters, views and their
+  statements).
+
+- ('addzone', ..., config) for each added zone that is new or changed;
+  named must be configured with allow-new-zones.
+
+- ('reload', name, class[, view]) for each zone present in both
+  generations whose file changed.
+
+Comments are ignored when comparing configurations.
+"""
+
+import copy
+import cStringIO
+import hashlib
+import os
+import subprocess
+
+def _render(element):
+    """Return element as written, without comments."""
+
+    fh = cStringIO.StringIO()
+    element.write(fh)
+    return '\n'.join(line for line in fh.getvalue().split('\n')
+                     if not line.lstrip().startswith('#'))
+
+def _unquote(value):
+    """Return value without enclosing double quotes."""
+
+    return value[1:-1] if value.startswith('"') else value
+
+def _zones(conf):
+    """Return dict mapping (view, name, class) to each zone clause."""
+
+    zones = {}
+    for element in conf.elements:
+        if element.label == 'zone':
+            zones[(None,) + _zone_name(element)] = element
+        elif element.label == 'view':
+            view = _unquote(element.additional[0])
+            for child in element.elements:
+                if child.label == 'zone':
+                    zones[(view,) + _zone_name(child)] = child
+    return zones
+
+def _zone_name(zone):
+    """Return (name, class) of zone clause."""
+
+    name = _unquote(zone.additional[0])
+    class_ = zone.additional[1] if len(zone.additional) > 1 else 'IN'
+    return name, class_
+
+def _skeleton(conf):
+    """Return list of rendered top-level elements, leaving out zones."""
+
+    skeleton = []
+    for element in conf.elements:
+        if element.label == 'zone':
+            continue
+        if element.label == 'view':
+            element = copy.copy(element)
+            element.elements = [e for e in element.elements
+                                if e.label != 'zone']
+        skeleton.append(_render(element))
+    return skeleton
+
+def _statement(zone, label):
+    """Return value of zone's statement with label, or None."""
+
+    for element in zone.elements:
+        # a statement whose value is None (e.g. Zone(name) without a
+        # type) is rendered without it, so it is taken as missing
+        if element.label == label and getattr(element, 'value', None) and \
+           element.value[0] is not None:
+            return _unquote(element.value[0])
+    return None
+
+def _zone_args(key):
+    """Return rndc arguments naming zone."""
+
+    view, name, class_ = key
+    if view is None:
+        return (name, class_)
+    return (name, class_, view)
+
+def _zone_config(zone):
+    """Return zone's configuration as expected by rndc addzone."""
+
+    body = ' '.join(' '.join(line.split()) for element in zone.elements
+                    for line in _render(element).split('\n') if line)
+    return '{ %s };' % body
+
+def file_digests(conf, directory=None):
+    """Return dict mapping each master zone to digest of its file.
+
+    Args:
+        conf: (bindconf.BINDConf) configuration
+        directory: (str) directory against which relative file names
+          are resolved (named's directory option)
+          '/etc/bind'
+
+    Returns:
+        dict mapping (view, name, class) to SHA-1 hex digest, or None
+        if the file doesn't exist
+    """
+
+    digests = {}
+    for key, zone in _zones(conf).iteritems():
+        if _statement(zone, 'type') not in ('master', 'primary'):
+            continue
+        filename = _statement(zone, 'file')
+        if filename is None:
+            continue
+        if directory is not None:
+            filename = os.path.join(directory, filename)
+        try:
+            with open(filename, 'rb') as fh:
+                digest = hashlib.sha1()
+                for block in iter(lambda: fh.read(65536), ''):
+                    digest.update(block)
+                digests[key] = digest.hexdigest()
+        except IOError:
+            digests[key] = None
+    return digests
+
+def plan(old_conf, new_conf, old_digests=None, new_digests=None,
+         old_added=None, new_added=None):
+    """Return list of rndc commands applying changes between
+    configurations.
+
+    Args:
+        old_conf: (bindconf.BINDConf) configuration named is running
+        new_conf: (bindconf.BINDConf) configuration to be applied
+        old_digests: (dict) file_digests() of old configuration (and
+          of old_added)
+        new_digests: (dict) file_digests() of new configuration (and
+          of new_added)
+        old_added: (bindconf.BINDConf) zones (in views, if any) that
+          named is running outside named.conf, having been added with
+          addzone
+        new_added: (bindconf.BINDConf) zones to be run outside
+          named.conf
+
+    Returns:
+        list of tuples of rndc arguments
+
+    Raises:
+        ValueError: a zone is in both new_conf and new_added
+    """
+
+    old_digests = old_digests or {}
+    new_digests = new_digests or {}
+    old_zones = _zones(old_conf)
+    new_zones = _zones(new_conf)
+    old_dynamic = _zones(old_added) if old_added is not None else {}
+    new_dynamic = _zones(new_added) if new_added is not None else {}
+    twice = sorted(set(new_zones) & set(new_dynamic))
+    if twice:
+        raise ValueError('zone %s both in named.conf and added' %
+                         (twice[0],))
+    commands = []
+    for key in sorted(old_dynamic):
+        if key not in new_dynamic or \
+           _render(old_dynamic[key]) != _render(new_dynamic[key]):
+            commands.append(('delzone',) + _zone_args(key))
+    if _skeleton(old_conf) != _skeleton(new_conf) or \
+       set(old_zones) != set(new_zones) or \
+       any(_render(old_zones[key]) != _render(new_zones[key])
+           for key in old_zones):
+        commands.append(('reconfig',))
+    for key in sorted(new_dynamic):
+        if key not in old_dynamic or \
+           _render(old_dynamic[key]) != _render(new_dynamic[key]):
+            commands.append(('addzone',) + _zone_args(key) +
+                            (_zone_config(new_dynamic[key]),))
+    old_keys = set(old_zones) | set(old_dynamic)
+    new_keys = set(new_zones) | set(new_dynamic)
+    for key in sorted(old_keys & new_keys):
+        digest = new_digests.get(key)
+        if digest is not None and digest != old_digests.get(key):
+            commands.append(('reload',) + _zone_args(key))
+    return commands
+
+class RNDC(object):
+
+    """Class running commands with rndc(8)."""
+
+    def __init__(self, rndc='rndc', args=()):
+        """Return an RNDC object.
+
+        Args:
+            rndc: (str) path of rndc program
+            args: (sequence) options preceding each command
+              ('-s', '127.0.0.1', '-k', '/etc/bind/rndc.key')
+        """
+
+        self.rndc = rndc
+        self.args = tuple(args)
+
+    def __call__(self, command):
+        """Run command, raising subprocess.CalledProcessError if it
+        fails.
+
+        Args:
+            command: (tuple) rndc arguments
+              ('reload', 'example.com', 'IN', 'example_view')
+        """
+
+        subprocess.check_call((self.rndc,) + self.args + tuple(command))
+
+def execute(commands, runner=None):
+    """Run commands in order, stopping at the first one that fails.
+
+    Args:
+        commands: (list) commands returned by plan()
+        runner: (callable) function called with each command; an
+          RNDC object running rndc from PATH if None
+    """
+
+    if runner is None:
+        runner = RNDC()
+    for command in commands:
+        runner(command)
@@ -0,0 +1,288 @@
+"""Classes for keeping zone and configuration files up to date with
+models changed by a stream of events.
+
+A Scheduler holds zones and configurations (any object with a
+write(fh) method) by name, applies changes to them and rewrites the
+files of those that changed:
+
+  scheduler = scheduler.Scheduler(debounce=2.0, max_workers=4)
+  scheduler.register(zone, 'example.com.hosts')
+  scheduler.register(conf, 'named.conf', 'named.conf')
+  ...
+  scheduler.apply('example.com.', lambda zone: zone.add_a(ip, host))
+  ...
+  scheduler.stop()
+
+An object becomes dirty when a change is applied to it, and is written
+once no change has been applied to it for debounce seconds, so a
+burst of changes costs a single write; an object changed continuously
+is written anyway after max_delay seconds. When several objects are
+due, those dirty for longest are written first, and of those that
+became dirty around the same time (within debounce seconds) the
+smallest, so that small zones aren't held up behind big ones.
+
+Objects are written by a background.BatchWriter, to a temporary file
+renamed into place. Changes are applied while holding a lock per
+object, which is also held while the object is written; applying a
+change to an object being written waits for the write to finish, and
+the object is written again afterwards. A change raising an exception
+leaves the object as the change left it, and dirty.
+"""
+
+import threading
+import time
+
+import background
+import instrument
+
+class _Entry(object):
+
+    """Class for state of a registered object."""
+
+    def __init__(self, name, obj, filename):
+        self.name = name
+        self.obj = obj
+        self.filename = filename
+        self.lock = threading.Lock()  # held while changing or writing obj
+        self.first_dirty = None  # time of first change not yet written
+        self.last_change = None
+        self.writing = False
+        self.writes = 0
+        self.error = None  # exception raised by last write
+
+    def write(self, fh):
+        """Write object while holding its lock."""
+
+        with self.lock:
+            return self.obj.write(fh)
+
+    def file_key(self, filename):
+        """Return (kind, name) under which writing object is recorded."""
+
+        return instrument.file_key(self.obj, filename)
+
+    def size(self):
+        """Return number of records or elements of object."""
+
+        for attribute in ('records', 'elements'):
+            items = getattr(self.obj, attribute, None)
+            if items is not None:
+                return len(items)
+        return 0
+
+class Scheduler(object):
+
+    """Class writing changed objects in the background."""
+
+    def __init__(self, debounce=1.0, max_delay=None, max_workers=4,
+                 clock=time.time):
+        """Return a Scheduler object and start its thread.
+
+        Args:
+            debounce: (float) seconds without changes after which a
+              dirty object is written
+            max_delay: (float) seconds after which a dirty object is
+              written even if it keeps changing; ten times debounce if
+              None
+            max_workers: (int) number of files written at once
+            clock: (callable) function returning current time in seconds
+        """
+
+        self.debounce = debounce
+        if max_delay is None:
+            max_delay = debounce * 10
+        self.max_delay = max_delay
+        self.clock = clock
+        self._entries = {}  # name: _Entry
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._writer = background.BatchWriter(max_workers)
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    def register(self, obj, filename, name=None):
+        """Add object whose file is kept up to date.
+
+        The object isn't written until a change is applied to it.
+
+        Args:
+            obj: (object) zone, configuration or other object with
+              write(fh) method
+            filename: (str) path of file to be written
+            name: (str) name by which changes refer to object; the
+              zone's origin if None
+              'example.com.'
+        """
+
+        if name is None:
+            name = obj.origin
+        with self._condition:
+            if name in self._entries:
+                raise ValueError('%s is already registered' % name)
+            self._entries[name] = _Entry(name, obj, filename)
+
+    def apply(self, name, change):
+        """Apply change to object and mark it dirty.
+
+        Args:
+            name: (str) name of object given to register()
+            change: (callable) function changing the object passed to it
+        """
+
+        entry = self._entries[name]
+        try:
+            with entry.lock:
+                change(entry.obj)
+        finally:
+            self.mark_dirty(name)
+
+    def mark_dirty(self, name):
+        """Mark object as changed (e.g. by the caller itself).
+
+        Args:
+            name: (str) name of object given to register()
+        """
+
+        with self._condition:
+            entry = self._entries[name]
+            now = self.clock()
+            entry.last_change = now
+            if entry.first_dirty is None:
+                entry.first_dirty = now
+            self._condition.notify_all()
+
+    def dirty(self):
+        """Return names of objects not written since they changed."""
+
+        with self._condition:
+            return sorted(entry.name for entry in self._entries.itervalues()
+                          if entry.first_dirty is not None or entry.writing)
+
+    def stats(self, name):
+        """Return dict with number of writes and last write's error.
+
+        Args:
+            name: (str) name of object given to register()
+        """
+
+        entry = self._entries[name]
+        return {'writes': entry.writes, 'error': entry.error,
+                'dirty': entry.first_dirty is not None}
+
+    def flush(self, timeout=None):
+        """Write dirty objects now and wait until none is dirty.
+
+        An object whose write fails isn't written again by flush(); it
+        stays dirty and is retried by the scheduler thread.
+
+        Args:
+            timeout: (float) seconds to wait before raising RuntimeError;
+              no limit if None
+
+        Returns:
+            names of objects whose write failed
+        """
+
+        deadline = None if timeout is None else time.time() + timeout
+        attempted = set()
+        with self._condition:
+            while True:
+                due = [entry for entry in self._entries.itervalues()
+                       if entry.first_dirty is not None and
+                       not entry.writing and
+                       not (entry.name in attempted and
+                            entry.error is not None)]
+                busy = [entry for entry in self._entries.itervalues()
+                        if entry.writing]
+                if due:
+                    self._start(due)
+                    attempted.update(entry.name for entry in due)
+                    # writes may be done already, their callbacks having
+                    # run in this thread, so look again before waiting
+                    continue
+                if not busy:
+                    break
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise RuntimeError('timed out flushing')
+                self._condition.wait(remaining)
+            return sorted(name for name in attempted
+                          if self._entries[name].error is not None)
+
+    def stop(self, flush=True):
+        """Stop scheduler thread and worker threads.
+
+        Args:
+            flush: (boolean) whether to write dirty objects first
+        """
+
+        if flush:
+            self.flush()
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._writer.shutdown()
+
+    def _due(self, now):
+        """Return list of entries to be written in order, and time at
+        which the next one will be due (or None).
+        """
+
+        due = []
+        wake = None
+        for entry in self._entries.itervalues():
+            if entry.first_dirty is None or entry.writing:
+                continue
+            when = min(entry.last_change + self.debounce,
+                       entry.first_dirty + self.max_delay)
+            if when <= now:
+                due.append(entry)
+            elif wake is None or when < wake:
+                wake = when
+        due.sort(key=lambda entry: (int(entry.first_dirty / self.debounce)
+                                    if self.debounce else entry.first_dirty,
+                                    entry.size()))
+        return due, wake
+
+    def _start(self, entries):
+        """Submit entries to writer (called holding condition)."""
+
+        for entry in entries:
+            entry.writing = True
+            entry.first_dirty = None
+            job = self._writer.submit(entry, entry.filename)
+            job.add_done_callback(self._done)
+
+    def _done(self, job):
+        """Update state of entry after it was written."""
+
+        entry = job.obj
+        with self._condition:
+            entry.writing = False
+            entry.writes += 1
+            entry.error = job.exception()
+            if entry.error is not None and entry.first_dirty is None:
+                # write again after debounce
+                entry.first_dirty = entry.last_change = self.clock()
+            self._condition.notify_all()
+
+    def _run(self):
+        with self._condition:
+            while not self._stopping:
+                now = self.clock()
+                due, wake = self._due(now)
+                if due:
+                    self._start(due)
+                    continue
+                self._condition.wait(None if wake is None else wake - now)
@@ -0,0 +1,186 @@
+"""Functions for writing a zone as fragments included by a small
+top-level file.
+
+write_shards() partitions a zone's records (other than its SOA
+records) into a fixed number of fragments, either by a hash of each
+record's owner name or by subtree (the label just below the origin, so
+that all names under www.example.com. share a fragment). The top-level
+file holds $ORIGIN, $TTL and the SOA records followed by one $INCLUDE
+line per fragment:
+
+  $ORIGIN example.com.
+  $TTL 1h
+  @ IN SOA ...
+  $INCLUDE example.com.hosts.0000
+  $INCLUDE example.com.hosts.0001
+  ...
+
+Each fragment starts with the zone's $TTL, and inherits the origin of
+the file including it. Owner names are hashed as spelled, so a name
+written both relative and fully qualified may land in two fragments;
+named doesn't mind.
+
+The SHA-1 digest of every file written is kept in a manifest next to
+the top-level file (filename + '.manifest'); a file whose contents are
+unchanged is not rewritten, so named and rsync-like tools only see the
+fragments that actually changed. Fragments are rendered in worker
+processes if requested; these are forked after the records have been
+partitioned, so the records are not pickled, and they write their
+fragments themselves. Zones may be written by several threads at
+once.
+
+Note that $INCLUDE file names are interpreted by named relative to its
+directory option, not to the including file.
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import zlib
+
+import atomicfile
+import deferred
+
+multiprocessing = deferred.module('multiprocessing', globals())
+
+HASH = 'hash'
+SUBTREE = 'subtree'
+
+# ID of write_shards() call: lists of records of its fragments, which
+# worker processes inherit
+_partitions = {}
+_calls = itertools.count()
+
+def _hash_key(zone):
+    """Return function returning owner name of record."""
+
+    return lambda record: record.name.lower()
+
+def _subtree_key(zone):
+    """Return function returning label of record's owner name just
+    below zone's origin.
+    """
+
+    origin = (zone.origin or '').lower()
+
+    def key(record):
+        name = record.name.lower()
+        if name.endswith('.'):
+            if not name.endswith('.' + origin):
+                return name
+            name = name[:-len(origin) - 1]
+        elif name == '@':
+            return ''
+        return name.rsplit('.', 1)[-1]
+
+    return key
+
+def _write_if_changed(filename, data, digest):
+    """Write data unless its digest is digest.
+
+    Returns:
+        tuple of new digest and whether file was written
+    """
+
+    new_digest = hashlib.sha1(data).hexdigest()
+    if new_digest == digest and os.path.exists(filename):
+        return new_digest, False
+    atomicfile.write(filename, data)
+    return new_digest, True
+
+def _write_shard(task):
+    """Render and write fragment (run by worker processes)."""
+
+    call, index, filename, header, digest = task
+    data = header + ''.join(['%s\n' % record
+                             for record in _partitions[call][index]])
+    return _write_if_changed(filename, data, digest)
+
+def write_shards(zone, filename, shards=16, partition=HASH, processes=None,
+                 include_format=None, generation=None):
+    """Write zone as top-level file including fragment files.
+
+    Args:
+        zone: (dnszone._Zone) zone to be written
+        filename: (str) name of top-level file; fragments are named
+          after it with a four-digit suffix
+          'example.com.hosts'
+        shards: (int) number of fragments
+        partition: (str or callable) HASH, SUBTREE or function returning
+          the fragment number of a record
+        processes: (int) number of worker processes rendering
+          fragments; fragments are rendered by the caller if None
+        include_format: (str) format of file names in $INCLUDE lines,
+          with the fragment file's name substituted, e.g. to make them
+          relative to named's directory
+          'master/%s'
+        generation: (archive.Generation) generation in which the
+          top-level file and all fragments (whether rewritten or not)
+          are archived too
+
+    Returns:
+        list of names of files written (those whose contents changed)
+    """
+
+    if callable(partition):
+        number = partition
+    else:
+        key = {HASH: _hash_key, SUBTREE: _subtree_key}[partition](zone)
+        number = lambda record: zlib.crc32(key(record)) % shards
+    names = ['%s.%04d' % (filename, i) for i in range(shards)]
+    soa = []
+    partitions = [[] for i in range(shards)]
+    call = next(_calls)
+    _partitions[call] = partitions
+    try:
+        for record in zone.iter_records():
+            if record.__class__.__name__ == 'SOA':
+                soa.append(record)
+            else:
+                partitions[number(record)].append(record)
+        manifest_name = filename + '.manifest'
+        try:
+            with open(manifest_name) as fh:
+                manifest = json.load(fh)
+        except (IOError, ValueError):
+            manifest = {}
+        header = '$TTL %s\n' % zone.ttl
+        tasks = [(call, i, names[i], header, manifest.get(names[i]))
+                 for i in range(shards)]
+        if processes:
+            pool = multiprocessing.Pool(processes)
+            try:
+                results = pool.map(_write_shard, tasks)
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            results = [_write_shard(task) for task in tasks]
+    finally:
+        del _partitions[call]
+    lines = []
+    if zone.origin is not None:
+        lines.append('$ORIGIN %s\n' % zone.origin)
+    lines.append(header)
+    lines.extend('%s\n' % record for record in soa)
+    for name in names:
+        if include_format is not None:
+            name = include_format % name
+        lines.append('$INCLUDE %s\n' % name)
+    results.insert(0, _write_if_changed(filename, ''.join(lines),
+                                        manifest.get(filename)))
+    names.insert(0, filename)
+    new_manifest = dict((name, digest) for name, (digest, written)
+                        in zip(names, results))
+    for name in manifest:
+        # fragments left over from a larger number of shards
+        if name not in new_manifest and os.path.exists(name):
+            os.remove(name)
+    atomicfile.write(manifest_name, json.dumps(new_manifest, indent=1,
+                                                sort_keys=True))
+    if generation is not None:
+        for name in names:
+            generation.add_file(name)
+    return [name for name, (digest, written) in zip(names, results)
+            if written]
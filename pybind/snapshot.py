@@ -0,0 +1,410 @@
+"""Functions and classes for saving zones and configurations to
+compact binary snapshots and loading them back.
+
+A snapshot holds every distinct string once, in a table referenced by
+index from fixed-width arrays, so it is smaller than a pickle and is
+loaded without running any record or element constructors (and
+without validating addresses again). Zones are loaded lazily by
+default: the file is memory-mapped and records are built one at a
+time while the zone is written, so a loaded zone costs little more
+than a few bytes per record until then.
+
+Values are stored in their rendered form: record data, TTLs and
+statement arguments come back as strings that are written exactly as
+the originals were (so an ipaddr object becomes its string, and a port
+number its digits).
+
+Snapshots are written to a temporary file renamed into place, so a
+process having one mapped keeps a consistent view of it while it is
+replaced; SnapshotZone.reload() maps the new file only if it changed.
+
+File layout (little-endian; strings are UTF-8 encoded byte strings):
+
+  header      magic 'PYBS', format version, kind ('Z' or 'C'), counts
+              and string indexes (see _ZONE_HEADER and _CONF_HEADER)
+  offsets     uint32 offset of each string, plus end of last string
+  strings     string table
+  table       uint32 array of string indexes: 6 per record (type,
+              name, data, ttl, class, comment) for zones; 7 per element
+              (class, label, comment, number of child elements and
+              number of value, stanza and additional items, followed
+              by those items) for configurations, in depth-first order
+"""
+
+import array
+import mmap
+import os
+import struct
+import sys
+
+import atomicfile
+import bindconf
+import dnsrecord
+import dnszone
+import iscconf
+
+MAGIC = 'PYBS'
+VERSION = 1
+
+_NONE = 0xffffffff  # string index standing for None
+
+# magic, version, kind, string count, record count, zone class,
+# origin, ttl, epochserial
+_ZONE_HEADER = struct.Struct('<4sHcxIIIIII')
+# magic, version, kind, string count, table length, root class
+_CONF_HEADER = struct.Struct('<4sHcxIII')
+
+_RECORD_FIELDS = ('name', 'data', 'ttl', 'class_', 'comment')
+_ZONE_CLASSES = ('ForwardZone', 'ReverseZone', 'TemplateZone')
+
+class _StringTable(object):
+
+    """Class for collecting distinct strings and their indexes."""
+
+    def __init__(self):
+        self.indexes = {}
+        self.strings = []
+
+    def index(self, value):
+        """Return index of value (as a string) in table."""
+
+        if value is None:
+            return _NONE
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        elif not isinstance(value, str):
+            value = str(value)
+        index = self.indexes.get(value)
+        if index is None:
+            index = self.indexes[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def write(self, fh):
+        """Write offsets and strings."""
+
+        offsets = _array()
+        position = 0
+        for value in self.strings:
+            offsets.append(position)
+            position += len(value)
+        offsets.append(position)
+        _write_array(fh, offsets)
+        for value in self.strings:
+            fh.write(value)
+
+def _array(items=()):
+    """Return array of uint32."""
+
+    result = array.array('I', items)
+    assert result.itemsize == 4
+    return result
+
+def _write_array(fh, items):
+    """Write array of uint32 in little-endian byte order."""
+
+    if sys.byteorder == 'big':
+        items = array.array('I', items)
+        items.byteswap()
+    fh.write(items.tostring())
+
+def _read_array(data, start, count):
+    """Return array of count uint32 read from data at start."""
+
+    items = _array()
+    items.fromstring(data[start:start + count * 4])
+    if sys.byteorder == 'big':
+        items.byteswap()
+    return items
+
+class _Strings(object):
+
+    """Class for reading strings from a mapped string table."""
+
+    def __init__(self, data, start, count):
+        self.data = data
+        self.offsets = _read_array(data, start, count + 1)
+        self.base = start + (count + 1) * 4
+        self.end = self.base + self.offsets[count]
+        self.cache = {}
+
+    def get(self, index):
+        """Return string at index (or None)."""
+
+        if index == _NONE:
+            return None
+        value = self.cache.get(index)
+        if value is None:
+            value = self.data[self.base + self.offsets[index]:
+                              self.base + self.offsets[index + 1]]
+            # strings used by many records (types, TTLs, classes) and
+            # short strings are kept rather than copied each time
+            if len(value) <= 8:
+                self.cache[index] = value
+        return value
+
+def _check_header(data, kind, filename):
+    """Raise ValueError unless data starts with a snapshot header."""
+
+    magic, version, found = struct.unpack_from('<4sHc', data)
+    if magic != MAGIC:
+        raise ValueError('%s is not a snapshot' % filename)
+    if version != VERSION:
+        raise ValueError('%s has snapshot format version %d, not %d' %
+                         (filename, version, VERSION))
+    if found != kind:
+        raise ValueError('%s is not a snapshot of the right kind' % filename)
+
+def save_zone(zone, filename):
+    """Write snapshot of zone.
+
+    Records are taken from zone.iter_records(), so overlays and lazy
+    zones are saved with their merged or produced records.
+
+    Args:
+        zone: (dnszone._Zone) zone to be saved
+        filename: (str) path of file to be written
+    """
+
+    strings = _StringTable()
+    table = _array()
+    index = strings.index
+    for record in zone.iter_records():
+        table.append(index(record.__class__.__name__))
+        for field in _RECORD_FIELDS:
+            table.append(index(getattr(record, field)))
+    class_name = zone.__class__.__name__
+    if class_name not in _ZONE_CLASSES:
+        class_name = 'ForwardZone'
+    indexes = (index(class_name), index(zone.origin), index(zone.ttl))
+
+    with atomicfile.replacing(filename, 'wb') as fh:
+        fh.write(_ZONE_HEADER.pack(MAGIC, VERSION, 'Z',
+                                   len(strings.strings), len(table) // 6,
+                                   *(indexes + (int(zone.epochserial),))))
+        strings.write(fh)
+        _write_array(fh, table)
+
+class SnapshotZone(dnszone._Zone):
+
+    """Zone whose records are read from a mapped snapshot as the zone
+    is written.
+
+    Records added to a SnapshotZone are written after those of the
+    snapshot.
+    """
+
+    def __init__(self, filename):
+        """Return a SnapshotZone object.
+
+        Args:
+            filename: (str) path of snapshot written by save_zone()
+        """
+
+        self.filename = filename
+        self._map = None
+        self._stat = None
+        self._open()
+        dnszone._Zone.__init__(self, self._origin or '@', self.epochserial,
+                               self._ttl)
+        self.origin = self._origin
+
+    def _open(self):
+        """Map snapshot and read its header."""
+
+        with open(self.filename, 'rb') as fh:
+            stat = os.fstat(fh.fileno())
+            data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            _check_header(data, 'Z', self.filename)
+            (magic, version, kind, string_count, record_count, class_,
+             origin, ttl, epochserial) = _ZONE_HEADER.unpack_from(data)
+            strings = _Strings(data, _ZONE_HEADER.size, string_count)
+            table = _read_array(data, strings.end, record_count * 6)
+        except Exception:
+            data.close()
+            raise
+        if self._map is not None:
+            self._map.close()
+        self._map = data
+        self._stat = (stat.st_ino, stat.st_size, stat.st_mtime)
+        self._strings = strings
+        self._table = table
+        self.zone_class = strings.get(class_)
+        self._origin = strings.get(origin)
+        self._ttl = strings.get(ttl)
+        self.epochserial = bool(epochserial)
+
+    def reload(self):
+        """Map snapshot again if its file has changed.
+
+        Returns:
+            whether the snapshot was reloaded
+        """
+
+        stat = os.stat(self.filename)
+        if (stat.st_ino, stat.st_size, stat.st_mtime) == self._stat:
+            return False
+        self._open()
+        self.origin = self._origin
+        self.ttl = self._ttl
+        return True
+
+    def close(self):
+        """Unmap snapshot."""
+
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def iter_records(self):
+        """Generate records of snapshot followed by added records."""
+
+        self.merge_records()
+        get = self._strings.get
+        table = self._table
+        classes = {}
+        for i in xrange(0, len(table), 6):
+            type_ = get(table[i])
+            class_ = classes.get(type_)
+            if class_ is None:
+                class_ = classes[type_] = getattr(dnsrecord, type_)
+            record = class_.__new__(class_)
+            record.name = get(table[i + 1])
+            record.data = get(table[i + 2])
+            record.ttl = get(table[i + 3])
+            record.class_ = get(table[i + 4])
+            record.comment = get(table[i + 5])
+            yield record
+        for record in self.records:
+            yield record
+
+    def materialize(self):
+        """Return zone of the saved class holding all records."""
+
+        class_ = getattr(dnszone, self.zone_class)
+        if class_ is dnszone.TemplateZone:
+            zone = class_(self.epochserial, self.ttl)
+        else:
+            zone = class_(self.origin, self.epochserial, self.ttl)
+        zone.records = list(self.iter_records())
+        return zone
+
+def load_zone(filename, lazy=True):
+    """Return zone from snapshot.
+
+    Args:
+        filename: (str) path of snapshot written by save_zone()
+        lazy: (boolean) whether to return a SnapshotZone rather than a
+          zone of the saved class holding all records
+    """
+
+    zone = SnapshotZone(filename)
+    if lazy:
+        return zone
+    try:
+        return zone.materialize()
+    finally:
+        zone.close()
+
+def _element_class(name):
+    """Return class of configuration element by name."""
+
+    class_ = getattr(bindconf, name, None) or getattr(iscconf, name)
+    if not isinstance(class_, type) or not issubclass(class_,
+                                                      (iscconf._Conf,
+                                                       iscconf._Element)):
+        raise ValueError('%s is not a configuration class' % name)
+    return class_
+
+def save_conf(conf, filename):
+    """Write snapshot of configuration.
+
+    Args:
+        conf: (iscconf.ISCConf) configuration (e.g. BINDConf) to be saved
+        filename: (str) path of file to be written
+    """
+
+    strings = _StringTable()
+    table = _array()
+    index = strings.index
+
+    def add(element):
+        value = getattr(element, 'value', ())
+        stanza = getattr(element, 'stanza', ())
+        additional = getattr(element, 'additional', ())
+        children = getattr(element, 'elements', ())
+        table.extend((index(element.__class__.__name__),
+                      index(element.label), index(element.comment),
+                      len(children), len(value), len(stanza),
+                      len(additional)))
+        table.extend(index(item) for item in value)
+        table.extend(index(item) for item in stanza)
+        table.extend(index(item) for item in additional)
+        for child in children:
+            add(child)
+
+    for element in conf.elements:
+        add(element)
+    root = index(conf.__class__.__name__)
+
+    with atomicfile.replacing(filename, 'wb') as fh:
+        fh.write(_CONF_HEADER.pack(MAGIC, VERSION, 'C',
+                                   len(strings.strings), len(table), root))
+        strings.write(fh)
+        _write_array(fh, table)
+
+def load_conf(filename):
+    """Return configuration (e.g. BINDConf) from snapshot.
+
+    Args:
+        filename: (str) path of snapshot written by save_conf()
+    """
+
+    with open(filename, 'rb') as fh:
+        data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        _check_header(data, 'C', filename)
+        (magic, version, kind, string_count, table_length,
+         root) = _CONF_HEADER.unpack_from(data)
+        strings = _Strings(data, _CONF_HEADER.size, string_count)
+        table = _read_array(data, strings.end, table_length)
+        get = strings.get
+        conf = _element_class(get(root))()
+        position = [0]
+        classes = {}
+
+        def read(parent):
+            i = position[0]
+            (class_, label, comment, children, values, stanzas,
+             additionals) = table[i:i + 7]
+            i += 7
+            class_name = get(class_)
+            class_ = classes.get(class_name)
+            if class_ is None:
+                class_ = classes[class_name] = _element_class(class_name)
+            element = class_.__new__(class_)
+            element.label = get(label)
+            element.comment = get(comment)
+            if issubclass(class_, iscconf.Statement):
+                element.value = tuple(get(n) for n in table[i:i + values])
+                i += values
+                element.stanza = [get(n) for n in table[i:i + stanzas]]
+                i += stanzas
+            else:
+                i += values + stanzas
+            if issubclass(class_, iscconf.Clause):
+                iscconf._Conf.__init__(element)
+                element.additional = tuple(get(n) for n
+                                           in table[i:i + additionals])
+            i += additionals
+            position[0] = i
+            for n in xrange(children):
+                read(element)
+            parent.elements.append(element)
+
+        while position[0] < len(table):
+            read(conf)
+    finally:
+        data.close()
+    return conf
@@ -0,0 +1,75 @@
+"""Functions for updating the serial number in existing zone files.
+
+The serial number is located in the first SOA record of the file
+(which must be written in the format used by dnsrecord.SOA, with the
+serial number first within parentheses) through a memory map, so only
+the pages up to the record are read. If the new serial number has as
+many digits as the old one and the file has no other hard links, it
+is overwritten in place; otherwise the file is rewritten to a temporary
+file renamed into place.
+
+A file with several hard links (e.g. zones sharing a
+dnszone.TemplateZone file linked with write_files(), or files restored
+from an archive.Archive with link=True, which share the archive's
+object) is never changed in place, so only the given path is updated.
+"""
+
+import mmap
+import os
+import re
+import shutil
+
+import atomicfile
+import dnszone
+
+# serial number in SOA record outside comments
+_SOA_RE = re.compile(r'^[^;\n]*\sSOA\s+\S+\s+\S+\s+\(\s*(\d+)', re.MULTILINE)
+
+def bump_serial(filename, serial=None, epochserial=False):
+    """Update serial number of SOA record in zone file.
+
+    Args:
+        filename: (str) name of zone file
+          'example.com.hosts'
+        serial: (int) new serial number; by default, the number that
+          dnszone._Zone.add_soa() would use now, or the old one plus
+          one if that isn't greater (same-day increments of YYYYMMDDnn)
+        epochserial: (boolean) whether default serial number is number
+          of seconds since epoch rather than YYYYMMDDnn
+
+    Returns:
+        new serial number
+    """
+
+    with open(filename, 'r+b') as fh:
+        mm = mmap.mmap(fh.fileno(), 0)
+        try:
+            match = _SOA_RE.search(mm)
+            if match is None:
+                raise ValueError('no SOA record in %s' % filename)
+            old = int(match.group(1))
+            if serial is None:
+                serial = dnszone.next_serial(epochserial, old)
+            text = str(serial)
+            start, end = match.span(1)
+            if len(text) == end - start and \
+               os.fstat(fh.fileno()).st_nlink == 1:
+                mm[start:end] = text
+                mm.flush()
+                return serial
+        finally:
+            mm.close()
+    _rewrite(filename, start, end, text)
+    return serial
+
+def _rewrite(filename, start, end, text):
+    """Replace bytes from start to end of file with text by writing
+    a new file and renaming it.
+    """
+
+    with open(filename, 'rb') as src:
+        with atomicfile.replacing(filename, 'wb') as dst:
+            dst.write(src.read(start))
+            dst.write(text)
+            src.seek(end)
+            shutil.copyfileobj(src, dst)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+"""Unit tests for archive module."""
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+import unittest2 as unittest
+
+import archive
+import bindconf
+import dnszone
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output = os.path.join(self.directory, 'output')
+        os.mkdir(self.output)
+        # file names are archived as given to write_file()
+        self.cwd = os.getcwd()
+        os.chdir(self.output)
+        self.zone = dnszone.ForwardZone('example.com')
+        self.zone.add_soa('ns1', 'hostmaster', serial=1)
+        self.zone.add_a('192.168.1.1', 'www')
+        self.conf = bindconf.BINDConf()
+        self.conf.add_acl(bindconf.ACL('internal', ('192.168.1.0/24',)))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def path(self, *names):
+        return os.path.join(self.directory, *names)
+
+    def objects(self):
+        return sum(len(filenames) for path, dirnames, filenames
+                   in os.walk(self.path('archive', 'objects')))
+
+    def write_generation(self, store, name):
+        generation = store.generation(name)
+        self.zone.write_file('example.com.hosts', generation)
+        self.conf.write_file('named.conf', generation)
+        generation.add(self.zone, 'copy/example.com.hosts')
+        generation.commit()
+
+    def check_restore(self, store, link):
+        self.write_generation(store, 'first')
+        self.zone.add_a('192.168.1.2', 'mail')
+        self.write_generation(store, 'second')
+        # zone changed; configuration and copy of first zone are shared
+        self.assertEqual(self.objects(), 3)
+        self.assertEqual(store.generations(), ['first', 'second'])
+        restored = self.path('restored')
+        store.restore('first', restored, link)
+        with open(os.path.join(restored, 'example.com.hosts')) as fh:
+            self.assertNotIn('mail', fh.read())
+        with open(os.path.join(restored, 'copy', 'example.com.hosts')) as fh:
+            self.assertNotIn('mail', fh.read())
+        with open(os.path.join(restored, 'named.conf')) as fh:
+            self.assertIn('192.168.1.0/24', fh.read())
+        store.prune(['second'])
+        self.assertEqual(self.objects(), 2)
+        return restored
+
+    def test_restore_links(self):
+        store = archive.Archive(self.path('archive'))
+        restored = self.check_restore(store, True)
+        self.assertGreater(os.stat(os.path.join(restored,
+                                                'named.conf')).st_nlink, 1)
+
+    def test_restore_copies(self):
+        store = archive.Archive(self.path('archive'))
+        restored = self.check_restore(store, False)
+        self.assertEqual(os.stat(os.path.join(restored,
+                                              'named.conf')).st_nlink, 1)
+
+    def test_rewrite_linked(self):
+        store = archive.Archive(self.path('archive'))
+        self.write_generation(store, 'first')
+        store.restore('first', self.path('restored'), link=True)
+        self.zone.add_a('192.168.1.2', 'mail')
+        self.zone.write_file(self.path('restored', 'example.com.hosts'))
+        # the stored object is unchanged
+        digest = store.manifest('first')['example.com.hosts']['digest']
+        with open(store._find(digest)[0]) as fh:
+            self.assertEqual(hashlib.sha256(fh.read()).hexdigest(), digest)
+
+    def test_compressed(self):
+        store = archive.Archive(self.path('archive'), compress=True)
+        self.check_restore(store, True)
+        self.assertEqual(store.manifest('second')['named.conf']['size'],
+                         os.path.getsize('named.conf'))
+
+    def test_invalid_names(self):
+        store = archive.Archive(self.path('archive'))
+        self.assertRaises(ValueError, store.generation, '../x')
+        generation = store.generation('first')
+        self.assertRaises(ValueError, generation.add, self.zone, '../x')
+
+if __name__ == '__main__':
+    unittest.main()
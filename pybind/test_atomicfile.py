@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+"""Unit tests for atomicfile module."""
+
+import os
+import shutil
+import stat
+import tempfile
+import threading
+
+import unittest2 as unittest
+
+import atomicfile
+
+class TestReplacing(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'example.com.hosts')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        with open(self.filename) as fh:
+            return fh.read()
+
+    def test_write(self):
+        umask = os.umask(027)
+        try:
+            atomicfile.write(self.filename, 'one\n')
+        finally:
+            os.umask(umask)
+        self.assertEqual(self.read(), 'one\n')
+        self.assertEqual(stat.S_IMODE(os.stat(self.filename).st_mode), 0640)
+        # permissions of the file replaced are kept
+        os.chmod(self.filename, 0640)
+        atomicfile.write(self.filename, 'two\n')
+        self.assertEqual(self.read(), 'two\n')
+        self.assertEqual(stat.S_IMODE(os.stat(self.filename).st_mode), 0640)
+
+    def test_symlink(self):
+        atomicfile.write(self.filename, 'one\n')
+        link = os.path.join(self.directory, 'link')
+        os.symlink(self.filename, link)
+        atomicfile.write(link, 'two\n')
+        self.assertTrue(os.path.islink(link))
+        self.assertEqual(self.read(), 'two\n')
+
+    @unittest.skipUnless(os.getuid() == 0, 'requires root')
+    def test_owner(self):
+        atomicfile.write(self.filename, 'one\n')
+        os.chown(self.filename, 1234, 5678)
+        atomicfile.write(self.filename, 'two\n')
+        info = os.stat(self.filename)
+        self.assertEqual((info.st_uid, info.st_gid), (1234, 5678))
+
+    def test_links_unchanged(self):
+        atomicfile.write(self.filename, 'one\n')
+        link = self.filename + '.link'
+        os.link(self.filename, link)
+        atomicfile.write(self.filename, 'two\n')
+        with open(link) as fh:
+            self.assertEqual(fh.read(), 'one\n')
+
+    def test_error(self):
+        atomicfile.write(self.filename, 'one\n')
+        with self.assertRaises(ValueError):
+            with atomicfile.replacing(self.filename) as fh:
+                fh.write('partial')
+                raise ValueError
+        self.assertEqual(self.read(), 'one\n')
+        self.assertEqual(os.listdir(self.directory), ['example.com.hosts'])
+        self.assertRaises(IOError, atomicfile.write,
+                          os.path.join(self.directory, 'missing', 'file'),
+                          'data')
+
+    def test_threads(self):
+        data = ['%d\n' % n * 10000 for n in range(8)]
+        threads = [threading.Thread(target=atomicfile.write,
+                                    args=(self.filename, item))
+                   for item in data]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIn(self.read(), data)
+        self.assertEqual(os.listdir(self.directory), ['example.com.hosts'])
+
+    def test_link(self):
+        atomicfile.write(self.filename, 'one\n')
+        other = os.path.join(self.directory, 'other')
+        atomicfile.write(other, 'two\n')
+        atomicfile.link(other, self.filename)
+        self.assertEqual(os.stat(self.filename).st_ino, os.stat(other).st_ino)
+        self.assertRaises(OSError, atomicfile.link,
+                          os.path.join(self.directory, 'missing'),
+                          self.filename)
+        self.assertEqual(self.read(), 'two\n')
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['example.com.hosts', 'other'])
+
+if __name__ == '__main__':
+    unittest.main()
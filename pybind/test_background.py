@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+"""Unit tests for background module."""
+
+import os
+import shutil
+import tempfile
+import threading
+
+import unittest2 as unittest
+
+import background
+import bindconf
+import dnszone
+
+class _Blocking(object):
+
+    """Object whose write() waits for an event between chunks."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.proceed = threading.Event()
+
+    def write(self, fh):
+        for i in range(10):
+            fh.write('x' * background.CHUNK_SIZE)
+            self.started.set()
+            self.proceed.wait()
+        return 10
+
+class TestBatchWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.zone = dnszone.ForwardZone('example.com')
+        self.zone.add_ns('ns1')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_write_async(self):
+        filename = os.path.join(self.dir, 'example.com.hosts')
+        job = self.zone.write_async(filename)
+        self.assertEqual(job.result(5), 1)
+        conf = bindconf.BINDConf()
+        conf.add_view(bindconf.View('example_view'))
+        filename = os.path.join(self.dir, 'named.conf')
+        self.assertEqual(conf.write_async(filename).result(5), 1)
+        self.assertTrue(os.path.exists(filename))
+
+    def test_cancel_running(self):
+        obj = _Blocking()
+        filename = os.path.join(self.dir, 'blocking')
+        with background.BatchWriter(max_workers=1) as writer:
+            job = writer.submit(obj, filename)
+            pending = writer.submit(self.zone, filename + '2')
+            obj.started.wait(5)
+            self.assertTrue(pending.cancel())
+            self.assertTrue(job.cancel())
+            obj.proceed.set()
+            self.assertRaises(background.Cancelled, job.result, 5)
+        self.assertTrue(pending.cancelled())
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_exception(self):
+        job = self.zone.write_async(os.path.join(self.dir, 'missing', 'x'))
+        self.assertIsInstance(job.exception(5), IOError)
+
+    def test_iter_chunks(self):
+        for i in range(5000):
+            self.zone.add_a('192.168.1.1', 'host%d' % i)
+        chunks = list(background.iter_chunks(self.zone, chunk_size=1024))
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(''.join(chunks).startswith('$ORIGIN example.com.'))
+
+    def test_iter_chunks_closed(self):
+        obj = _Blocking()
+        obj.proceed.set()
+        chunks = background.iter_chunks(obj, max_chunks=1)
+        next(chunks)
+        chunks.close()
+
+if __name__ == '__main__':
+    unittest.main()
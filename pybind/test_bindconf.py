@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+"""Unit tests for bindconf module."""
+
+import threading
+
+import unittest2 as unittest
+
+import bindconf
+
+class TestCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.conf = bindconf.BINDConf()
+        self.view = bindconf.View('example_view')
+
+    def test_valid(self):
+        self.conf.add_acl(bindconf.ACL('example_acl', ('192.168.1.0/24',)))
+        self.conf.add_named_masters(bindconf.NamedMasters('example_masters'))
+        self.conf.add_view(self.view)
+        self.view.set_match_destinations('example_acl', '!10.1.1.1')
+        zone = bindconf.Zone('example.com', 'slave', 'example.com.hosts')
+        masters = bindconf.Masters()
+        masters.add_masters_name('example_masters')
+        masters.add_master('192.168.1.1')
+        zone.set_masters(masters)
+        self.view.add_zone(zone)
+        self.assertEqual(self.conf.check(), [])
+
+    def test_acl_defined_after_use(self):
+        self.conf.add_view(self.view)
+        self.view.set_match_destinations('example_acl')
+        self.conf.add_acl(bindconf.ACL('example_acl', ('192.168.1.1',)))
+        errors = self.conf.check()
+        self.assertEqual(len(errors), 1)
+        self.assertIn('undefined acl "example_acl"', errors[0])
+
+    def test_undefined_masters(self):
+        zone = bindconf.Zone('example.com', 'slave', 'example.com.hosts')
+        masters = bindconf.Masters()
+        masters.add_masters_name('example_masters')
+        zone.set_masters(masters)
+        self.view.add_zone(zone)
+        self.conf.add_view(self.view)
+        errors = self.conf.check()
+        self.assertEqual(len(errors), 1)
+        self.assertIn('undefined masters "example_masters"', errors[0])
+
+    def test_masters_in_master_zone(self):
+        zone = bindconf.Zone('example.com', 'master', 'example.com.hosts')
+        masters = bindconf.Masters()
+        masters.add_master('192.168.1.1')
+        zone.set_masters(masters)
+        self.view.add_zone(zone)
+        self.conf.add_view(self.view)
+        errors = self.conf.check()
+        self.assertEqual(len(errors), 1)
+        self.assertIn('masters not allowed', errors[0])
+
+    def test_duplicate_zone(self):
+        for i in range(2):
+            self.view.add_zone(bindconf.Zone('example.com', 'master',
+                                             'example.com.hosts'))
+        self.view.add_zone(bindconf.Zone('example.org', 'master',
+                                         'example.org.hosts'))
+        self.conf.add_view(self.view)
+        other_view = bindconf.View('other_view')
+        other_view.add_zone(bindconf.Zone('example.com', 'master',
+                                          'example.com.hosts'))
+        self.conf.add_view(other_view)
+        errors = self.conf.check()
+        self.assertEqual(errors,
+                         ['view "example_view": zone "example.com": '
+                          'already defined'])
+
+class TestRemoveElements(unittest.TestCase):
+
+    def test_concurrent_add(self):
+        conf = bindconf.BINDConf()
+        added = []
+
+        def add():
+            for i in range(2000):
+                element = bindconf.iscconf.Statement('acl%d' % i)
+                conf.add_element(element)
+                added.append(element)
+
+        thread = threading.Thread(target=add)
+        thread.start()
+        for i in range(200):
+            conf.add_element(bindconf.iscconf.Statement('removed'))
+            conf.remove_elements('removed')
+        thread.join()
+        self.assertEqual(conf.elements, added)
+
+if __name__ == '__main__':
+    unittest.main()
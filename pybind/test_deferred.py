@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+
+"""Unit tests for deferred module."""
+
+import sys
+
+import unittest2 as unittest
+
+import deferred
+
+class TestModule(unittest.TestCase):
+
+    def test_import_on_access(self):
+        sys.modules.pop('colorsys', None)
+        colorsys = deferred.module('colorsys', globals())
+        self.assertNotIn('colorsys', sys.modules)
+        self.assertEqual(colorsys.rgb_to_hsv(0, 0, 0), (0, 0, 0))
+        self.assertIs(colorsys._module, sys.modules['colorsys'])
+
+    def test_globals_seen(self):
+        instrument = deferred.module('instrument', globals())
+        self.assertIsNone(instrument.recorder)
+        with sys.modules['instrument'].recording() as recorder:
+            self.assertIs(instrument.recorder, recorder)
+
+    def test_missing(self):
+        missing = deferred.module('no_such_module', globals())
+        self.assertRaises(ImportError, getattr, missing, 'name')
+
+if __name__ == '__main__':
+    unittest.main()
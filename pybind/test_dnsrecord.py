@@ -7,6 +7,7 @@ import re
 import unittest2 as unittest
 
 import dnsrecord
+import names
 
 class TestSOA(unittest.TestCase):
 
@@ -62,5 +63,80 @@ line comment'''
         a_rec = dnsrecord.A('host.example.com', '192.168.1.1', comment=com)
         self.assertRegexpMatches(str(a_rec), a_re)
 
+class TestSchema(unittest.TestCase):
+
+    def test_render(self):
+        self.assertEqual(dnsrecord.MX('@', 10, 'mail').data, '10 mail')
+        srv = dnsrecord.SRV('_sip._tcp', 0, 5, 5060, 'sip.example.com.')
+        self.assertEqual(srv.data, '0 5 5060 sip.example.com.')
+        caa = dnsrecord.CAA('@', 0, 'issue', 'ca.example.net')
+        self.assertEqual(str(caa), '@ IN CAA 0 issue "ca.example.net"')
+        hinfo = dnsrecord.HINFO('host', 'x86_64', 'Linux')
+        self.assertEqual(hinfo.data, '"x86_64" "Linux"')
+
+    def test_rdata(self):
+        soa = dnsrecord.SOA('@', 'ns1', 'hostmaster', 1, '3h', '1h', '2d',
+                            3600)
+        self.assertEqual(soa.rdata(),
+                         ('ns1', 'hostmaster', 1, '3h', '1h', '2d', '3600'))
+        tlsa = dnsrecord.TLSA('_443._tcp', 3, 1, 1, 'ABCD')
+        tlsa.data = '3 1 1 AB CD'
+        self.assertEqual(tlsa.rdata(), (3, 1, 1, 'ABCD'))
+
+    def test_wire(self):
+        a = dnsrecord.A('host', '192.168.1.1', ttl='1h')
+        self.assertEqual(a.to_wire('example.com.'),
+                         '\x04host\x07example\x03com\x00'
+                         '\x00\x01\x00\x01\x00\x00\x0e\x10\x00\x04'
+                         '\xc0\xa8\x01\x01')
+        mx = dnsrecord.MX('@', 10, 'mail')
+        self.assertTrue(mx.to_wire('example.com').endswith(
+            '\x00\x0a\x04mail\x07example\x03com\x00'))
+        txt = dnsrecord.TXT('@', 'x' * 300)
+        self.assertEqual(len(txt.to_wire('.')), 1 + 10 + 302)
+        self.assertRaises(ValueError, a.to_wire)
+
+    def test_escapes(self):
+        txt = dnsrecord.TXT('@', 'say \\"hi\\" \\065')
+        self.assertEqual(txt.rdata(), ('say "hi" A',))
+        wire = txt.to_wire('.')
+        self.assertTrue(wire.endswith('\x0asay "hi" A'))
+        self.assertNotIn('\\', wire)
+        self.assertRaises(ValueError,
+                          dnsrecord.TXT('@', '\\256').rdata)
+
+    def test_parse_without_regex(self):
+        # split data gives the same values as the token regex
+        schema = dnsrecord.SOA._schema
+        data = 'ns1 hostmaster (\n\t1 3h 1h\t2d 3600 )'
+        self.assertEqual(schema.parse(data),
+                         ('ns1', 'hostmaster', 1, '3h', '1h', '2d', '3600'))
+        schema = dnsrecord.TLSA._schema
+        self.assertEqual(schema.parse('3 1 1 AB CD'), (3, 1, 1, 'ABCD'))
+        self.assertRaises(ValueError, dnsrecord.MX._schema.parse, '10')
+        self.assertEqual(dnsrecord.CAA._schema.parse('0 issue "ca.example"'),
+                         (0, 'issue', 'ca.example'))
+
+    def test_shared_rdata(self):
+        mx = dnsrecord.MX('www', 10, 'Mail')
+        wire = mx.to_wire('example.com.')
+        table = names.NameTable()
+        mx.share_names(table)
+        self.assertIsInstance(mx.__dict__['_data'], tuple)
+        self.assertEqual(mx.rdata(), (10, 'Mail'))
+        self.assertEqual(mx.to_wire('example.com.'), wire)
+        cname = dnsrecord.CNAME('www', 'web')
+        cname.share_names(table)
+        self.assertEqual(cname.rdata(), ('web',))
+
+    def test_digest(self):
+        first = dnsrecord.MX('Host.example.com.', 10, 'MAIL', ttl=60)
+        second = dnsrecord.MX('host', 10, 'mail.example.com.')
+        self.assertEqual(first.digest('example.com.'),
+                         second.digest('example.com.'))
+        third = dnsrecord.MX('host', 20, 'mail.example.com.')
+        self.assertNotEqual(second.digest('example.com.'),
+                            third.digest('example.com.'))
+
 if __name__ == '__main__':
     unittest.main()
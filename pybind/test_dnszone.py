@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+
+"""Unit tests for dnszone module."""
+
+import gc
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+
+import unittest2 as unittest
+
+import dnsrecord
+import dnszone
+import names
+import snapshot
+
+class TestTemplateZone(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.template = dnszone.TemplateZone()
+        self.template.add_soa('ns1.example.net.', 'hostmaster@example.net')
+        self.template.add_ns('ns1.example.net.')
+        self.template.add_a('192.168.1.1')
+        self.filename = os.path.join(self.dir, 'parked.hosts')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_no_origin(self):
+        self.template.write_file(self.filename)
+        with open(self.filename) as fh:
+            self.assertNotIn('$ORIGIN', fh.read())
+
+    def test_shared_file(self):
+        files = self.template.write_files(self.filename,
+                                          ('example.com', 'example.org'))
+        self.assertEqual(files, {'example.com': self.filename,
+                                 'example.org': self.filename})
+
+    def test_override(self):
+        zone = self.template.override('example.com')
+        self.assertIs(zone.records[0], self.template.records[0])
+        zone.add_txt('not parked')
+        self.assertEqual(len(self.template.records), 3)
+        fmt = os.path.join(self.dir, '%s.hosts')
+        files = self.template.write_files(self.filename,
+                                          ('example.com', 'example.org'),
+                                          fmt)
+        self.assertEqual(os.stat(files['example.org']).st_ino,
+                         os.stat(self.filename).st_ino)
+        with open(files['example.com']) as fh:
+            contents = fh.read()
+        self.assertIn('$ORIGIN example.com.', contents)
+        self.assertIn('not parked', contents)
+        # links are replaced when the shared file is written again
+        self.template.add_txt('parked')
+        files = self.template.write_files(self.filename, ('example.org',),
+                                          fmt)
+        self.assertEqual(os.stat(files['example.org']).st_ino,
+                         os.stat(self.filename).st_ino)
+        self.assertEqual(sorted(os.listdir(self.dir)),
+                         ['example.com.hosts', 'example.org.hosts',
+                          'parked.hosts'])
+
+class TestOverlayZone(unittest.TestCase):
+
+    def setUp(self):
+        self.base = dnszone.ForwardZone('example.com')
+        self.base.add_ns('ns1')
+        self.base.add_a('192.168.1.1', 'www')
+        self.base.add_a('192.168.1.2', 'www')
+        self.base.add_a('192.168.1.3', 'mail')
+        self.overlay = dnszone.OverlayZone(self.base)
+
+    def rendered(self):
+        return [str(r) for r in self.overlay.iter_records()]
+
+    def test_unchanged(self):
+        self.assertEqual(self.rendered(),
+                         [str(r) for r in self.base.records])
+
+    def test_ttl(self):
+        self.assertEqual(self.overlay.ttl, self.base.ttl)
+        self.assertEqual(dnszone.OverlayZone(self.base, ttl=0).ttl, 0)
+
+    def test_remove(self):
+        self.overlay.remove_records('mail')
+        self.assertEqual(len(self.rendered()), 3)
+        self.assertEqual(len(self.base.records), 4)
+
+    def test_override(self):
+        self.overlay.override_record(dnszone.dnsrecord.A('www', '10.1.1.1'))
+        self.overlay.add_a('10.1.1.2', 'internal')
+        rendered = self.rendered()
+        self.assertEqual(len(rendered), 4)
+        self.assertIn('10.1.1.1', rendered[1])
+        self.assertIn('192.168.1.3', rendered[2])
+        self.assertIn('10.1.1.2', rendered[3])
+
+class TestLazyZone(unittest.TestCase):
+
+    def test_source(self):
+        rows = [('www', '192.168.1.%d' % i) for i in range(1, 4)]
+        zone = dnszone.LazyZone('example.com', lambda: iter(rows),
+                                lambda row: dnszone.dnsrecord.A(*row))
+        zone.add_soa('ns1', 'hostmaster')
+        zone.add_ns('ns1')
+        records = [str(r) for r in zone.iter_records()]
+        self.assertEqual(len(records), 5)
+        self.assertIn('SOA', records[0])
+        self.assertIn('192.168.1.3', records[4])
+        # callable source is consumed anew each time
+        self.assertEqual(len(list(zone.iter_records())), 5)
+
+    def test_text_rejected(self):
+        directory = tempfile.mkdtemp()
+        try:
+            zone = dnszone.LazyZone('example.com', ['www IN A 192.0.2.1'])
+            self.assertRaises(TypeError, zone.write_shards,
+                              os.path.join(directory, 'example.com.hosts'))
+            zone = dnszone.LazyZone('example.com', ['www IN A 192.0.2.1'])
+            self.assertRaises(TypeError, snapshot.save_zone, zone,
+                              os.path.join(directory, 'example.com.snap'))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_shards_and_snapshot(self):
+        directory = tempfile.mkdtemp()
+        try:
+            rows = [('host%d' % i, '192.168.1.%d' % i) for i in range(20)]
+            zone = dnszone.LazyZone('example.com', lambda: iter(rows),
+                                    lambda row: dnszone.dnsrecord.A(*row))
+            filename = os.path.join(directory, 'example.com.hosts')
+            self.assertTrue(zone.write_shards(filename, shards=4))
+            snap = os.path.join(directory, 'example.com.snap')
+            snapshot.save_zone(zone, snap)
+            self.assertEqual(len(list(snapshot.load_zone(snap)
+                                      .iter_records())), 20)
+        finally:
+            shutil.rmtree(directory)
+
+class TestMemoryUsage(unittest.TestCase):
+
+    def test_types(self):
+        zone = dnszone.ForwardZone('example.com')
+        zone.add_ns('ns1')
+        zone.add_a('192.168.1.1', 'ns1')
+        zone.add_a('192.168.1.2', 'ns2')
+        usage = zone.memory_usage()
+        self.assertEqual(usage['types']['A']['count'], 2)
+        self.assertEqual(usage['types']['NS']['count'], 1)
+        self.assertEqual(usage['bytes'],
+                         sum(t['bytes'] for t in usage['types'].values()))
+        # class of 'IN' is shared by all records
+        self.assertGreater(usage['shared_string_bytes'], 0)
+
+    def test_overlay_excludes_base(self):
+        base = dnszone.ForwardZone('example.com')
+        for i in range(100):
+            base.add_a('192.168.1.%d' % i, 'host%d' % i)
+        overlay = dnszone.OverlayZone(base)
+        overlay.add_a('192.168.2.1', 'extra')
+        usage = overlay.memory_usage()
+        self.assertEqual(usage['types']['A']['count'], 1)
+        self.assertLess(usage['bytes'], base.memory_usage()['bytes'] / 10)
+
+class TestConcurrency(unittest.TestCase):
+
+    def test_threads(self):
+        zone = dnszone.ForwardZone('example.com')
+        zone.add_soa('ns1', 'hostmaster')
+        zone.enable_concurrency()
+
+        def produce(n):
+            for i in range(500):
+                zone.add_a('192.168.%d.%d' % (n, i % 250),
+                           'host%d-%d' % (n, i))
+
+        threads = [threading.Thread(target=produce, args=(n,))
+                   for n in range(8)]
+        for thread in threads:
+            thread.start()
+        # merging while producers run loses nothing
+        zone.merge_records()
+        for thread in threads:
+            thread.join()
+        records = list(zone.iter_records())
+        self.assertEqual(len(records), 1 + 8 * 500)
+        self.assertIn('SOA', str(records[0]))
+        # each thread's records stay in the order they were added
+        for n in range(8):
+            prefix = 'host%d-' % n
+            names = [r.name for r in records if r.name.startswith(prefix)]
+            self.assertEqual(names, ['host%d-%d' % (n, i)
+                                     for i in range(500)])
+
+    def test_template_override(self):
+        zone = dnszone.TemplateZone()
+        zone.enable_concurrency()
+        zone.add_ns('ns1')
+        override = zone.override('example.com')
+        self.assertEqual(len(override.records), 1)
+
+class TestShareNames(unittest.TestCase):
+
+    def setUp(self):
+        self.zone = dnszone.ForwardZone('example.com')
+        self.zone.add_soa('ns1', 'hostmaster', serial=1)
+        self.zone.add_ns('ns1.example.com.')
+        self.zone.add_a('192.168.1.1', 'www')
+        self.zone.add_cname('www', 'web')
+        self.zone.add_mx('mail.example.com.')
+
+    def render(self, zone):
+        return [str(record) for record in zone.iter_records()]
+
+    def test_unchanged(self):
+        before = self.render(self.zone)
+        self.zone.share_names()
+        self.zone.add_a('192.168.1.2', 'www')
+        self.assertEqual(self.render(self.zone)[:-1], before)
+        self.assertEqual(self.zone.records[-1].name, 'www')
+        # names are shared, as are names in data
+        self.assertNotIn('name', self.zone.records[2].__dict__)
+        for record in self.zone.records[:2] + self.zone.records[3:5]:
+            self.assertNotIn('data', record.__dict__)
+        self.assertEqual(self.zone.records[3].data, 'www')
+        self.assertEqual(self.zone.records[4].data, '10 mail.example.com.')
+        # A records have no names in data
+        self.assertIn('data', self.zone.records[2].__dict__)
+
+    def test_shared_data(self):
+        self.zone.share_names()
+        self.zone.add_mx('mail.example.com.', name='www')
+        self.assertIs(self.zone.records[4]._data, self.zone.records[5]._data)
+        # data that wouldn't be rendered the same way is kept as it is
+        record = dnsrecord.MX('www', 10, 'mail')
+        record.data = '10  mail'
+        record.share_names(names.NameTable())
+        self.assertEqual(record.__dict__['data'], '10  mail')
+
+    def test_table_per_zone(self):
+        before = self.render(self.zone)
+        self.zone.share_names()
+        table = weakref.ref(self.zone._names)
+        # attributes with their default are left out for the table
+        self.assertLessEqual(len(self.zone.records[2].__dict__), 4)
+        # records moved to a zone with another table are rendered from it
+        other = dnszone.ForwardZone('example.com')
+        shared = names.NameTable()
+        other.share_names(shared)
+        for record in self.zone.records:
+            other.add_record(record)
+        self.assertIs(other.records[0]._table, shared)
+        self.assertEqual(self.render(other), before)
+        del self.zone
+        gc.collect()
+        self.assertIsNone(table())
+
+    def test_concurrency(self):
+        self.zone.share_names()
+        self.zone.enable_concurrency()
+        self.zone.add_a('192.168.1.2', 'www')
+        records = list(self.zone.iter_records())
+        self.assertEqual(len(records), 6)
+        self.assertNotIn('name', records[-1].__dict__)
+        self.assertEqual(records[-1].name, 'www')
+
+if __name__ == '__main__':
+    unittest.main()
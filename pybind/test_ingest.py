@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+"""Unit tests for ingest module."""
+
+import os
+import resource
+import shutil
+import StringIO
+import tempfile
+
+import unittest2 as unittest
+
+import dnszone
+import ingest
+
+CSV = '''type,name,data,ttl
+A,www.example.com,192.168.1.1,
+MX,example.com.,10 mail.example.com.,3600
+A,www.example.org,192.168.2.1,
+PTR,192.168.1.1,www.example.com.,
+'''
+
+JSONL = '''{"type": "A", "name": "host.sub.example.com", "data": "192.168.1.2"}
+
+{"type": "CNAME", "name": "alias.example.com", "data": "www"}
+'''
+
+class TestIngester(unittest.TestCase):
+
+    def setUp(self):
+        self.forward = dnszone.ForwardZone('example.com')
+        self.reverse = dnszone.ReverseZone('168.192.in-addr.arpa')
+        self.ingester = ingest.Ingester((self.forward, self.reverse))
+
+    def test_route(self):
+        self.assertIs(self.ingester.route('a.b.EXAMPLE.com.'), self.forward)
+        self.assertIsNone(self.ingester.route('example.org.'))
+
+    def test_csv(self):
+        rows = ingest.read_csv(StringIO.StringIO(CSV))
+        self.assertEqual(self.ingester.ingest(rows), 3)
+        self.assertEqual(self.ingester.unrouted, 1)
+        self.assertEqual(len(self.forward.records), 2)
+        self.assertEqual(len(self.reverse.records), 1)
+
+    def test_jsonl(self):
+        rows = ingest.read_jsonl(StringIO.StringIO(JSONL))
+        self.assertEqual(self.ingester.ingest(rows), 2)
+
+    def test_parsed_types(self):
+        record = ingest.make_record({'type': 'SRV', 'name': '_sip._tcp.'
+                                     'example.com', 'data': '0 5 5060 sip'})
+        self.assertEqual(record.data, '0 5 5060 sip')
+        record = ingest.make_record({'type': 'CAA', 'name': 'example.com',
+                                     'data': '0 issue "ca.example.net"',
+                                     'ttl': '1h'})
+        self.assertEqual(str(record),
+                         'example.com. 1h IN CAA 0 issue "ca.example.net"')
+
+    def test_processes(self):
+        rows = ingest.read_csv(StringIO.StringIO(CSV))
+        self.assertEqual(self.ingester.ingest(rows, processes=2,
+                                              chunksize=1), 3)
+        self.assertEqual(str(self.forward.records[1]).split()[-1],
+                         'mail.example.com.')
+
+    def test_write_files(self):
+        directory = tempfile.mkdtemp()
+        try:
+            self.forward.add_ns('ns1')
+            rows = ingest.read_csv(StringIO.StringIO(CSV))
+            filenames = self.ingester.write_files(
+                rows, os.path.join(directory, '%s.hosts'))
+            with open(filenames['example.com.']) as fh:
+                lines = fh.read().splitlines()
+            self.assertEqual(len(lines), 5)
+            self.assertIn('NS', lines[2])
+            self.assertEqual(self.forward.records[1:], [])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_write_files_many_zones(self):
+        directory = tempfile.mkdtemp()
+        limits = resource.getrlimit(resource.RLIMIT_NOFILE)
+        try:
+            zones = [dnszone.ForwardZone('zone%d.example.' % i)
+                     for i in range(200)]
+            ingester = ingest.Ingester(zones)
+            # records of each zone are interleaved with those of the others
+            rows = [{'type': 'A', 'name': 'host%d.zone%d.example' % (j, i),
+                     'data': '192.168.%d.%d' % (i, j)}
+                    for j in range(3) for i in range(200)]
+            resource.setrlimit(resource.RLIMIT_NOFILE, (64, limits[1]))
+            try:
+                filenames = ingester.write_files(
+                    rows, os.path.join(directory, '%s.hosts'))
+            finally:
+                resource.setrlimit(resource.RLIMIT_NOFILE, limits)
+            self.assertEqual(len(filenames), 200)
+            with open(filenames['zone7.example.']) as fh:
+                lines = fh.read().splitlines()
+            self.assertEqual([line.split()[0] for line in lines[2:]],
+                             ['host0.zone7.example.', 'host1.zone7.example.',
+                              'host2.zone7.example.'])
+            self.assertRaises(ValueError, ingester.write_files, rows,
+                              os.path.join(directory, '%s.hosts'),
+                              max_open=0)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_write_files_atomically(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'example.com.hosts')
+            link = os.path.join(directory, 'link')
+            with open(filename, 'w') as fh:
+                fh.write('old\n')
+            os.link(filename, link)
+
+            def rows():
+                for row in ingest.read_csv(StringIO.StringIO(CSV)):
+                    yield row
+                # records are in temporary files until all are read
+                self.assertTrue([name for name in os.listdir(directory)
+                                 if name.endswith('.tmp')])
+                with open(filename) as fh:
+                    self.assertEqual(fh.read(), 'old\n')
+
+            self.ingester.write_files(rows(),
+                                      os.path.join(directory, '%s.hosts'))
+            with open(filename) as fh:
+                self.assertIn('192.168.1.1', fh.read())
+            with open(link) as fh:
+                self.assertEqual(fh.read(), 'old\n')
+            self.assertEqual(sorted(os.listdir(directory)),
+                             ['168.192.in-addr.arpa.hosts',
+                              'example.com.hosts', 'link'])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_template_zone(self):
+        self.assertRaises(ValueError, ingest.Ingester,
+                          [dnszone.TemplateZone()])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+
+"""Unit tests for package initialization."""
+
+import os
+import subprocess
+import sys
+
+import unittest2 as unittest
+
+PARENT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _run(code):
+    """Return output of code run by new interpreter in package's parent
+    directory.
+    """
+
+    return subprocess.check_output([sys.executable, '-c', code],
+                                   cwd=PARENT).split()
+
+class TestLazyImport(unittest.TestCase):
+
+    def test_nothing_imported(self):
+        loaded = _run('import sys, pybind; '
+                      'print " ".join(sorted(sys.modules))')
+        for name in ('ipaddr', 'pybind.dnszone', 'pybind.dnsrecord',
+                     'pybind.bindconf'):
+            self.assertNotIn(name, loaded)
+
+    def test_name_access(self):
+        loaded = _run('import sys, pybind; pybind.BINDConf; '
+                      'print " ".join(sorted(sys.modules))')
+        self.assertIn('pybind.bindconf', loaded)
+        self.assertNotIn('pybind.dnszone', loaded)
+
+    def test_public_names(self):
+        names = _run('from pybind import *; '
+                     'print ForwardZone.__module__, Zone.__module__')
+        self.assertEqual(names, ['pybind.dnszone', 'pybind.bindconf'])
+
+    def test_submodule_access(self):
+        names = _run('import pybind; print pybind.iscconf.__name__')
+        self.assertEqual(names, ['pybind.iscconf'])
+
+if __name__ == '__main__':
+    unittest.main()
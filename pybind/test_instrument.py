@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+"""Unit tests for instrument module."""
+
+import json
+import os
+import shutil
+import StringIO
+import tempfile
+import threading
+
+import unittest2 as unittest
+
+import background
+import bindconf
+import dnszone
+import instrument
+import scheduler
+
+class TestRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.zone = dnszone.ForwardZone('example.com')
+        self.zone.add_ns('ns1')
+        self.zone.add_a('192.168.1.1', 'ns1')
+        self.conf = bindconf.BINDConf()
+        self.conf.add_view(bindconf.View('example_view'))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self):
+        zone_file = os.path.join(self.dir, 'example.com.hosts')
+        self.zone.write_file(zone_file)
+        self.conf_file = os.path.join(self.dir, 'named.conf')
+        self.conf.write_file(self.conf_file)
+        return os.path.getsize(zone_file)
+
+    def test_disabled(self):
+        self.write()
+        self.assertIsNone(instrument.recorder)
+
+    def test_measure(self):
+        with instrument.recording() as recorder:
+            with instrument.stage('build', 'example.com.'):
+                pass
+            size = self.write()
+        self.assertIsNone(instrument.recorder)
+        stats = recorder.files[('zone', 'example.com.')]
+        self.assertEqual(stats['items'], 2)
+        self.assertEqual(stats['bytes'], size)
+        self.assertEqual(recorder.files[('config', self.conf_file)]['items'],
+                         1)
+        self.assertIn(('build', 'example.com.'), recorder.stages)
+
+    def test_background(self):
+        zone_file = os.path.join(self.dir, 'example.com.hosts')
+        conf_file = os.path.join(self.dir, 'named.conf')
+        with instrument.recording() as recorder:
+            with background.BatchWriter(max_workers=2) as writer:
+                self.assertEqual(
+                    self.zone.write_async(zone_file, writer).result(), 2)
+            with scheduler.Scheduler(debounce=60) as sched:
+                sched.register(self.conf, conf_file, 'named.conf')
+                sched.mark_dirty('named.conf')
+                sched.flush()
+        stats = recorder.files[('zone', 'example.com.')]
+        self.assertEqual(stats['writes'], 1)
+        self.assertEqual(stats['bytes'], os.path.getsize(zone_file))
+        self.assertEqual(recorder.files[('config', conf_file)]['items'], 1)
+
+    def test_threads(self):
+        recorder = instrument.Recorder()
+
+        def measure(name):
+            for i in range(200):
+                recorder.measure('zone', name, self.zone.write,
+                                 StringIO.StringIO())
+                with recorder.stage('build', name):
+                    pass
+
+        threads = [threading.Thread(target=measure, args=(name,))
+                   for name in ('a.', 'b.') * 4]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(recorder.files[('zone', 'a.')]['writes'], 800)
+        self.assertEqual(recorder.files[('zone', 'b.')]['items'], 1600)
+        self.assertEqual(len(recorder.as_dict()['stages']), 2)
+
+    def test_export(self):
+        with instrument.recording() as recorder:
+            self.write()
+        filename = os.path.join(self.dir, 'pybind.prom')
+        recorder.write_prometheus(filename)
+        with open(filename) as fh:
+            text = fh.read()
+        self.assertIn('pybind_file_items_total{kind="zone",'
+                      'name="example.com."} 2', text)
+        filename = os.path.join(self.dir, 'pybind.json')
+        recorder.write_json(filename)
+        with open(filename) as fh:
+            self.assertEqual(len(json.load(fh)['files']), 2)
+
+    def test_escape(self):
+        recorder = instrument.Recorder()
+        recorder.measure('a"\nb', 'c\\d', self.zone.write,
+                         StringIO.StringIO())
+        self.assertIn('{kind="a\\"\\nb",name="c\\\\d"}',
+                      recorder.prometheus())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+"""Unit tests for ipvalid module."""
+
+import ipaddr
+import unittest2 as unittest
+
+import dnsrecord
+import ipvalid
+
+class TestValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = ipvalid.get_validation()
+
+    def tearDown(self):
+        ipvalid.set_validation(self.saved)
+
+    def render(self, validation):
+        ipvalid.set_validation(validation)
+        return [str(dnsrecord.A('host', '192.168.1.1')),
+                str(dnsrecord.AAAA('host', '2001:0db8:0:0::1')),
+                str(dnsrecord.PTR('192.168.1.1', 'host.')),
+                str(dnsrecord.PTR('2001:db8::1', 'host.'))]
+
+    def test_fast_matches_strict(self):
+        self.assertEqual(self.render(ipvalid.FAST),
+                         self.render(ipvalid.STRICT))
+
+    def test_fast_rejects_invalid(self):
+        ipvalid.set_validation(ipvalid.FAST)
+        self.assertRaises(ipaddr.AddressValueError,
+                          dnsrecord.A, 'host', '192.168.1.256')
+        self.assertRaises(ipaddr.AddressValueError,
+                          ipvalid.ip_version, '2001:db8::g')
+
+    def test_trusted(self):
+        ipvalid.set_validation(ipvalid.TRUSTED)
+        self.assertEqual(ipvalid.ip_version('2001:db8::1'), 6)
+        self.assertEqual(dnsrecord.A('host', '192.168.1.1').data,
+                         '192.168.1.1')
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, ipvalid.set_validation, 'lax')
+
+if __name__ == '__main__':
+    unittest.main()
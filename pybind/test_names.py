@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+"""Unit tests for names module."""
+
+import unittest2 as unittest
+
+import names
+
+class TestNameTable(unittest.TestCase):
+
+    def setUp(self):
+        self.table = names.NameTable()
+
+    def test_intern(self):
+        www = self.table.intern('www.example.com.')
+        self.assertEqual(self.table.intern('www.example.com.'), www)
+        self.assertNotEqual(self.table.intern('www.example.com'), www)
+        self.assertNotEqual(self.table.intern('WWW.example.com.'), www)
+        self.assertEqual(self.table.intern('.'), names.ABSOLUTE)
+
+    def test_unicode(self):
+        www = self.table.intern(u'www.example.com.')
+        self.assertEqual(self.table.intern('www.example.com.'), www)
+        self.assertIs(type(self.table.name(www)), str)
+
+    def test_failed_intern(self):
+        self.table.intern('example.com.')
+        size = len(self.table)
+        self.assertRaises(UnicodeEncodeError, self.table.intern,
+                          u'caf\xe9.example.com.')
+        self.assertEqual(len(self.table), size)
+        www = self.table.intern('www.example.org.')
+        self.assertEqual(self.table.name(www), 'www.example.org.')
+
+    def test_share(self):
+        values = (10, self.table.intern('mail.example.com.'))
+        shared = self.table.share(values)
+        self.assertIs(self.table.share(tuple(list(values))), shared)
+
+    def test_shared_suffix(self):
+        self.table.intern('www.example.com.')
+        size = len(self.table)
+        self.table.intern('mail.example.com.')
+        self.assertEqual(len(self.table), size + 1)
+
+    def test_name(self):
+        for name in ('www.example.com.', 'www', '@', 'a.b', 'com.', '.'):
+            self.assertEqual(self.table.name(self.table.intern(name)), name)
+
+    def test_labels_of(self):
+        self.assertEqual(self.table.labels_of(self.table.intern('a.b.c.')),
+                         ('c', 'b', 'a'))
+
+    def test_sort_key(self):
+        ordered = ['example.', 'a.example.', 'Z.a.example.', 'zABC.a.EXAMPLE.',
+                   'z.example.', '\\001.z.example.', 'www']
+        keys = [self.table.sort_key(self.table.intern(name))
+                for name in ordered]
+        self.assertEqual(sorted(keys), keys)
+
+if __name__ == '__main__':
+    unittest.main()
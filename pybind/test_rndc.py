@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+"""Unit tests for rndc module."""
+
+import os
+import shutil
+import stat
+import tempfile
+
+import unittest2 as unittest
+
+import bindconf
+import rndc
+
+def make_conf(zones, acl=('192.168.1.1',)):
+    conf = bindconf.BINDConf()
+    conf.add_acl(bindconf.ACL('internal', acl))
+    view = bindconf.View('internal')
+    for name in zones:
+        view.add_zone(bindconf.Zone(name, 'master', '%s.hosts' % name,
+                                    comment='generated'))
+    conf.add_view(view)
+    return conf
+
+class TestPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.old = make_conf(['example.com', 'example.org'])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, data):
+        with open(os.path.join(self.directory, '%s.hosts' % name),
+                  'w') as fh:
+            fh.write(data)
+
+    def digests(self, conf):
+        return rndc.file_digests(conf, self.directory)
+
+    def test_reload_changed_zone(self):
+        self.write('example.com', 'a')
+        self.write('example.org', 'b')
+        old_digests = self.digests(self.old)
+        self.write('example.com', 'c')
+        new = make_conf(['example.com', 'example.org'])
+        new.elements[1].elements[0].set_comment('regenerated')
+        commands = rndc.plan(self.old, new, old_digests, self.digests(new))
+        self.assertEqual(commands,
+                         [('reload', 'example.com', 'IN', 'internal')])
+
+    def test_reconfig(self):
+        new = make_conf(['example.com', 'example.org'], ('192.168.1.2',))
+        self.assertEqual(rndc.plan(self.old, new), [('reconfig',)])
+        new = make_conf(['example.com', 'example.org'])
+        new.elements[1].elements[0].set_allow_update('192.168.1.1')
+        self.assertEqual(rndc.plan(self.old, new), [('reconfig',)])
+        new = make_conf(['example.com'])
+        self.assertEqual(rndc.plan(self.old, new), [('reconfig',)])
+
+    def test_new_zones(self):
+        # zones in named.conf are added and removed by reconfig only
+        new = make_conf(['example.com', 'example.net'])
+        self.assertEqual(rndc.plan(self.old, new), [('reconfig',)])
+        old_added = make_conf(['example.org'])
+        new_added = make_conf(['example.org', 'example.net'])
+        new = make_conf(['example.com'])
+        self.assertEqual(rndc.plan(new, new, None, None, old_added,
+                                   new_added),
+                         [('addzone', 'example.net', 'IN', 'internal',
+                           '{ type master; file "example.net.hosts"; };')])
+        # zone moved into named.conf is deleted first
+        self.assertEqual(rndc.plan(new, self.old, None, None, old_added,
+                                   make_conf([])),
+                         [('delzone', 'example.org', 'IN', 'internal'),
+                          ('reconfig',)])
+        self.assertRaises(ValueError, rndc.plan, self.old, self.old, None,
+                          None, None, old_added)
+
+    def test_zone_without_type(self):
+        self.write('example.com', 'a')
+        conf = make_conf(['example.com'])
+        conf.elements[1].add_zone(bindconf.Zone('example.net'))
+        self.assertEqual(self.digests(conf).keys(),
+                         [('internal', 'example.com', 'IN')])
+        self.assertEqual(rndc.plan(conf, conf), [])
+
+    def test_execute(self):
+        log = os.path.join(self.directory, 'log')
+        fake = os.path.join(self.directory, 'rndc')
+        with open(fake, 'w') as fh:
+            fh.write('#!/bin/sh\necho "$@" >> %s\n' % log)
+        os.chmod(fake, stat.S_IRWXU)
+        commands = [('reconfig',),
+                    ('reload', 'example.com', 'IN', 'internal')]
+        rndc.execute(commands, rndc.RNDC(fake, ('-s', '127.0.0.1')))
+        with open(log) as fh:
+            self.assertEqual(fh.read().splitlines(),
+                             ['-s 127.0.0.1 reconfig',
+                              '-s 127.0.0.1 reload example.com IN internal'])
+        executed = []
+        rndc.execute(commands, executed.append)
+        self.assertEqual(executed, commands)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+"""Unit tests for scheduler module."""
+
+import os
+import shutil
+import tempfile
+import time
+
+import unittest2 as unittest
+
+import dnszone
+import scheduler
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.zone = dnszone.ForwardZone('example.com')
+        self.filename = os.path.join(self.directory, 'example.com.hosts')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_debounce(self):
+        with scheduler.Scheduler(debounce=0.2) as sched:
+            sched.register(self.zone, self.filename)
+            for i in range(10):
+                sched.apply('example.com.',
+                            lambda zone: zone.add_a('192.168.1.%d' % i,
+                                                    'host%d' % i))
+            self.assertEqual(sched.dirty(), ['example.com.'])
+            self.assertFalse(os.path.exists(self.filename))
+            deadline = time.time() + 5
+            while sched.dirty() and time.time() < deadline:
+                time.sleep(0.05)
+            self.assertEqual(sched.stats('example.com.'),
+                             {'writes': 1, 'error': None, 'dirty': False})
+        with open(self.filename) as fh:
+            self.assertEqual(fh.read().count(' A '), 10)
+
+    def test_flush(self):
+        sched = scheduler.Scheduler(debounce=60)
+        sched.register(self.zone, self.filename)
+        sched.register(self.zone, os.path.join(self.directory, 'missing',
+                                               'file'), 'broken')
+        sched.mark_dirty('example.com.')
+        sched.mark_dirty('broken')
+        self.assertEqual(sched.flush(5), ['broken'])
+        self.assertTrue(os.path.exists(self.filename))
+        self.assertEqual(sched.dirty(), ['broken'])
+        sched.stop(flush=False)
+
+    def test_flush_written_at_once(self):
+        sched = scheduler.Scheduler(debounce=60)
+        submit = sched._writer.submit
+
+        def submit_and_wait(*args):
+            # the job is done before flush() adds its callback
+            job = submit(*args)
+            job.exception()
+            return job
+
+        sched._writer.submit = submit_and_wait
+        sched.register(self.zone, self.filename)
+        sched.mark_dirty('example.com.')
+        start = time.time()
+        self.assertEqual(sched.flush(5), [])
+        self.assertLess(time.time() - start, 1)
+        sched.stop(flush=False)
+
+    def test_order(self):
+        now = [100.0]
+        sched = scheduler.Scheduler(debounce=1.0, max_delay=5.0,
+                                    clock=lambda: now[0])
+        sched.stop(flush=False)
+        big = dnszone.ForwardZone('big.example')
+        for i in range(10):
+            big.add_ns('ns%d' % i)
+        for zone in (big, self.zone, dnszone.ForwardZone('old.example')):
+            sched.register(zone, 'unused')
+        sched.mark_dirty('old.example.')
+        now[0] = 101.5
+        sched.mark_dirty('big.example.')
+        sched.mark_dirty('example.com.')
+        now[0] = 102.0
+        # old.example is due, the others changed too recently
+        due, wake = sched._due(now[0])
+        self.assertEqual([entry.name for entry in due], ['old.example.'])
+        self.assertEqual(wake, 102.5)
+        now[0] = 103.0
+        due, wake = sched._due(now[0])
+        self.assertEqual([entry.name for entry in due],
+                         ['old.example.', 'example.com.', 'big.example.'])
+        # continuous changes are written after max_delay
+        for now[0] in (103.5, 104.0, 104.5, 105.0):
+            sched.mark_dirty('old.example.')
+        due, wake = sched._due(now[0])
+        self.assertEqual(due[0].name, 'old.example.')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+"""Unit tests for shard module."""
+
+import os
+import shutil
+import tempfile
+import threading
+
+import unittest2 as unittest
+
+import archive
+import dnszone
+import shard
+
+class TestWriteShards(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'example.com.hosts')
+        self.zone = dnszone.ForwardZone('example.com')
+        self.zone.add_soa('ns1', 'hostmaster', serial=1)
+        self.zone.add_ns('ns1')
+        for i in range(100):
+            self.zone.add_a('192.168.1.%d' % i, 'host%d' % i)
+            self.zone.add_a('192.168.2.%d' % i, 'host%d.lab' % i)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self, filename):
+        with open(filename) as fh:
+            return fh.read().splitlines()
+
+    def records(self, shards):
+        lines = []
+        for i in range(shards):
+            lines.extend(self.read('%s.%04d' % (self.filename, i))[1:])
+        return lines
+
+    def test_write(self):
+        written = self.zone.write_shards(self.filename, 4)
+        self.assertEqual(len(written), 5)
+        lines = self.read(self.filename)
+        self.assertEqual(lines[:2], ['$ORIGIN example.com.', '$TTL 1h'])
+        self.assertIn('SOA', lines[2])
+        self.assertEqual(lines[3:],
+                         ['$INCLUDE %s.%04d' % (self.filename, i)
+                          for i in range(4)])
+        self.assertEqual(sorted(self.records(4)),
+                         sorted(str(r) for r in self.zone.records[1:]))
+
+    def test_rewrite_changed(self):
+        self.zone.write_shards(self.filename, 4)
+        self.assertEqual(self.zone.write_shards(self.filename, 4), [])
+        self.zone.add_a('192.168.3.1', 'host1')
+        written = self.zone.write_shards(self.filename, 4)
+        self.assertEqual(len(written), 1)
+        self.assertIn('192.168.3.1', open(written[0]).read())
+        # fewer shards remove fragments no longer included
+        self.zone.write_shards(self.filename, 2)
+        self.assertFalse(os.path.exists(self.filename + '.0002'))
+
+    def test_subtree(self):
+        self.zone.write_shards(self.filename, 8, shard.SUBTREE, processes=2,
+                               include_format='master/%s')
+        self.assertIn('$INCLUDE master/%s.0000' % self.filename,
+                      self.read(self.filename))
+        fragments = [i for i in range(8)
+                     if any('.lab' in line for line
+                            in self.read('%s.%04d' % (self.filename, i)))]
+        self.assertEqual(len(fragments), 1)
+        self.assertEqual(len(self.records(8)), 201)
+
+    def test_threads(self):
+        zones = []
+        for n in range(4):
+            zone = dnszone.ForwardZone('example%d.com' % n)
+            for i in range(200):
+                zone.add_a('192.168.%d.%d' % (n, i), 'host%d' % i)
+            zones.append(zone)
+        filenames = [os.path.join(self.directory, '%d.hosts' % n)
+                     for n in range(4)]
+        threads = [threading.Thread(target=zone.write_shards,
+                                    args=(filename, 4))
+                   for zone, filename in zip(zones, filenames)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for n, filename in enumerate(filenames):
+            self.filename = filename
+            lines = self.records(4)
+            self.assertEqual(len(lines), 200)
+            self.assertTrue(all('192.168.%d.' % n in line
+                                for line in lines))
+
+    def test_archive(self):
+        store = archive.Archive(os.path.join(self.directory, 'archive'))
+        self.zone.write_shards(self.filename, 4)
+        generation = store.generation('first')
+        # unchanged fragments are archived too
+        self.assertEqual(self.zone.write_shards(self.filename, 4,
+                                                generation=generation), [])
+        self.assertEqual(len(generation.files), 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+"""Unit tests for snapshot module."""
+
+import os
+import shutil
+import tempfile
+import time
+
+import unittest2 as unittest
+
+import bindconf
+import dnszone
+import snapshot
+
+class TestZoneSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'example.com.snap')
+        self.zone = dnszone.ForwardZone('example.com', ttl=600)
+        self.zone.add_soa('ns1', 'hostmaster')
+        self.zone.add_ns('ns1')
+        self.zone.add_a('192.168.1.1', 'ns1', ttl=60)
+        self.zone.add_aaaa('2001:db8::1', 'ns1')
+        self.zone.add_mx('mail', 20)
+        self.zone.add_txt('a longer string of text')
+        self.zone.records[-1].comment = 'a comment'
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def render(self, zone):
+        filename = os.path.join(self.dir, 'zone')
+        zone.write_file(filename)
+        with open(filename) as fh:
+            return fh.read()
+
+    def test_lazy(self):
+        snapshot.save_zone(self.zone, self.filename)
+        zone = snapshot.load_zone(self.filename)
+        self.assertEqual(self.render(zone), self.render(self.zone))
+        self.assertEqual(zone.records, [])
+        zone.close()
+
+    def test_materialized(self):
+        snapshot.save_zone(self.zone, self.filename)
+        zone = snapshot.load_zone(self.filename, lazy=False)
+        self.assertIsInstance(zone, dnszone.ForwardZone)
+        self.assertEqual(len(zone.records), 6)
+        self.assertEqual(self.render(zone), self.render(self.zone))
+
+    def test_reload(self):
+        snapshot.save_zone(self.zone, self.filename)
+        zone = snapshot.load_zone(self.filename)
+        self.assertFalse(zone.reload())
+        self.zone.add_cname('ns1', 'www')
+        time.sleep(0.01)
+        snapshot.save_zone(self.zone, self.filename)
+        self.assertTrue(zone.reload())
+        self.assertEqual(len(list(zone.iter_records())), 7)
+        zone.close()
+
+    def test_version(self):
+        snapshot.save_zone(self.zone, self.filename)
+        with open(self.filename, 'r+b') as fh:
+            fh.seek(4)
+            fh.write('\x63')
+        self.assertRaises(ValueError, snapshot.load_zone, self.filename)
+        self.assertRaises(ValueError, snapshot.load_conf, self.filename)
+
+class TestConfSnapshot(unittest.TestCase):
+
+    def test_round_trip(self):
+        conf = bindconf.BINDConf()
+        conf.add_acl(bindconf.ACL('example_acl', ('192.168.1.0/24',)))
+        view = bindconf.View('example_view', comment='view\ncomment')
+        conf.add_view(view)
+        zone = bindconf.Zone('example.com', 'slave', 'example.com.hosts')
+        masters = bindconf.Masters(port=5353)
+        masters.add_master('192.168.1.1', key='example_key')
+        zone.set_masters(masters)
+        zone.set_notify_source('192.168.1.2', 53)
+        view.add_zone(zone)
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'named.snap')
+            snapshot.save_conf(conf, filename)
+            loaded = snapshot.load_conf(filename)
+            conf.write_file(os.path.join(directory, 'before'))
+            loaded.write_file(os.path.join(directory, 'after'))
+            with open(os.path.join(directory, 'before')) as fh:
+                before = fh.read()
+            with open(os.path.join(directory, 'after')) as fh:
+                self.assertEqual(fh.read(), before)
+            self.assertIsInstance(loaded.elements[1].elements[0],
+                                  bindconf.Zone)
+            self.assertEqual(loaded.check(), [])
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
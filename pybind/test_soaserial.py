@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+"""Unit tests for soaserial module."""
+
+import os
+import shutil
+import tempfile
+import time
+
+import unittest2 as unittest
+
+import dnszone
+import soaserial
+
+class TestBumpSerial(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'example.com.hosts')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_zone(self, serial=None, epochserial=False):
+        zone = dnszone.ForwardZone('example.com', epochserial=epochserial)
+        zone.add_soa('ns1', 'hostmaster', serial)
+        zone.add_ns('ns1')
+        zone.write_file(self.filename)
+        with open(self.filename) as fh:
+            return fh.read()
+
+    def read(self):
+        with open(self.filename) as fh:
+            return fh.read()
+
+    def test_same_day(self):
+        today = int(time.strftime('%Y%m%d00'))
+        before = self.write_zone()
+        inode = os.stat(self.filename).st_ino
+        self.assertEqual(soaserial.bump_serial(self.filename), today + 1)
+        self.assertEqual(soaserial.bump_serial(self.filename), today + 2)
+        self.assertEqual(self.read(), before.replace(str(today),
+                                                     str(today + 2)))
+        self.assertEqual(os.stat(self.filename).st_ino, inode)
+
+    def test_new_day(self):
+        self.write_zone(2012010103)
+        today = int(time.strftime('%Y%m%d00'))
+        self.assertEqual(soaserial.bump_serial(self.filename), today)
+
+    def test_epoch(self):
+        self.write_zone(epochserial=True)
+        now = int(time.time())
+        self.assertGreaterEqual(
+            soaserial.bump_serial(self.filename, epochserial=True), now)
+
+    def test_width_change(self):
+        before = self.write_zone(999)
+        self.assertEqual(soaserial.bump_serial(self.filename, 1000), 1000)
+        self.assertEqual(self.read(), before.replace('(999 ', '(1000 '))
+
+    def test_linked(self):
+        before = self.write_zone(1000)
+        link = os.path.join(self.dir, 'example.net.hosts')
+        os.link(self.filename, link)
+        self.assertEqual(soaserial.bump_serial(self.filename, 1001), 1001)
+        self.assertEqual(self.read(), before.replace('(1000 ', '(1001 '))
+        with open(link) as fh:
+            self.assertEqual(fh.read(), before)
+
+    def test_comment(self):
+        with open(self.filename, 'w') as fh:
+            fh.write('; @ IN SOA ns1 hostmaster (5 1 1 1 1)\n'
+                     '@ IN SOA ns1 hostmaster (7 1 1 1 1)\n')
+        self.assertEqual(soaserial.bump_serial(self.filename, 8), 8)
+        self.assertIn('(5 1', self.read())
+
+    def test_no_soa(self):
+        with open(self.filename, 'w') as fh:
+            fh.write('@ IN NS ns1\n')
+        self.assertRaises(ValueError, soaserial.bump_serial, self.filename)
+
+if __name__ == '__main__':
+    unittest.main()
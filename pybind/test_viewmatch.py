@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+"""Unit tests for viewmatch module."""
+
+import random
+
+import ipaddr
+import unittest2 as unittest
+
+import bindconf
+import iscconf
+import viewmatch
+
+class TestViewMatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.conf = bindconf.BINDConf()
+        self.conf.add_acl(bindconf.ACL('internal', ('!10.9.0.0/16', '10/8',
+                                                    '192.168.0.0/16')))
+        self.conf.add_acl(bindconf.ACL('lab', ('internal', '10.9.1.0/24')))
+        self.lab = bindconf.View('lab')
+        self.lab.set_match_clients('lab')
+        self.lab.set_match_destinations('192.168.0.54')
+        self.internal = bindconf.View('internal')
+        self.internal.set_match_clients('!10.1.1.1', 'internal',
+                                        '2001:db8::/32')
+        self.external = bindconf.View('external')
+        self.external.set_match_clients('!localnets', 'any')
+        for view in (self.lab, self.internal, self.external):
+            self.conf.add_view(view)
+
+    def matcher(self):
+        return viewmatch.ViewMatcher(self.conf,
+                                     localnets=('172.16.0.0/24',))
+
+    def test_match(self):
+        matcher = self.matcher()
+        self.assertEqual(matcher.match('10.1.2.3', '192.168.0.53'),
+                         'internal')
+        self.assertEqual(matcher.match('10.1.2.3', '192.168.0.54'), 'lab')
+        # negated element rejects address accepted by a later one
+        self.assertEqual(matcher.match('10.1.1.1', '192.168.0.53'),
+                         'external')
+        # address rejected by nested ACL falls through to next element
+        self.assertEqual(matcher.match('10.9.1.1', '192.168.0.54'), 'lab')
+        self.assertEqual(matcher.match('10.9.2.1', '192.168.0.54'),
+                         'external')
+        self.assertEqual(matcher.match('2001:db8::1', '::1'), 'internal')
+        self.assertEqual(matcher.match('203.0.113.1', '192.168.0.53'),
+                         'external')
+        self.assertIsNone(matcher.match('172.16.0.10', '192.168.0.53'))
+        self.assertEqual(matcher.match(ipaddr.IPAddress('10.1.2.3'),
+                                       ipaddr.IPAddress('192.168.0.54')),
+                         'lab')
+        self.assertRaises(ValueError, matcher.match, '10.1.2', '10.0.0.1')
+
+    def test_match_many(self):
+        matcher = self.matcher()
+        pairs = [('10.1.2.3', '192.168.0.53'), ('10.1.2.3', '192.168.0.54'),
+                 ('10.1.2.3', '192.168.0.53'), ('192.168.0.1', '10.0.0.1')]
+        self.assertEqual(matcher.match_many(pairs),
+                         [matcher.match(*pair) for pair in pairs])
+
+    def test_recursive_only(self):
+        self.lab.add_element(iscconf.Statement('match-recursive-only',
+                                               ('yes',)))
+        matcher = self.matcher()
+        self.assertEqual(matcher.match('10.1.2.3', '192.168.0.54'), 'lab')
+        self.assertEqual(matcher.match('10.1.2.3', '192.168.0.54', False),
+                         'internal')
+
+    def test_nested_list(self):
+        view = bindconf.View('nested')
+        view.set_match_clients('!{ !10.1.0.0/16; 10/8; }', '10.1.2.3')
+        conf = bindconf.BINDConf()
+        conf.add_view(view)
+        matcher = viewmatch.ViewMatcher(conf)
+        self.assertEqual(matcher.match('10.1.2.3', '10.0.0.1'), 'nested')
+        self.assertIsNone(matcher.match('10.2.0.1', '10.0.0.1'))
+
+    def test_default_view(self):
+        matcher = viewmatch.ViewMatcher(bindconf.BINDConf())
+        self.assertEqual(matcher.match('::1', '10.0.0.1'),
+                         viewmatch.DEFAULT_VIEW)
+
+    def test_undefined_acl(self):
+        self.internal.set_match_clients('missing')
+        self.assertRaises(ValueError, self.matcher)
+        self.conf.add_acl(bindconf.ACL('missing', ('missing',)))
+        self.assertRaises(ValueError, self.matcher)
+
+    def test_first_match(self):
+        # compare with evaluating elements one by one
+        rng = random.Random(0)
+        for trial in range(20):
+            elements = []
+            for i in range(rng.randint(1, 12)):
+                length = rng.randint(16, 32)
+                network = ipaddr.IPNetwork('10.0.%d.%d/%d' %
+                                           (rng.randint(0, 3),
+                                            rng.randint(0, 255), length))
+                elements.append(('!' if rng.random() < 0.4 else '') +
+                                str(network.masked()))
+            view = bindconf.View('view')
+            view.set_match_clients(*elements)
+            conf = bindconf.BINDConf()
+            conf.add_view(view)
+            matcher = viewmatch.ViewMatcher(conf)
+            for j in range(200):
+                address = ipaddr.IPAddress('10.0.%d.%d' %
+                                           (rng.randint(0, 3),
+                                            rng.randint(0, 255)))
+                expected = None
+                for element in elements:
+                    if address in ipaddr.IPNetwork(element.lstrip('!')):
+                        if not element.startswith('!'):
+                            expected = 'view'
+                        break
+                self.assertEqual(matcher.match(address, '10.0.0.1'),
+                                 expected, (elements, address))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,332 @@
+"""Classes for finding which view of a BIND configuration a query
+would be served from, without running named.
+
+A ViewMatcher compiles the ACLs of a BINDConf and the match-clients and
+match-destinations statements of its views, and then answers which
+view matches a (client, destination) pair of addresses:
+
+  matcher = viewmatch.ViewMatcher(conf)
+  matcher.match('192.168.1.10', '192.168.0.53')  # 'internal'
+  matcher.match_many(pairs)  # list of view names, e.g. for a query log
+
+Views are tried in order, and the first whose match-clients list
+matches the client and whose match-destinations list matches the
+destination (both default to any) is chosen; None means no view
+matches and named would refuse the query. A configuration without
+views has a single view, '_default'.
+
+Address match lists are evaluated as named does: the first element
+matching an address decides, and a negated element rejects it. A
+nested list or ACL matches an address only if it accepts it; an
+address it rejects is passed on to the following elements. any and
+none, and localhost and localnets (whose addresses are given to the
+matcher, as they depend on the server's interfaces), are builtin. Key
+elements never match, as queries are taken to be unsigned.
+
+Rather than a radix tree, each list is compiled into sorted, disjoint
+address ranges, found by binary search (bisect), which gives the same
+first-match answer. The lists of all views are then merged into one
+table per address family mapping ranges to a bit mask of the views
+whose list accepts them, so a lookup is two searches and an AND.
+"""
+
+import bisect
+import heapq
+import socket
+import struct
+
+_BITS = {4: 32, 6: 128}  # address bits by IP version
+
+LOCALHOST = ('127.0.0.1', '::1')
+LOCALNETS = ('127.0.0.0/8', '::1/128')
+
+DEFAULT_VIEW = '_default'
+
+class ViewMatcher(object):
+
+    """Class for compiled view selection of a BIND configuration."""
+
+    def __init__(self, conf, localhost=LOCALHOST, localnets=LOCALNETS,
+                 class_='IN'):
+        """Return a ViewMatcher object.
+
+        Args:
+            conf: (bindconf.BINDConf) configuration whose views are matched
+            localhost: (tuple) addresses of the server, matched by the
+              localhost ACL
+              ('127.0.0.1', '::1', '192.168.0.53')
+            localnets: (tuple) networks of the server's interfaces,
+              matched by the localnets ACL
+              ('127.0.0.0/8', '::1/128', '192.168.0.0/24')
+            class_: (str) class of views considered
+              'IN'
+
+        Raises:
+            ValueError: an ACL is undefined or includes itself, or an
+              address is invalid
+        """
+
+        self._acls = {}  # name: address match list
+        self._builtins = {'localhost': localhost, 'localnets': localnets}
+        views = []
+        for element in conf.elements:
+            if element.label == 'acl':
+                self._acls[_unquote(element.value[0])] = element.stanza
+            elif element.label == 'view':
+                additional = element.additional
+                if len(additional) < 2 or \
+                   str(additional[1]).upper() == class_.upper():
+                    views.append(element)
+        if views:
+            self.views = [_unquote(view.additional[0]) for view in views]
+        else:
+            self.views = [DEFAULT_VIEW]
+        self._recursive_only = 0  # mask of views matching recursion only
+        clients = dict((version, []) for version in _BITS)
+        destinations = dict((version, []) for version in _BITS)
+        for index, view in enumerate(views):
+            for stmt in view.get_elements('match-recursive-only'):
+                if stmt.value and str(stmt.value[0]).lower() in ('yes',
+                                                                 'true'):
+                    self._recursive_only |= 1 << index
+            for label, ranges in (('match-clients', clients),
+                                  ('match-destinations', destinations)):
+                stmts = view.get_elements(label)
+                stanza = stmts[0].stanza if stmts else ['any']
+                for version in _BITS:
+                    ranges[version].append(self._compile(stanza, version))
+        if not views:
+            for ranges in (clients, destinations):
+                for version in _BITS:
+                    ranges[version].append(self._compile(['any'], version))
+        self._tables = {}  # version: (client table, destination table)
+        for version, bits in _BITS.iteritems():
+            self._tables[version] = (_merge(clients[version], bits),
+                                     _merge(destinations[version], bits))
+
+    def match(self, client, destination, recursive=True):
+        """Return name of view matching query, or None.
+
+        Args:
+            client: (str or ipaddr object) address of client
+              '192.168.1.10'
+            destination: (str or ipaddr object) address on which the
+              query is received
+              '192.168.0.53'
+            recursive: (boolean) whether the query asks for recursion
+              (views with match-recursive-only yes match only if so)
+        """
+
+        mask = self._mask(client, 0) & self._mask(destination, 1)
+        if not recursive:
+            mask &= ~self._recursive_only
+        return self._view(mask)
+
+    def match_many(self, pairs, recursive=True):
+        """Return list of names of views matching queries (or None).
+
+        Addresses are parsed and looked up once each, so this is much
+        faster than match() for logs in which addresses repeat.
+
+        Args:
+            pairs: (iterable) (client, destination) tuples
+            recursive: (boolean) whether the queries ask for recursion
+        """
+
+        clients = {}
+        destinations = {}
+        exclude = 0 if recursive else self._recursive_only
+        views = []
+        append = views.append
+        for client, destination in pairs:
+            client_mask = clients.get(client)
+            if client_mask is None:
+                client_mask = clients[client] = self._mask(client, 0)
+            destination_mask = destinations.get(destination)
+            if destination_mask is None:
+                destination_mask = destinations[destination] = \
+                    self._mask(destination, 1)
+            append(self._view(client_mask & destination_mask & ~exclude))
+        return views
+
+    def _view(self, mask):
+        """Return name of first view in mask, or None."""
+
+        if not mask:
+            return None
+        return self.views[(mask & -mask).bit_length() - 1]
+
+    def _mask(self, address, side):
+        """Return mask of views whose client (side 0) or destination
+        (side 1) list accepts address.
+        """
+
+        version, value = _parse(address)
+        starts, masks = self._tables[version][side]
+        return masks[bisect.bisect_right(starts, value) - 1]
+
+    def _compile(self, stanza, version, including=()):
+        """Return address match list as (starts, values) ranges, values
+        being True (accepted), False (rejected) or None (no match).
+        """
+
+        bits = _BITS[version]
+        entries = []  # (first address, address after last, value)
+        for item in stanza:
+            item = str(item).strip()
+            negated = item.startswith('!')
+            if negated:
+                item = item[1:].strip()
+            if item.startswith('{'):
+                nested = _split(item[1:item.rindex('}')])
+                entries.extend(_accepted(self._compile(nested, version,
+                                                       including),
+                                         bits, not negated))
+            elif item.startswith('key '):
+                continue
+            elif item in ('any', 'none'):
+                entries.append((0, 1 << bits, (item == 'any') != negated))
+            elif item in self._builtins:
+                for network in self._builtins[item]:
+                    if _version(network) == version:
+                        entries.append(_network(network)[1:] +
+                                       (not negated,))
+            elif item[0] in '0123456789' or ':' in item:
+                if _version(item) == version:
+                    entries.append(_network(item)[1:] + (not negated,))
+            else:
+                name = _unquote(item)
+                if name not in self._acls:
+                    raise ValueError('undefined acl "%s"' % name)
+                if name in including:
+                    raise ValueError('acl "%s" includes itself' % name)
+                ranges = self._compile(self._acls[name], version,
+                                       including + (name,))
+                entries.extend(_accepted(ranges, bits, not negated))
+        return _first_match(entries)
+
+def _unquote(name):
+    """Return name without surrounding double quotes."""
+
+    return str(name).strip('"')
+
+def _split(text):
+    """Return elements of address match list text (without its braces)."""
+
+    items = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(text):
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+        elif char == ';' and not depth:
+            items.append(text[start:i].strip())
+            start = i + 1
+    items.append(text[start:].strip())
+    return [item for item in items if item]
+
+def _version(text):
+    """Return IP version of address or prefix, without checking it."""
+
+    return 6 if ':' in text else 4
+
+def _network(text):
+    """Return (version, first address, address after last) of address
+    or prefix.
+    """
+
+    address, slash, length = text.partition('/')
+    if slash and ':' not in address:
+        # named allows abbreviated prefixes, e.g. 10/8
+        address += '.0' * (3 - address.count('.'))
+    version, value = _parse(address)
+    bits = _BITS[version]
+    if slash:
+        if not length.isdigit() or int(length) > bits:
+            raise ValueError('invalid prefix: %s' % text)
+        size = 1 << (bits - int(length))
+    else:
+        size = 1
+    first = value - value % size
+    return version, first, first + size
+
+def _parse(address):
+    """Return (version, integer) of address."""
+
+    if not isinstance(address, basestring):
+        return address.version, int(address)
+    try:
+        if ':' in address:
+            high, low = struct.unpack('!QQ', socket.inet_pton(
+                socket.AF_INET6, address))
+            return 6, high << 64 | low
+        return 4, struct.unpack('!I', socket.inet_pton(socket.AF_INET,
+                                                       address))[0]
+    except socket.error:
+        raise ValueError('invalid IP address: %s' % address)
+
+def _accepted(ranges, bits, value):
+    """Return entries giving value to addresses accepted in ranges."""
+
+    starts, values = ranges
+    ends = starts[1:] + [1 << bits]
+    return [(start, end, value)
+            for start, end, accepted in zip(starts, ends, values)
+            if accepted]
+
+def _first_match(entries):
+    """Return (starts, values) ranges covering all addresses, each
+    address having the value of the first entry containing it.
+
+    Args:
+        entries: (list) (first address, address after last, value)
+          tuples in order of precedence
+    """
+
+    starts = [0]
+    values = [None]
+    points = sorted(set([start for start, end, value in entries] +
+                        [end for start, end, value in entries]))
+    order = sorted(range(len(entries)), key=lambda i: entries[i][0])
+    active = []  # heap of (index, end, value)
+    next_entry = 0
+    for point in points:
+        while next_entry < len(order) and \
+              entries[order[next_entry]][0] == point:
+            index = order[next_entry]
+            heapq.heappush(active, (index,) + entries[index][1:])
+            next_entry += 1
+        while active and active[0][1] <= point:
+            heapq.heappop(active)
+        value = active[0][2] if active else None
+        if point == starts[-1]:
+            values[-1] = value
+        elif value is not values[-1]:
+            starts.append(point)
+            values.append(value)
+    return starts, values
+
+def _merge(lists, bits):
+    """Return (starts, masks) ranges of the lists accepting addresses,
+    bit i of a mask being set if lists[i] accepts them.
+    """
+
+    changes = {}
+    for index, ranges in enumerate(lists):
+        bit = 1 << index
+        for start, end, value in _accepted(ranges, bits, True):
+            changes[start] = changes.get(start, 0) + bit
+            changes[end] = changes.get(end, 0) - bit
+    starts = [0]
+    masks = [0]
+    mask = 0
+    for point in sorted(changes):
+        mask += changes[point]
+        if point == starts[-1]:
+            masks[-1] = mask
+        elif mask != masks[-1] and point < 1 << bits:
+            starts.append(point)
+            masks.append(mask)
+    return starts, masks